@@ -1,18 +1,33 @@
-from django.contrib import admin
-from .models import Book, BookInstance, Author, Genre, Language
+from django.contrib import admin, messages
+from django.db import transaction
+
+from . import circulation, services
+from .forms import proposed_renewal_date, validate_renewal_date
+from .models import Book, BookInstance, Author, Genre, Hold, Language, LoanReminder
+from .pagination import EstimatedCountPaginator
 
 
 # Register your models here.
 
 class BookInline(admin.TabularInline):
+    """The author's books as links to their change forms, which have the language and genre widgets."""
     model = Book
     extra = 0
-    exclude = ['summary']
+    fields = ['title', 'isbn', 'language', 'display_genre']
+    readonly_fields = fields
+    show_change_link = True
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('language').prefetch_related('genre')
 
 
 @admin.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
     list_display = ['last_name', 'first_name', 'date_of_birth', 'date_of_death']
+    search_fields = ['last_name', 'first_name']
     fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
     inlines = [BookInline]
 
@@ -20,18 +35,50 @@ class AuthorAdmin(admin.ModelAdmin):
 class BookInstanceInline(admin.TabularInline):
     model = BookInstance
     extra = 0
+    # Copies change status through catalog.circulation, which locks them and serves the holds queue.
+    readonly_fields = ['status', 'borrower', 'due_back']
 
 
 @admin.register(Book)
 class BookAdmin(admin.ModelAdmin):
     list_display = ['title', 'author', 'display_genre', 'language']
+    list_select_related = ['author', 'language']
+    search_fields = ['title', 'isbn']
+    autocomplete_fields = ['author', 'language', 'genre']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     inlines = [BookInstanceInline]
 
+    def get_queryset(self, request):
+        # display_genre reads the prefetched genres instead of querying per row.
+        return super().get_queryset(request).prefetch_related('genre')
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            super().save_model(request, obj, form, change)
+        else:
+            services.create_book(obj, form.cleaned_data['genre'])
+
+    def save_related(self, request, form, formsets, change):
+        if change:
+            super().save_related(request, form, formsets, change)
+        else:
+            # create_book() has saved the genres already.
+            for formset in formsets:
+                self.save_formset(request, form, formset, change=change)
+
 
 @admin.register(BookInstance)
 class BookInstanceAdmin(admin.ModelAdmin):
     list_display = ['book', 'imprint', 'status','borrower' , 'due_back']
     list_filter = ['status', 'due_back']
+    list_select_related = ['book', 'borrower']
+    autocomplete_fields = ['book']
+    # New copies start in maintenance; the actions below move them on through catalog.circulation.
+    readonly_fields = ['status', 'borrower', 'due_back']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['renew_loans', 'return_loans', 'shelve_copies', 'withdraw_copies']
     fieldsets = (
         (None, {
             'fields': ('book', 'imprint', 'id')
@@ -41,6 +88,72 @@ class BookInstanceAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Write only the fields on the form, to the row as it is now: the copy may have been lent or
+        # returned since the form was loaded.
+        with transaction.atomic():
+            circulation.lock_for_writes(Book.objects.filter(bookinstance=obj.pk))
+            copy = BookInstance.objects.select_for_update().get(pk=obj.pk)
+            copy.book, copy.imprint = obj.book, obj.imprint
+            copy.save(update_fields=['book', 'imprint', 'updated_at'])
+
+    @admin.action(description='Renew selected loans for 3 weeks', permissions=['change'])
+    def renew_loans(self, request, queryset):
+        due_back = proposed_renewal_date()
+        validate_renewal_date(due_back)
+        renewed = circulation.renew_loans(queryset.values_list('pk', flat=True), due_back)
+        self.message_user(request, f'{renewed} loans renewed until {due_back}.', messages.SUCCESS)
+
+    @admin.action(description='Mark selected loans returned', permissions=['change'])
+    def return_loans(self, request, queryset):
+        returned = circulation.return_loans(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{returned} loans marked returned.', messages.SUCCESS)
+
+    @admin.action(description='Put selected copies in maintenance on the shelf', permissions=['change'])
+    def shelve_copies(self, request, queryset):
+        shelved = circulation.shelve_copies(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{shelved} copies put on the shelf or set aside for holds.', messages.SUCCESS)
+
+    @admin.action(description='Take selected available copies into maintenance', permissions=['change'])
+    def withdraw_copies(self, request, queryset):
+        withdrawn = circulation.withdraw_copies(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{withdrawn} copies taken into maintenance.', messages.SUCCESS)
+
+
+@admin.register(LoanReminder)
+class LoanReminderAdmin(admin.ModelAdmin):
+    list_display = ['book_instance', 'borrower', 'due_back', 'created_at', 'sent_at']
+    list_filter = ['sent_at']
+    list_select_related = ['book_instance__book', 'borrower']
+    raw_id_fields = ['book_instance', 'borrower']
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    """Holds are placed from the book page and move on through catalog.circulation, so they are read-only here."""
+    list_display = ['book', 'borrower', 'status', 'created_at', 'ready_at']
+    list_filter = ['status']
+    list_select_related = ['book', 'borrower']
+    search_fields = ['book__title', 'borrower__username']
+    readonly_fields = ['book', 'borrower', 'status', 'book_instance', 'created_at', 'ready_at']
+    actions = ['cancel_holds']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Cancel selected holds', permissions=['change'])
+    def cancel_holds(self, request, queryset):
+        cancelled = sum(circulation.cancel_hold(pk) for pk in queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{cancelled} holds cancelled.', messages.SUCCESS)
+
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+
 
-admin.site.register(Genre)
-admin.site.register(Language)
+@admin.register(Language)
+class LanguageAdmin(admin.ModelAdmin):
+    search_fields = ['name']
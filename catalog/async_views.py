@@ -0,0 +1,114 @@
+"""
+Async versions of the read-only catalog pages, routed instead of the sync views when CATALOG_ASYNC_VIEWS
+is on (the default under locallibrary.asgi).
+
+Django 4.0 has no async ORM, so independent queries run concurrently in worker threads through
+sync_to_async(thread_sensitive=False), each thread on its own database connection. Everything that needs
+the request's connection (the session, the user's permissions while rendering) stays thread-sensitive.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage, Page
+from django.db import close_old_connections
+from django.http import Http404
+from django.shortcuts import get_object_or_404, render
+
+from . import conditional, counters, fragments, visits
+from .conditional import conditional_page
+from .fragments import TAXONOMY, scope
+from .models import Author, Book, BookInstance, Genre
+from .views import AuthorListView, BookListView, index_context
+
+
+def run_query(func):
+    try:
+        return func()
+    finally:
+        # Worker threads are outside the request cycle, so nothing else closes their connections.
+        close_old_connections()
+
+
+async def gather(*funcs):
+    """Run blocking callables concurrently and return their results in order."""
+    if not getattr(settings, 'CATALOG_ASYNC_PARALLEL_QUERIES', True):
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(sync_to_async(run_query, thread_sensitive=False)(func) for func in funcs))
+
+
+async def index(request):
+    num_visits = visits.visitor_count(request)
+    counts, _ = await gather(counters.snapshot, visits.record_visit)
+    response = await sync_to_async(render)(request, 'index.html', index_context(counts, num_visits))
+    visits.set_visitor_count(response, num_visits + 1)
+    return response
+
+
+async def list_view(request, view_class):
+    """Render a ListView page, running its COUNT(*) and its page query concurrently."""
+    view = view_class()
+    view.setup(request)
+    page_number = request.GET.get(view.page_kwarg) or 1
+    if view.use_cursor_pagination() or not str(page_number).isdigit():
+        # Keyset pages are a single query, and 'last' needs the count first: nothing to overlap.
+        return await sync_to_async(view_class.as_view())(request)
+    return await conditional.arespond(request, view.page_version, functools.partial(render_page, request, view))
+
+
+async def render_page(request, view):
+    page_number = request.GET.get(view.page_kwarg) or 1
+    queryset = view.object_list = view.get_queryset()
+    paginator = view.get_paginator(queryset, view.get_paginate_by(queryset))
+    number = int(page_number)
+    offset = (number - 1) * paginator.per_page
+    paginator.count, rows = await gather(queryset.count, lambda: list(queryset[offset:offset + paginator.per_page]))
+    try:
+        page = Page(rows, paginator.validate_number(number), paginator)
+    except InvalidPage as e:
+        raise Http404(f'Invalid page ({page_number}): {e}')
+
+    context = {
+        'view': view,
+        'paginator': paginator,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'object_list': rows,
+        view.get_context_object_name(queryset): rows,
+    }
+    return await sync_to_async(render)(request, view.get_template_names(), context)
+
+
+async def book_list(request):
+    return await list_view(request, BookListView)
+
+
+async def author_list(request):
+    return await list_view(request, AuthorListView)
+
+
+@conditional_page(conditional.book_version)
+async def book_detail(request, pk):
+    # Unlike the sync view this reads genres and copies even when the page fragment turns out to be
+    # cached: they run alongside the book query, so they cost database work but no latency.
+    book, genres, copies = await gather(
+        lambda: get_object_or_404(Book.objects.select_related('author', 'language'), pk=pk),
+        lambda: list(Genre.objects.filter(book=pk)),
+        lambda: list(BookInstance.objects.filter(book=pk)),
+    )
+    context = {'object': book, 'book': book, 'genres': genres, 'copies': copies}
+    context.update(await sync_to_async(fragments.template_context)(
+        scope('book', book.pk), scope('author', book.author_id), TAXONOMY))
+    return await sync_to_async(render)(request, 'catalog/book_detail.html', context)
+
+
+@conditional_page(conditional.author_version)
+async def author_detail(request, pk):
+    author, books = await gather(
+        lambda: get_object_or_404(Author, pk=pk),
+        lambda: list(Book.objects.filter(author=pk)),
+    )
+    context = {'object': author, 'author': author, 'books': books}
+    context.update(await sync_to_async(fragments.template_context)(scope('author', author.pk)))
+    return await sync_to_async(render)(request, 'catalog/author_detail.html', context)
@@ -0,0 +1,169 @@
+"""
+Benchmark runner for the catalog pages.
+
+run() requests each path a number of times from a pool of threads. It reports throughput and latency
+percentiles per route as a JSON-serialisable dict, so runs can be saved and compared (compare()) across
+commits. Requests go either in process through Django's test client (ClientFetcher), which measures
+the application alone, or over HTTP to a running server (HttpFetcher), which includes the web server
+and its workers. catalog_route_urls() lists the catalog pages to request; the perf budget tests measure
+the same list.
+"""
+import math
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from .models import Author, Book, BookInstance
+from .urls import urlpatterns
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Object each parametrised route is requested with; every route with a <pk> must be listed here.
+ROUTE_TARGETS = {
+    'book-detail': Book,
+    'author-detail': Author,
+    'renew-book-librarian': BookInstance,
+    'author-update': Author,
+    'author-delete': Author,
+    'book-update': Book,
+    'book-delete': Book,
+}
+# URL kwargs for parametrised routes that are not addressed by pk.
+ROUTE_KWARGS = {
+    'export-catalog': {'dataset': 'books', 'fmt': 'csv'},
+}
+# Query strings for routes that do nothing interesting without one.
+ROUTE_QUERIES = {
+    'search': 'q=book+summary',
+}
+# POST-only routes, which their own tests hold to a query count.
+SKIPPED_ROUTES = {'bulk-update-loans', 'book-checkout', 'book-hold'}
+
+
+def worst_case_pk(model):
+    # The most expensive object to render: the book with most copies, the author with most books.
+    if model is Book:
+        return Book.objects.annotate(n=Count('bookinstance')).order_by('-n', 'pk').values_list('pk', flat=True)[0]
+    if model is Author:
+        return Author.objects.annotate(n=Count('book')).order_by('-n', 'pk').values_list('pk', flat=True)[0]
+    return BookInstance.objects.filter(status__exact='o').values_list('pk', flat=True)[0]
+
+
+def catalog_route_urls():
+    """(name, path) of every GET catalog route, parametrised routes with their most expensive object."""
+    urls = []
+    for pattern in urlpatterns:
+        if pattern.name in SKIPPED_ROUTES:
+            continue
+        kwargs = dict(ROUTE_KWARGS.get(pattern.name, {}))
+        if pattern.pattern.converters and not kwargs:
+            if pattern.name not in ROUTE_TARGETS:
+                raise LookupError(f'No target for route {pattern.name!r}, add it to catalog.benchmarking.ROUTE_TARGETS')
+            kwargs['pk'] = worst_case_pk(ROUTE_TARGETS[pattern.name])
+        url = reverse(pattern.name, kwargs=kwargs)
+        if pattern.name in ROUTE_QUERIES:
+            url += '?' + ROUTE_QUERIES[pattern.name]
+        urls.append((pattern.name, url))
+    return urls
+
+
+def latency_stats(latencies):
+    """Percentiles, mean and max of latencies in seconds, in milliseconds."""
+    latencies = sorted(latency * 1000 for latency in latencies)
+    stats = {f'p{p}': latencies[max(math.ceil(p / 100 * len(latencies)) - 1, 0)] for p in PERCENTILES}
+    stats.update(mean=statistics.fmean(latencies), max=latencies[-1])
+    return {key: round(value, 2) for key, value in stats.items()}
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # Redirects (to the login page) are measured as themselves, as the test client does.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpFetcher:
+    """GETs paths from a running server, optionally with a session cookie; returns (status, seconds)."""
+
+    def __init__(self, base_url, session_key=None):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_key}'} if session_key else {}
+        self.opener = urllib.request.build_opener(NoRedirectHandler)
+
+    def __call__(self, path):
+        request = urllib.request.Request(self.base_url + path, headers=self.headers)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = None
+        return status, time.perf_counter() - started
+
+
+class ClientFetcher:
+    """GETs paths through a test client per thread, logged in as `user` if given."""
+
+    def __init__(self, user=None):
+        self.user = user
+        self.local = threading.local()
+
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client(raise_request_exception=False)
+            if self.user is not None:
+                self.local.client.force_login(self.user)
+        return self.local.client
+
+    def __call__(self, path):
+        client = self.client()
+        started = time.perf_counter()
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code, time.perf_counter() - started
+
+
+def run(fetch, routes, requests=100, concurrency=10, warmup=2):
+    """
+    Request each (name, path) of routes `requests` times, `concurrency` at a time. With a concurrency of
+    1 the requests run in the calling thread, and so on its database connection and transaction.
+    """
+    report = {}
+    with ThreadPoolExecutor(concurrency) as pool:
+        for name, path in routes:
+            for _ in range(warmup):
+                fetch(path)
+            started = time.perf_counter()
+            results = list((pool.map if concurrency > 1 else map)(fetch, [path] * requests))
+            elapsed = time.perf_counter() - started
+            report[name] = {
+                'path': path,
+                'requests': requests,
+                'errors': sum(status is None or status >= 400 for status, _ in results),
+                'statuses': sorted({status for status, _ in results if status is not None}),
+                'throughput': round(requests / elapsed, 1),
+                'latency_ms': latency_stats([latency for _, latency in results]),
+            }
+    return report
+
+
+def compare(old, new):
+    """{route: {'throughput', 'p50', 'p95'}} as new / old ratios for the routes both runs measured."""
+    ratios = {}
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        ratios[name] = {'throughput': round(after['throughput'] / max(before['throughput'], 1e-9), 2)}
+        for key in ('p50', 'p95'):
+            ratios[name][key] = round(after['latency_ms'][key] / max(before['latency_ms'][key], 1e-9), 2)
+    return ratios
@@ -0,0 +1,202 @@
+"""
+Loans and holds.
+
+checkout() lends a reader a copy of a book, place_hold() queues them for it, and return_loans() and
+cancel_hold() hand the copies they free to the oldest waiting holds before shelving the rest. Each
+runs in one transaction.
+
+Concurrent checkouts must never lend one copy twice. On PostgreSQL and MySQL copies and holds are picked
+with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent transactions lock different copies and holds. They
+still queue on the book row, whose copy counts each of them updates: transactions on one book commit one
+at a time, transactions on different books do not wait for each other. The library-wide
+instances_available counter is updated after commit for that reason. SQLite has no row locks: there each
+transaction starts with a write (lock_for_writes()) and they queue on the database lock. Every status
+change is also an UPDATE conditional on the status it expects.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import conditional, counters, fragments
+from .models import Book, BookInstance, Hold
+
+LOAN_PERIOD = datetime.timedelta(weeks=3)
+CLAIM_ATTEMPTS = 3
+
+
+# QuerySet.update() skips the model signals, so these functions keep the counters, page fragments
+# and updated_at timestamps up to date themselves.
+
+def lock_for_writes(books):
+    """
+    On databases without row locks (SQLite), write first, so the transaction holds the write lock before
+    it reads: a SQLite transaction that has read cannot always become a writer when another one commits,
+    and fails with "database is locked" instead of waiting.
+    """
+    if not transaction.get_connection().features.has_select_for_update:
+        conditional.touch(books)
+
+
+def record_status_changes(changes):
+    """Counters, copy counts and page fragments for (book_id, old status, new status) copy changes."""
+    # After commit: every transaction would otherwise hold the one instances_available row until it ends.
+    available = sum((new == 'a') - (old == 'a') for _, old, new in changes)
+    transaction.on_commit(lambda: counters.increment('instances_available', available))
+    counters.adjust_copy_counts([(book_id, old, -1) for book_id, old, new in changes] +
+                                [(book_id, new, 1) for book_id, old, new in changes])
+    fragments.bump_books({book_id for book_id, _, _ in changes})
+
+
+def claim_copy(book_id, **changes):
+    """
+    Apply changes to an available copy of the book and return its pk, or None if no copy is free.
+    SKIP LOCKED passes over the copies other transactions are claiming; the status condition keeps
+    a copy from being claimed twice where rows cannot be locked.
+    """
+    available = BookInstance.objects.filter(book_id=book_id, status__exact='a').order_by()
+    for _ in range(CLAIM_ATTEMPTS):
+        copy_id = available.select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+        if copy_id is None:
+            return None
+        if available.filter(pk=copy_id).update(updated_at=timezone.now(), **changes):
+            return copy_id
+    return None
+
+
+def checkout(book_id, borrower, due_back=None):
+    """
+    Lend the borrower a copy of the book: the one set aside for their ready hold, or else any available
+    copy. Return the copy's pk, or None if no copy is free.
+    """
+    due_back = due_back or datetime.date.today() + LOAN_PERIOD
+    with transaction.atomic():
+        lock_for_writes(Book.objects.filter(pk=book_id))
+        hold = (Hold.objects.select_for_update()
+                .filter(book_id=book_id, borrower=borrower, status='r', book_instance__isnull=False)
+                .values_list('pk', 'book_instance_id').first())
+        lent = BookInstance.objects.filter(pk=hold[1], status__exact='r').update(
+            status='o', due_back=due_back, updated_at=timezone.now()) if hold else 0
+        if lent:
+            Hold.objects.filter(pk=hold[0]).update(status='f')
+            copy_id, status = hold[1], 'r'
+        else:
+            copy_id, status = claim_copy(book_id, status='o', borrower=borrower, due_back=due_back), 'a'
+            if copy_id is None:
+                return None
+        record_status_changes([(book_id, status, 'o')])
+    return copy_id
+
+
+def place_hold(book_id, borrower):
+    """
+    Queue the borrower for the book and return their hold, or the one they already have. If a copy is
+    free the hold is ready at once, with that copy reserved for them.
+    """
+    with transaction.atomic():
+        # Also the page's validator: the reader sees the outcome on the book page.
+        conditional.touch(Book.objects.filter(pk=book_id))
+        try:
+            with transaction.atomic():
+                hold = Hold.objects.create(book_id=book_id, borrower=borrower)
+        except IntegrityError:
+            return Hold.objects.get(book_id=book_id, borrower=borrower, status__in=['w', 'r'])
+        copy_id = claim_copy(book_id, status='r', borrower=borrower, due_back=None)
+        if copy_id is not None:
+            hold.status, hold.book_instance_id, hold.ready_at = 'r', copy_id, timezone.now()
+            hold.save(update_fields=['status', 'book_instance', 'ready_at'])
+            record_status_changes([(book_id, 'a', 'r')])
+    return hold
+
+
+def cancel_hold(hold_id):
+    """Cancel an active hold, passing a copy set aside for it on; return whether it was active."""
+    with transaction.atomic():
+        lock_for_writes(Book.objects.filter(hold=hold_id))
+        hold = Hold.objects.select_for_update().filter(pk=hold_id, status__in=['w', 'r']).first()
+        if hold is None:
+            return False
+        Hold.objects.filter(pk=hold.pk).update(status='c')
+        if hold.status == 'r' and hold.book_instance_id:
+            release_copies([(hold.book_instance_id, hold.book_id)], 'r')
+    return True
+
+
+def release_copies(copies, status):
+    """
+    Free (pk, book_id) copies that are locked in `status`: each goes to the oldest waiting hold on its
+    book, and the others become available with one UPDATE. Holds that another transaction is handing
+    a copy to are skipped, so concurrent returns of one book serve different readers.
+    """
+    copy_ids = defaultdict(list)
+    for pk, book_id in copies:
+        copy_ids[book_id].append(pk)
+    waiting = set(Hold.objects.filter(book_id__in=copy_ids, status='w').values_list('book_id', flat=True).distinct())
+
+    now = timezone.now()
+    ready, handed, shelved, changes = [], [], [], []
+    for book_id, pks in copy_ids.items():
+        holds = []
+        if book_id in waiting:
+            holds = list(Hold.objects.select_for_update(skip_locked=True)
+                         .filter(book_id=book_id, status='w').order_by('created_at', 'id')[:len(pks)])
+        for pk, hold in zip(pks, holds):
+            hold.status, hold.book_instance_id, hold.ready_at = 'r', pk, now
+            handed.append(BookInstance(pk=pk, status='r', borrower_id=hold.borrower_id, due_back=None, updated_at=now))
+        ready += holds
+        shelved += pks[len(holds):]
+        changes += [(book_id, status, 'r')] * len(holds) + [(book_id, status, 'a')] * (len(pks) - len(holds))
+
+    if ready:
+        Hold.objects.bulk_update(ready, ['status', 'book_instance', 'ready_at'])
+        BookInstance.objects.bulk_update(handed, ['status', 'borrower', 'due_back', 'updated_at'])
+    BookInstance.objects.filter(pk__in=shelved, status__exact=status).update(
+        status='a', due_back=None, borrower=None, updated_at=now)
+    record_status_changes(changes)
+
+
+def shelve_copies(copy_ids):
+    """Put copies back from maintenance, each to the next waiting hold on its book; return how many."""
+    with transaction.atomic():
+        lock_for_writes(Book.objects.filter(bookinstance__in=copy_ids))
+        copies = list(BookInstance.objects.filter(pk__in=copy_ids, status__exact='m').select_for_update()
+                      .values_list('pk', 'book_id'))
+        release_copies(copies, 'm')
+    return len(copies)
+
+
+def withdraw_copies(copy_ids):
+    """Take available copies off the shelf for maintenance with one UPDATE; return how many."""
+    with transaction.atomic():
+        lock_for_writes(Book.objects.filter(bookinstance__in=copy_ids))
+        copies = list(BookInstance.objects.filter(pk__in=copy_ids, status__exact='a').select_for_update()
+                      .values_list('pk', 'book_id'))
+        BookInstance.objects.filter(pk__in=[pk for pk, book_id in copies], status__exact='a').update(
+            status='m', updated_at=timezone.now())
+        record_status_changes([(book_id, 'a', 'm') for pk, book_id in copies])
+    return len(copies)
+
+
+def renew_loans(copy_ids, due_back):
+    """Move the due date of the given loans with one UPDATE; return how many were renewed."""
+    with transaction.atomic():
+        loans = BookInstance.objects.on_loan().filter(pk__in=copy_ids)
+        book_ids = set(loans.select_for_update().values_list('book_id', flat=True))
+        renewed = loans.update(due_back=due_back, updated_at=timezone.now())
+        conditional.touch(Book.objects.filter(pk__in=book_ids))
+        fragments.bump_books(book_ids)
+    return renewed
+
+
+def return_loans(copy_ids):
+    """
+    Return the given loans, handing each copy to the next waiting hold on its book or making it
+    available; return how many were returned.
+    """
+    with transaction.atomic():
+        lock_for_writes(Book.objects.filter(bookinstance__in=copy_ids))
+        loans = list(BookInstance.objects.on_loan().filter(pk__in=copy_ids).select_for_update()
+                     .values_list('pk', 'book_id'))
+        release_copies(loans, 'o')
+    return len(loans)
@@ -0,0 +1,166 @@
+"""
+Conditional GET for the catalog pages and exports.
+
+Every page has a version: one query for the `updated_at` of the rows it shows and of the rows they
+join. Book, Author and BookInstance set their own on save; touch() is called from the signal receivers
+and the bulk write paths for changes shown on another row's page: a book is touched when its copies,
+genres or language change, an author when it gains or loses a book.
+
+The version gives an ETag and a Last-Modified date, so a client revalidating an unchanged page gets a
+304 Not Modified before the page's own queries run or its template renders. The ETag also covers the
+user and the permissions the templates check, so pages with per-user links vary correctly.
+"""
+import asyncio
+import functools
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Author, Book, BookInstance, Counter
+
+SAFE_METHODS = ('GET', 'HEAD')
+# Permissions the templates check (perms.* in the pages and the navigation).
+PAGE_PERMISSIONS = ['catalog.can_mark_returned']
+
+
+def touch(queryset):
+    """Mark rows as changed for writes that do not go through Model.save()."""
+    return queryset.update(updated_at=timezone.now())
+
+
+def latest(timestamps):
+    return max((t for t in timestamps if t is not None), default=None)
+
+
+def book_version(pk):
+    row = Book.objects.filter(pk=pk).values_list('updated_at', 'author__updated_at').first()
+    return row and (row, latest(row))
+
+
+def author_version(pk):
+    row = (Author.objects.filter(pk=pk).annotate(books_updated_at=Max('book__updated_at'))
+           .values_list('updated_at', 'books_updated_at').first())
+    return row and (row, latest(row))
+
+
+def list_version(view, fields, counter):
+    """
+    Version of a ListView page: the pks and `fields` timestamps of the rows on it, read through the
+    same window as the page itself, plus the stored total for numbered pages ("Page n of m").
+    """
+    queryset = view.get_queryset().values_list('pk', *fields)
+    page_size = view.get_paginate_by(queryset)
+    if view.use_cursor_pagination():
+        window = view.cursor_window(queryset, page_size)[0]
+    else:
+        number = str(view.request.GET.get(view.page_kwarg) or 1)
+        if not number.isdigit() or int(number) < 1:
+            return None
+        offset = (int(number) - 1) * page_size
+        total = Subquery(Counter.objects.filter(name=counter).values('value'))
+        window = queryset.annotate(total=total)[offset:offset + page_size]
+    rows = list(window)
+    return rows and (rows, latest(t for row in rows for t in row[1:len(fields) + 1]))
+
+
+# dataset -> the timestamps of the rows its export columns read.
+EXPORT_TIMESTAMPS = {
+    'books': (Book, ['updated_at', 'author__updated_at']),
+    'authors': (Author, ['updated_at']),
+    # Borrower usernames are not covered: users have no updated_at.
+    'copies': (BookInstance, ['updated_at', 'book__updated_at']),
+}
+
+
+def export_version(dataset, fmt):
+    if dataset not in EXPORT_TIMESTAMPS:
+        return None
+    model, lookups = EXPORT_TIMESTAMPS[dataset]
+    row = model.objects.aggregate(rows=Count('pk'), **{lookup: Max(lookup) for lookup in lookups})
+    return row, latest(row[lookup] for lookup in lookups)
+
+
+def user_variation(request):
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    return user.pk, user.get_username(), [user.has_perm(perm) for perm in PAGE_PERMISSIONS]
+
+
+def check(request, version_func, per_user=True):
+    """Return (validators, 304/412 response or None) for a GET, or (None, None) if it has no version."""
+    # A page with messages waiting is rendered, or the browser's copy would show without them.
+    if request.method not in SAFE_METHODS or get_messages(request):
+        return None, None
+    version = version_func()
+    if not version:
+        return None, None
+    key = repr((version[0], user_variation(request) if per_user else None)).encode()
+    etag = quote_etag(hashlib.md5(key, usedforsecurity=False).hexdigest())
+    last_modified = version[1] and int(version[1].timestamp())
+    validators = etag, last_modified
+    return validators, finish(request, get_conditional_response(request, etag, last_modified), validators)
+
+
+def finish(request, response, validators):
+    if response is None or validators is None:
+        return response
+    etag, last_modified = validators
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # Revalidate every time (browsers reuse pages with only a Last-Modified heuristically), and
+        # keep per-user pages out of shared caches.
+        if request.user.is_authenticated:
+            patch_cache_control(response, no_cache=True, private=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+    return response
+
+
+def respond(request, version_func, view, per_user=True):
+    """
+    Answer from the page version if the client's copy is current, else from view(). Responses that
+    are the same for every user who may see them can leave the user out of the ETag with per_user=False.
+    """
+    validators, response = check(request, version_func, per_user)
+    return response or finish(request, view(), validators)
+
+
+async def arespond(request, version_func, view, per_user=True):
+    validators, response = await sync_to_async(check)(request, version_func, per_user)
+    return response or await sync_to_async(finish)(request, await view(), validators)
+
+
+def conditional_page(version_func, per_user=True):
+    """Decorate a (sync or async) function view; version_func receives the view's URL arguments."""
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                return await arespond(request, functools.partial(version_func, *args, **kwargs),
+                                      functools.partial(view, request, *args, **kwargs), per_user)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                return respond(request, functools.partial(version_func, *args, **kwargs),
+                               functools.partial(view, request, *args, **kwargs), per_user)
+        return wrapper
+    return decorator
+
+
+class ConditionalGetMixin:
+    """Answers GET with 304 Not Modified when the client's copy of page_version() is current."""
+
+    def page_version(self):
+        """(version, last modified) of the page from a single query, or None to always render it."""
+        return None
+
+    def get(self, request, *args, **kwargs):
+        return respond(request, self.page_version, functools.partial(super().get, request, *args, **kwargs))
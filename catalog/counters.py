@@ -0,0 +1,112 @@
+import re
+from collections import Counter as Tally, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Author, Book, BookInstance, Counter, Genre
+
+TITLE_WORD_RE = re.compile(r'\w+')
+
+# Every counter knows how to recompute itself from scratch; signals keep the stored values up to date.
+COUNTERS = {
+    'books': lambda: Book.objects.count(),
+    'instances': lambda: BookInstance.objects.count(),
+    'instances_available': lambda: BookInstance.objects.filter(status__exact='a').count(),
+    'authors': lambda: Author.objects.count(),
+    'genres': lambda: Genre.objects.count(),
+    'books_title_with_word': lambda: Book.objects.filter(title__iregex=r'\w+').count(),
+}
+
+
+def title_has_word(title):
+    return bool(title and TITLE_WORD_RE.search(title))
+
+
+def increment(name, delta=1):
+    if not delta:
+        return
+    updated = Counter.objects.filter(name=name).update(value=F('value') + delta)
+    if not updated:
+        rebuild([name])
+
+
+def snapshot():
+    values = dict.fromkeys(COUNTERS, 0)
+    values.update(Counter.objects.filter(name__in=COUNTERS).values_list('name', 'value'))
+    return values
+
+
+def rebuild(names=None):
+    """Recompute counters from the source tables, return {name: (old, new)} for the drifted ones."""
+    drift = {}
+    for name in names or COUNTERS:
+        with transaction.atomic():
+            counter = Counter.objects.select_for_update().filter(name=name).first()
+            value = COUNTERS[name]()
+            if counter is None:
+                Counter.objects.create(name=name, value=value)
+                drift[name] = (None, value)
+            elif counter.value != value:
+                drift[name] = (counter.value, value)
+                counter.value = value
+                counter.save(update_fields=['value'])
+    return drift
+
+
+# BookInstance status -> the Book column that counts copies in that status, besides copies_total.
+COPY_STATUS_FIELDS = {'a': 'copies_available', 'o': 'copies_on_loan'}
+
+
+def adjust_copy_counts(changes):
+    """
+    Apply (book_id, status, delta) changes to the books' copy counts with F() updates, one UPDATE
+    per distinct set of deltas, so bulk paths cost a handful of queries however many books they touch.
+    """
+    deltas = defaultdict(Tally)
+    for book_id, status, delta in changes:
+        if book_id is None:
+            continue
+        deltas[book_id]['copies_total'] += delta
+        if status in COPY_STATUS_FIELDS:
+            deltas[book_id][COPY_STATUS_FIELDS[status]] += delta
+
+    groups = defaultdict(list)
+    for book_id, fields in deltas.items():
+        key = tuple(sorted((field, delta) for field, delta in fields.items() if delta))
+        if key:
+            groups[key].append(book_id)
+    for key, book_ids in groups.items():
+        # Touches the books too: their pages show the counts (see catalog.conditional). Decrements
+        # stop at zero, so counts that drifted low (bulk_create, raw SQL) wait for recount_copies
+        # instead of failing the save that changes a copy.
+        Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now(), **{
+            field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0) for field, delta in key})
+
+
+def recount_copies(chunk_size=1000):
+    """Recompute every book's copy counts from BookInstance, return how many books had drifted."""
+    drifted = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            books = list(Book.objects.select_for_update().filter(pk__gt=last_pk).order_by('pk')
+                         .values_list('pk', *Book.COPY_COUNT_FIELDS)[:chunk_size])
+            if not books:
+                return drifted
+            last_pk = books[-1][0]
+
+            actual = {pk: dict.fromkeys(Book.COPY_COUNT_FIELDS, 0) for pk, *stored in books}
+            rows = (BookInstance.objects.filter(book_id__in=actual).order_by()
+                    .values_list('book_id', 'status').annotate(copies=Count('pk')))
+            for book_id, status, copies in rows:
+                actual[book_id]['copies_total'] += copies
+                if status in COPY_STATUS_FIELDS:
+                    actual[book_id][COPY_STATUS_FIELDS[status]] += copies
+
+            fixed = [Book(pk=pk, updated_at=timezone.now(), **actual[pk]) for pk, *stored in books
+                     if tuple(stored) != tuple(actual[pk].values())]
+            Book.objects.bulk_update(fixed, [*Book.COPY_COUNT_FIELDS, 'updated_at'])
+            drifted += len(fixed)
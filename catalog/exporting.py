@@ -0,0 +1,92 @@
+import csv
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from .models import Author, Book, BookInstance
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# dataset -> (model, [(column, values_list lookup)]); a lookup of None is filled in per chunk.
+DATASETS = {
+    'books': (Book, [
+        ('id', 'pk'), ('title', 'title'), ('author_first_name', 'author__first_name'),
+        ('author_last_name', 'author__last_name'), ('summary', 'summary'), ('isbn', 'isbn'),
+        ('language', 'language__name'), ('genre', None),
+    ]),
+    'authors': (Author, [
+        ('id', 'pk'), ('first_name', 'first_name'), ('last_name', 'last_name'),
+        ('date_of_birth', 'date_of_birth'), ('date_of_death', 'date_of_death'),
+    ]),
+    'copies': (BookInstance, [
+        ('id', 'pk'), ('book_id', 'book_id'), ('isbn', 'book__isbn'), ('title', 'book__title'),
+        ('imprint', 'imprint'), ('status', 'status'), ('due_back', 'due_back'),
+        ('borrower', 'borrower__username'),
+    ]),
+}
+
+
+def columns(dataset):
+    return [column for column, lookup in DATASETS[dataset][1]]
+
+
+def genre_names(book_ids):
+    names = {}
+    rows = Book.genre.through.objects.filter(book_id__in=book_ids).order_by('pk').values_list('book_id', 'genre__name')
+    for book_id, name in rows:
+        names.setdefault(book_id, []).append(name)
+    return {book_id: ';'.join(book_names) for book_id, book_names in names.items()}
+
+
+def chunks(queryset, chunk_size):
+    """
+    Yield a values_list queryset whose rows start with the pk in lists of chunk_size rows: from one
+    server-side cursor where available, else with one `pk > last pk` query per chunk, which does not
+    load the whole result into memory when server-side cursors are disabled (DATABASE_POOLER).
+    """
+    if not connections[queryset.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        iterator = queryset.iterator(chunk_size=chunk_size)
+        while chunk := list(islice(iterator, chunk_size)):
+            yield chunk
+        return
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        chunk = list(queryset.filter(pk__gt=chunk[-1][0])[:chunk_size])
+
+
+def rows(dataset, chunk_size=2000):
+    """Yield plain tuples for a dataset in pk order."""
+    model, fields = DATASETS[dataset]
+    lookups = [lookup for column, lookup in fields if lookup]
+    for chunk in chunks(model.objects.order_by('pk').values_list(*lookups), chunk_size):
+        if dataset == 'books':
+            genres = genre_names([row[0] for row in chunk])
+            chunk = [row + (genres.get(row[0], ''),) for row in chunk]
+        yield from chunk
+
+
+class Echo:
+    """File-like object whose write() just hands the line back, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(dataset, fmt, chunk_size=2000):
+    header = columns(dataset)
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(header)
+        for row in rows(dataset, chunk_size):
+            yield writer.writerow(row)
+    elif fmt == 'jsonl':
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows(dataset, chunk_size):
+            yield encoder.encode(dict(zip(header, row))) + '\n'
+    else:
+        raise ValueError(f'Unknown export format {fmt!r}')
@@ -1,12 +1,11 @@
-import random
-
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
-from django.contrib.auth.models import Permission
+from django.contrib.auth.models import User
 import datetime
 
 from .models import BookInstance, Book
+from .widgets import AutocompleteSelect, AutocompleteSelectMultiple
 
 
 # class RenewBookForm(forms.Form):
@@ -24,16 +23,22 @@ from .models import BookInstance, Book
 #         return data
 
 
-class RenewBookModelForm(forms.ModelForm):
-    def clean_due_back(self):
-        data = self.cleaned_data['due_back']
+def validate_renewal_date(data):
+    if data < datetime.date.today():
+        raise ValidationError(_("Invalid date - renewal in past"))
+
+    if data > datetime.date.today() + datetime.timedelta(weeks=4):
+        raise ValidationError(_("Invalid date - renewal more than 4 weeks ahead"))
 
-        if data < datetime.date.today():
-            raise ValidationError(_("Invalid date - renewal in past"))
 
-        if data > datetime.date.today() + datetime.timedelta(weeks=4):
-            raise ValidationError(_("Invalid date - renewal more than 4 weeks ahead"))
+def proposed_renewal_date():
+    return datetime.date.today() + datetime.timedelta(weeks=3)
 
+
+class RenewBookModelForm(forms.ModelForm):
+    def clean_due_back(self):
+        data = self.cleaned_data['due_back']
+        validate_renewal_date(data)
         return data
 
     class Meta:
@@ -45,9 +50,46 @@ class RenewBookModelForm(forms.ModelForm):
         }
 
 
+class BulkLoanForm(forms.Form):
+    """Renew or return many loans at once; the renewal date is checked once for all of them."""
+    ACTIONS = (('renew', _('Renew')), ('return', _('Mark returned')))
+
+    action = forms.ChoiceField(choices=ACTIONS)
+    copies = forms.ModelMultipleChoiceField(queryset=BookInstance.objects.on_loan(),
+                                            error_messages={'required': _('Select at least one loan.')})
+    due_back = forms.DateField(required=False, label=_('Renewal date'))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('action') == 'renew':
+            if not cleaned_data.get('due_back'):
+                self.add_error('due_back', _('Enter a renewal date.'))
+            else:
+                try:
+                    validate_renewal_date(cleaned_data['due_back'])
+                except ValidationError as e:
+                    self.add_error('due_back', e)
+        return cleaned_data
+
+
+class CheckoutForm(forms.Form):
+    borrower = forms.CharField(label=_('Reader'), max_length=150, help_text=_("The reader's username."))
+
+    def clean_borrower(self):
+        try:
+            return User.objects.get(username=self.cleaned_data['borrower'])
+        except User.DoesNotExist:
+            raise ValidationError(_('No reader with this username'))
+
+
 class AddBookModelForm(forms.ModelForm):
     class Meta:
         model = Book
         fields = '__all__'
+        widgets = {
+            'author': AutocompleteSelect('author-autocomplete'),
+            'language': AutocompleteSelect('language-autocomplete'),
+            'genre': AutocompleteSelectMultiple('genre-autocomplete'),
+        }
 
 
@@ -0,0 +1,84 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import Book
+
+# Version tokens are random rather than incremented, so a token evicted from the cache can never come
+# back with a value that matches an old cached fragment.
+VERSION_KEY = 'catalog:fragment-version:{}'
+TAXONOMY = 'taxonomy'
+
+
+def cache_alias():
+    return getattr(settings, 'CATALOG_FRAGMENT_CACHE', 'default')
+
+
+def cache():
+    return caches[cache_alias()]
+
+
+def timeout():
+    return getattr(settings, 'CATALOG_FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def scope(model_name, pk):
+    return f'{model_name}:{pk}' if pk is not None else None
+
+
+def version(*scopes):
+    """Combined version token of the given scopes, e.g. version('book:1', 'author:3', TAXONOMY)."""
+    keys = [VERSION_KEY.format(s) for s in scopes if s]
+    tokens = cache().get_many(keys)
+    for key in keys:
+        if key not in tokens:
+            token = uuid.uuid4().hex
+            cache().add(key, token, None)
+            tokens[key] = cache().get(key, token)
+    return '.'.join(tokens[key] for key in keys)
+
+
+def bump(*scopes):
+    scopes = [s for s in scopes if s]
+
+    def set_tokens():
+        cache().set_many({VERSION_KEY.format(s): uuid.uuid4().hex for s in scopes}, None)
+
+    # Bump now so the writing transaction never reads a stale fragment, and again after commit so a
+    # reader that rendered the pre-commit rows in between cannot leave them cached under the new token.
+    set_tokens()
+    transaction.on_commit(set_tokens)
+
+
+def bump_books(book_ids):
+    """Bump the pages that show these books' copies: the books' own and their authors'."""
+    author_ids = Book.objects.filter(pk__in=book_ids).values_list('author_id', flat=True)
+    bump(*[scope('book', pk) for pk in book_ids], *[scope('author', pk) for pk in author_ids])
+
+
+def template_context(*scopes):
+    """
+    Template context for `{% cache fragment_timeout name pk fragment_version using=fragment_cache %}`.
+    Without scopes nothing would invalidate the fragments, so they are not cached (a timeout of 0).
+    """
+    scopes = [s for s in scopes if s]
+    return {'fragment_version': version(*scopes), 'fragment_cache': cache_alias(),
+            'fragment_timeout': timeout() if scopes else 0}
+
+
+class FragmentCacheMixin:
+    """
+    Adds `fragment_version`, `fragment_cache` and `fragment_timeout` to the context for
+    `{% cache fragment_timeout name pk fragment_version using=fragment_cache %}` blocks.
+    """
+
+    def fragment_scopes(self):
+        """The scopes whose bump() invalidates the page's fragments; none leaves them uncached."""
+        return ()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(template_context(*self.fragment_scopes()))
+        return context
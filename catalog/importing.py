@@ -0,0 +1,201 @@
+import csv
+import datetime
+import gzip
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, fragments, services
+from .models import Author, Book, BookInstance, Genre, Language
+
+KINDS = ('genres', 'languages', 'authors', 'books', 'copies')
+STATUSES = {code for code, label in BookInstance.LOAN_STATUS}
+
+
+class CatalogImportError(ValueError):
+    pass
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(f, fmt):
+    """Yield (line number, dict) pairs from a CSV or JSONL stream, one line at a time."""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_num, line in enumerate(f, 1):
+            if line.strip():
+                yield line_num, json.loads(line)
+    else:
+        raise CatalogImportError(f'Unknown format {fmt!r}')
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def split_list(value):
+    if isinstance(value, list):
+        return [item.strip() for item in value if item.strip()]
+    return [item.strip() for item in (value or '').split(';') if item.strip()]
+
+
+def parse_date(value, line_num):
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CatalogImportError(f'line {line_num}: invalid date {value!r}')
+
+
+def author_key(record):
+    if record.get('author') and not record.get('author_last_name'):
+        first, _, last = record['author'].strip().rpartition(' ')
+        return first, last
+    return (record.get('author_first_name') or '').strip(), (record.get('author_last_name') or '').strip()
+
+
+class LookupMap:
+    """
+    name -> pk map for a lookup table, filled per chunk: one query for the keys not seen yet and one
+    bulk INSERT for the ones that do not exist. Cleared when it grows past max_size, so memory stays bounded.
+    """
+
+    def __init__(self, model, key_fields, counter=None, max_size=100000):
+        self.model = model
+        self.key_fields = key_fields
+        self.counter = counter
+        self.max_size = max_size
+        self.pks = {}
+        self.created = 0
+
+    def resolve(self, keys):
+        keys = {key for key in keys if any(key)}
+        if len(self.pks) + len(keys) > self.max_size:
+            self.pks.clear()
+        missing = keys - self.pks.keys()
+        if not missing:
+            return self.pks
+        last_field = self.key_fields[-1]
+        existing = self.model.objects.filter(**{f'{last_field}__in': {key[-1] for key in missing}})
+        for row in existing.values_list('pk', *self.key_fields):
+            if row[1:] in missing:
+                self.pks.setdefault(row[1:], row[0])
+        to_create = sorted(key for key in missing if key not in self.pks)
+        for obj in self.model.objects.bulk_create(
+                [self.model(**dict(zip(self.key_fields, key))) for key in to_create]):
+            self.pks[tuple(getattr(obj, field) for field in self.key_fields)] = obj.pk
+        self.created += len(to_create)
+        if self.counter:
+            counters.increment(self.counter, len(to_create))
+        return self.pks
+
+
+class CatalogImporter:
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.genres = LookupMap(Genre, ('name',), counter='genres')
+        self.languages = LookupMap(Language, ('name',))
+        self.authors = LookupMap(Author, ('first_name', 'last_name'), counter='authors')
+        self.skipped = 0
+
+    def import_records(self, kind, records):
+        """Import (line number, record) pairs in chunked transactions, yielding the row count after each chunk."""
+        if kind not in KINDS:
+            raise CatalogImportError(f'Unknown kind {kind!r}')
+        import_chunk = getattr(self, f'import_{kind}')
+        imported = 0
+        for chunk in chunked(records, self.batch_size):
+            with transaction.atomic():
+                import_chunk(chunk)
+            imported += len(chunk)
+            yield imported
+
+    def import_genres(self, chunk):
+        self.genres.resolve({(record['name'].strip(),) for line_num, record in chunk})
+
+    def import_languages(self, chunk):
+        self.languages.resolve({(record['name'].strip(),) for line_num, record in chunk})
+
+    def import_authors(self, chunk):
+        records = {}
+        for line_num, record in chunk:
+            key = (record['first_name'].strip(), record['last_name'].strip())
+            records[key] = (parse_date(record.get('date_of_birth'), line_num),
+                            parse_date(record.get('date_of_death'), line_num))
+        pks = self.authors.resolve(records)
+        dated = [Author(pk=pks[key], first_name=key[0], last_name=key[1], date_of_birth=born, date_of_death=died,
+                        updated_at=timezone.now())
+                 for key, (born, died) in records.items() if born or died]
+        Author.objects.bulk_update(dated, ['date_of_birth', 'date_of_death', 'updated_at'])
+
+    def import_books(self, chunk):
+        """Books are matched by ISBN: rows for an ISBN already in the catalog update that book."""
+        # A later row for the same ISBN replaces an earlier one in the chunk.
+        chunk = list({record.get('isbn', '').strip() or ('line', line_num): (line_num, record)
+                      for line_num, record in chunk}.values())
+        genre_names = {line_num: split_list(record.get('genre')) for line_num, record in chunk}
+        author_pks = self.authors.resolve({author_key(record) for line_num, record in chunk})
+        language_pks = self.languages.resolve({(record.get('language', '').strip(),) for line_num, record in chunk})
+        genre_pks = self.genres.resolve({(name,) for names in genre_names.values() for name in names})
+        book_pks = {}
+        isbns = {record.get('isbn', '').strip() for line_num, record in chunk} - {''}
+        for pk, isbn in Book.objects.filter(isbn__in=isbns).order_by('pk').values_list('pk', 'isbn'):
+            book_pks.setdefault(isbn, pk)
+
+        new, existing = ([], []), ([], [])
+        for line_num, record in chunk:
+            isbn = record.get('isbn', '').strip()
+            book = Book(pk=book_pks.get(isbn), title=record['title'], summary=record.get('summary', ''), isbn=isbn,
+                        author_id=author_pks.get(author_key(record)),
+                        language_id=language_pks.get((record.get('language', '').strip(),)))
+            books, genres = existing if book.pk else new
+            books.append(book)
+            genres.append([genre_pks[(name,)] for name in genre_names[line_num]])
+        if new[0]:
+            services.create_books(*new)
+        if existing[0]:
+            services.update_books(*existing)
+
+    def import_copies(self, chunk):
+        isbns = {record['isbn'].strip() for line_num, record in chunk}
+        book_pks = {}
+        for pk, isbn in Book.objects.filter(isbn__in=isbns).order_by('pk').values_list('pk', 'isbn'):
+            book_pks.setdefault(isbn, pk)
+
+        copies = []
+        for line_num, record in chunk:
+            book_id = book_pks.get(record['isbn'].strip())
+            if book_id is None:
+                self.skipped += 1
+                continue
+            status = record.get('status') or 'm'
+            if status not in STATUSES:
+                raise CatalogImportError(f'line {line_num}: invalid status {status!r}')
+            copy = BookInstance(book_id=book_id, imprint=record.get('imprint', ''), status=status,
+                                due_back=parse_date(record.get('due_back'), line_num))
+            if record.get('id'):
+                copy.id = record['id']
+            copies.append(copy)
+        BookInstance.objects.bulk_create(copies)
+
+        counters.increment('instances', len(copies))
+        counters.increment('instances_available', sum(copy.status == 'a' for copy in copies))
+        counters.adjust_copy_counts((copy.book_id, copy.status, 1) for copy in copies)
+        fragments.bump_books({copy.book_id for copy in copies})
@@ -0,0 +1,114 @@
+import datetime
+import json
+import logging
+import subprocess
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from catalog import benchmarking
+from catalog.models import Book, BookInstance
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = ('Request every catalog page concurrently, in process through the test client or over HTTP '
+            'against a running server, and report throughput and latency percentiles per route as JSON. '
+            'Pages are measured against the current database; fill it with seed_library first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', nargs='?',
+                            help='Server to test, e.g. http://127.0.0.1:8000 (default: the test client, in process).')
+        parser.add_argument('--route', action='append', dest='routes', metavar='NAME',
+                            help='URL name to benchmark (repeatable; default: every catalog route).')
+        parser.add_argument('--user', help='Username to log in as, e.g. a librarian for the staff pages.')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per route.')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--warmup', type=int, default=2, help='Requests per route before measuring.')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+        parser.add_argument('--compare', metavar='REPORT', help='Earlier JSON report to compare against.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['user']!r}.")
+        try:
+            routes = benchmarking.catalog_route_urls()
+        except IndexError:
+            raise CommandError('The catalog is empty; fill it with seed_library first.')
+        if options['routes']:
+            unknown = set(options['routes']) - {name for name, _ in routes}
+            if unknown:
+                raise CommandError(f'Unknown routes: {", ".join(sorted(unknown))}')
+            routes = [(name, path) for name, path in routes if name in options['routes']]
+
+        if options['base_url']:
+            session_key = None
+            if user is not None:
+                client = Client()
+                client.force_login(user)
+                session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+            fetch = benchmarking.HttpFetcher(options['base_url'], session_key)
+        else:
+            fetch = benchmarking.ClientFetcher(user)
+        # The test client sends Host: testserver. 4xx responses are counted in the report, not logged.
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = benchmarking.run(fetch, routes, options['requests'], options['concurrency'],
+                                           options['warmup'])
+        finally:
+            request_logger.setLevel(level)
+
+        report = {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'target': options['base_url'] or 'test client',
+            'user': options['user'],
+            'database': connection.vendor,
+            'catalog': {'books': Book.objects.count(), 'copies': BookInstance.objects.count()},
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'routes': results,
+        }
+        self.summarize(results)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.summarize_changes(benchmarking.compare(json.load(f)['routes'], results))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+    # Tables go to stderr, so stdout stays valid JSON.
+    def summarize(self, results):
+        for name, result in results.items():
+            latency = result['latency_ms']
+            self.stderr.write(
+                f"{name:<24} {result['throughput']:8.1f} req/s   p50 {latency['p50']:7.1f} ms   "
+                f"p95 {latency['p95']:7.1f} ms   p99 {latency['p99']:7.1f} ms   errors {result['errors']}")
+
+    def summarize_changes(self, ratios):
+        self.stderr.write(self.style.MIGRATE_HEADING('\nChange against the earlier report (new / old):'))
+        for name, ratio in ratios.items():
+            self.stderr.write(f"{name:<24} throughput x{ratio['throughput']:<6} p50 x{ratio['p50']:<6} "
+                              f"p95 x{ratio['p95']}")
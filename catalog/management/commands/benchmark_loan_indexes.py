@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from catalog.models import BookInstance
+from catalog.seeding import seed_library
+
+
+def loan_queries():
+    """[(name, queryset to explain, callable to time)] for the loan hot paths."""
+    borrower_id = (BookInstance.objects.filter(status__exact='o', borrower__isnull=False)
+                   .values_list('borrower_id', flat=True).first())
+    all_borrowed = BookInstance.objects.filter(status__exact='o').order_by('due_back', 'id')[:10]
+    my_books = BookInstance.objects.filter(borrower_id=borrower_id, status__exact='o').order_by('due_back', 'id')[:10]
+    available = BookInstance.objects.filter(status__exact='a').order_by()
+    return [
+        ('all borrowed: status=o ORDER BY due_back', all_borrowed, lambda: list(all_borrowed.all())),
+        ('my books: borrower=? AND status=o ORDER BY due_back', my_books, lambda: list(my_books.all())),
+        ('available copies: COUNT(*) WHERE status=a', available.values_list('book_id'), available.count),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Show query plans and timings of the loan list and availability queries with and without '
+            'the BookInstance indexes. Use --seed to build a large synthetic table first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, metavar='N',
+                            help='Bulk-insert about N synthetic book copies before benchmarking (e.g. 1000000).')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            started = time.monotonic()
+            seed_library(books=max(options['seed'] // 10, 1), authors=max(options['seed'] // 100, 1),
+                         copies_per_book=10, users=1000, batch_size=5000)
+            self.stdout.write(f"Seeded {options['seed']} copies in {time.monotonic() - started:.0f}s.")
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.stdout.write(f'{BookInstance.objects.count()} rows in {BookInstance._meta.db_table}')
+        with transaction.atomic():
+            # Dropped inside a transaction that is rolled back, so the indexes are never really lost.
+            with connection.cursor() as cursor:
+                for index in BookInstance._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+            self.report('without indexes', options['repeat'])
+            transaction.set_rollback(True)
+        self.report('with indexes', options['repeat'])
+
+    def report(self, label, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {label} =='))
+        for name, queryset, run in loan_queries():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(self.style.SUCCESS(f'{name}: {statistics.median(timings):.2f} ms'))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from catalog import exporting
+
+
+class Command(BaseCommand):
+    help = 'Stream books, authors or copies out of the catalog as CSV or JSONL in bounded memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=exporting.DATASETS)
+        parser.add_argument('--format', choices=exporting.FORMATS, default='csv')
+        parser.add_argument('--output', '-o', default='-', help='File to write to (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, dataset, **options):
+        lines = exporting.export_lines(dataset, options['format'], chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                f.writelines(lines)
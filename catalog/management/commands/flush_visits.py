@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog import visits
+
+
+class Command(BaseCommand):
+    help = 'Write the home page visits buffered in the cache to the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep flushing every N seconds instead of running once.')
+
+    def handle(self, *args, **options):
+        while True:
+            count = visits.flush()
+            self.stdout.write(self.style.SUCCESS(f'Flushed {count} visits, {visits.total()} in total.'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importing import KINDS, CatalogImporter, CatalogImportError, guess_format, open_text, read_records
+
+
+class Command(BaseCommand):
+    help = ('Stream books, authors, copies, genres or languages from CSV or JSONL files (optionally gzipped) '
+            'into the catalog in batched transactions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: guessed from the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--progress-every', type=float, default=5.0, metavar='SECONDS')
+
+    def handle(self, *args, kind, paths, **options):
+        importer = CatalogImporter(batch_size=options['batch_size'])
+        started = last_report = time.monotonic()
+        total = 0
+        for path in paths:
+            imported = 0
+            try:
+                with open_text(path) as f:
+                    records = read_records(f, options['format'] or guess_format(path))
+                    for imported in importer.import_records(kind, records):
+                        now = time.monotonic()
+                        if now - last_report >= options['progress_every']:
+                            self.stdout.write(f'{path}: {imported} rows, {(total + imported) / (now - started):.0f} rows/s')
+                            last_report = now
+            except KeyError as e:
+                raise CommandError(f'{path}: missing field {e}')
+            except (CatalogImportError, ValueError) as e:
+                raise CommandError(f'{path}: {e}')
+            total += imported
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} {kind} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-6):.0f} rows/s), '
+            f'created {importer.authors.created} authors, {importer.genres.created} genres, '
+            f'{importer.languages.created} languages, skipped {importer.skipped} rows.'))
@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from catalog.reminders import process_overdue
+
+
+class Command(BaseCommand):
+    help = ('Record a reminder for every overdue loan and email the borrowers, in keyset-ordered chunks. '
+            'Safe to rerun: each loan is reminded once per due date.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat, default=None,
+                            help='Treat loans due before this date (YYYY-MM-DD) as overdue; default today.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--no-email', action='store_false', dest='send_email',
+                            help='Only record the reminders.')
+
+    def handle(self, *args, **options):
+        scanned = sent = 0
+        for scanned, sent in process_overdue(options['date'], options['chunk_size'], options['send_email']):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{scanned} overdue loans scanned, {sent} reminders sent')
+        self.stdout.write(self.style.SUCCESS(f'{scanned} overdue loans scanned, {sent} reminders sent.'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard counters from the catalog tables and report any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Counters to rebuild (default: all).')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep reconciling every N seconds instead of running once.')
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(counters.COUNTERS)
+        if unknown:
+            raise CommandError(f"Unknown counters: {', '.join(sorted(unknown))}")
+
+        while True:
+            drift = counters.rebuild(options['names'] or None)
+            for name, (old, new) in drift.items():
+                self.stdout.write(f'{name}: {old} -> {new}')
+            self.stdout.write(self.style.SUCCESS(f'Counters reconciled, {len(drift)} drifted.'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from catalog import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute every book's copy counts (total, available, on loan) from its copies and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = counters.recount_copies(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Copy counts recounted, {drifted} books drifted.'))
@@ -0,0 +1,39 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalog.models import Author, Book
+from catalog.seeding import seed_library
+
+
+class Command(BaseCommand):
+    help = ('Fill an empty catalog with synthetic, skewed data for load tests and benchmarks: Zipfian '
+            'author, language, genre and borrower popularity, mixed copy statuses and loan due dates.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--authors', type=int, help='Default: one for every 10 books.')
+        parser.add_argument('--copies-per-book', type=int, default=3)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--genres', type=int, default=20)
+        parser.add_argument('--languages', type=int, default=5)
+        parser.add_argument('--zipf-exponent', type=float, default=1.0,
+                            help='Popularity skew; 0 picks uniformly, higher values favour the first few more.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if Book.objects.exists() or Author.objects.exists() or User.objects.filter(username__startswith='reader').exists():
+            raise CommandError('The catalog is not empty; seed_library fills a fresh database.')
+        started = time.monotonic()
+        with transaction.atomic():
+            counts = seed_library(
+                books=options['books'], authors=options['authors'] or max(options['books'] // 10, 1),
+                copies_per_book=options['copies_per_book'], genres=options['genres'],
+                languages=options['languages'], users=options['users'], batch_size=options['batch_size'],
+                seed=options['seed'], zipf_exponent=options['zipf_exponent'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {", ".join(f"{count} {name}" for name, count in counts.items())} in {elapsed:.1f}s.'))
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from catalog.tests.perf import BUDGET_FILE, measure_routes, seed_perf_dataset, write_budgets
+from locallibrary.test_runner import TEST_STATICFILES_STORAGE
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway test database, measure every catalog route and rewrite the perf budget baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Measurements per route; the median is kept.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Measure inside a transaction, as TestCase does, so savepoint queries are counted the same way.
+            with transaction.atomic(), override_settings(STATICFILES_STORAGE=TEST_STATICFILES_STORAGE):
+                librarian = seed_perf_dataset()
+                client = Client()
+                client.force_login(User.objects.get(pk=librarian.pk))
+                results = measure_routes(client, repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        write_budgets(results)
+        for name, result in sorted(results.items()):
+            self.stdout.write(f"{name:24} {result['queries']:4} queries  {result['total_time'] * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f'Budgets written to {BUDGET_FILE}'))
@@ -0,0 +1,37 @@
+# Generated by Django 4.0.4 on 2026-10-18 10:29
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    Counter = apps.get_model('catalog', 'Counter')
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+    Author = apps.get_model('catalog', 'Author')
+    Genre = apps.get_model('catalog', 'Genre')
+    Counter.objects.bulk_create([
+        Counter(name='books', value=Book.objects.count()),
+        Counter(name='instances', value=BookInstance.objects.count()),
+        Counter(name='instances_available', value=BookInstance.objects.filter(status__exact='a').count()),
+        Counter(name='authors', value=Author.objects.count()),
+        Counter(name='genres', value=Genre.objects.count()),
+        Counter(name='books_title_with_word', value=Book.objects.filter(title__iregex=r'\w+').count()),
+    ])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_alter_bookinstance_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE catalog_booksearch USING fts5("
+            "title, summary, author, genre, isbn, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE catalog_booksearch (book_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX catalog_booksearch_document_gin ON catalog_booksearch USING gin (document)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE catalog_booksearch")
+
+
+# Frozen copies of catalog.search's insert statements: later changes to that module must not change what
+# this migration does.
+INSERT_SQL = {
+    'sqlite': 'INSERT INTO catalog_booksearch (rowid, title, summary, author, genre, isbn) '
+              'VALUES (%s, %s, %s, %s, %s, %s)',
+    'postgresql': (
+        "INSERT INTO catalog_booksearch (book_id, document) VALUES (%s, "
+        "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'D') || "
+        "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'A'))"
+    ),
+}
+
+
+def fill_search_index(apps, schema_editor, chunk_size=1000):
+    connection = schema_editor.connection
+    if connection.vendor not in INSERT_SQL:
+        return
+    Book = apps.get_model('catalog', 'Book')
+    books = Book.objects.using(connection.alias).select_related('author').prefetch_related('genre').order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(books.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        rows = [(book.pk, book.title, book.summary,
+                 f'{book.author.first_name} {book.author.last_name}' if book.author else '',
+                 ' '.join(genre.name for genre in book.genre.all()), book.isbn)
+                for book in chunk]
+        with connection.cursor() as cursor:
+            cursor.executemany(INSERT_SQL[connection.vendor], rows)
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.4 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_copies(apps, schema_editor):
+    Book = apps.get_model('catalog', 'Book')
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+
+    def copies(condition=Q()):
+        counts = (BookInstance.objects.filter(condition, book=OuterRef('pk')).order_by()
+                  .values('book').annotate(n=Count('pk')).values('n'))
+        return Coalesce(Subquery(counts), 0)
+
+    Book.objects.update(copies_total=copies(), copies_available=copies(Q(status='a')),
+                        copies_on_loan=copies(Q(status='o')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_bookinstance_loan_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='copies_available',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_on_loan',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='copies_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_copies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# The autocomplete endpoints filter with istartswith, which compiles to "column LIKE 'x%'" on SQLite and
+# "UPPER(column::text) LIKE UPPER('x%')" on PostgreSQL. A plain index serves neither: SQLite's LIKE is
+# case-insensitive and needs a NOCASE index, PostgreSQL needs the expression with text_pattern_ops.
+PREFIX_INDEXES = [
+    ('author_last_name_prefix_idx', 'catalog_author', 'last_name'),
+    ('author_first_name_prefix_idx', 'catalog_author', 'first_name'),
+    ('genre_name_prefix_idx', 'catalog_genre', 'name'),
+    ('language_name_prefix_idx', 'catalog_language', 'name'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for name, table, column in PREFIX_INDEXES:
+        if vendor == 'sqlite':
+            schema_editor.execute(f'CREATE INDEX {name} ON {table} ({column} COLLATE NOCASE)')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'CREATE INDEX {name} ON {table} ((UPPER({column}::text)) text_pattern_ops)')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for name, table, column in PREFIX_INDEXES:
+            schema_editor.execute(f'DROP INDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_book_isbn_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -12,6 +12,10 @@ from django.contrib.auth.models import User
 class Genre(models.Model):
     name = models.CharField(max_length=200, help_text="Enter a book genre (e.g. Science Fiction, French Poetry etc.)")
 
+    class Meta:
+        # Autocomplete: name prefix searches, ordered by name.
+        indexes = [models.Index(fields=['name'], name='genre_name_idx')]
+
     def __str__(self):
         return self.name
 
@@ -22,6 +26,9 @@ class Language(models.Model):
         help_text="Enter the book's natural language (e.g. English, French, Japanese etc)."
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['name'], name='language_name_idx')]
+
     def __str__(self):
         return self.name
 
@@ -34,10 +41,25 @@ class Book(models.Model):
                             help_text='13 Character <a href="https://www.isbn-international.org/content/what-isbn">ISBN number</a>')
     genre = models.ManyToManyField(Genre, help_text="Select a genre for this book")
     language = models.ForeignKey('Language', on_delete=models.SET_NULL, null=True)
+    # Maintained with F() updates by catalog.counters.adjust_copy_counts(), repaired by recount_copies.
+    copies_total = models.PositiveIntegerField(default=0, editable=False)
+    copies_available = models.PositiveIntegerField(default=0, editable=False)
+    copies_on_loan = models.PositiveIntegerField(default=0, editable=False)
+    # Also touched when its copies, genres or language change (see catalog.conditional).
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COPY_COUNT_FIELDS = ('copies_total', 'copies_available', 'copies_on_loan')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Never write back copy counts read before a copy changed: they are only updated in place.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.COPY_COUNT_FIELDS]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('book-detail', args=[str(self.id)])
 
@@ -46,10 +68,21 @@ class Book(models.Model):
 
     class Meta:
         ordering = ["title"]
+        # The importer matches rows to existing books by ISBN.
+        indexes = [models.Index(fields=['isbn'], name='book_isbn_idx')]
 
     display_genre.short_description = 'Genre'
 
 
+class BookInstanceQuerySet(models.QuerySet):
+    def on_loan(self):
+        return self.filter(status__exact='o')
+
+    def overdue(self, today=None):
+        """Loans past their due date; the SQL counterpart of is_overdue."""
+        return self.on_loan().filter(due_back__lt=today or date.today())
+
+
 class BookInstance(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4,
                           help_text="Unique ID for this particular book across whole library")
@@ -57,6 +90,7 @@ class BookInstance(models.Model):
     imprint = models.CharField(max_length=200)
     due_back = models.DateField(null=True, blank=True)
     borrower = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     LOAN_STATUS = (
         ('m', 'Maintenance'),
@@ -67,6 +101,8 @@ class BookInstance(models.Model):
     status = models.CharField(max_length=1, choices=LOAN_STATUS, blank=True, default='m',
                               help_text='Book availability')
 
+    objects = BookInstanceQuerySet.as_manager()
+
     @property
     def is_overdue(self):
         if self.due_back and date.today() > self.due_back:
@@ -76,6 +112,14 @@ class BookInstance(models.Model):
     class Meta:
         ordering = ["due_back"]
         permissions = (('can_mark_returned', 'Set book as returned'),)
+        indexes = [
+            # All borrowed: status='o' ORDER BY due_back (id breaks ties for cursor pagination).
+            models.Index(fields=['status', 'due_back', 'id'], name='bookinst_status_due_idx'),
+            # My books: borrower=? AND status='o' ORDER BY due_back.
+            models.Index(fields=['borrower', 'status', 'due_back', 'id'], name='bookinst_borrower_due_idx'),
+            # Available copies, counted overall and looked up per book.
+            models.Index(fields=['book'], condition=models.Q(status='a'), name='bookinst_available_idx'),
+        ]
 
     def __str__(self):
         return f"{self.id} ({self.book.title})"
@@ -86,12 +130,77 @@ class Author(models.Model):
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField("Died", null=True, blank=True)
+    # Also touched when a book is added to or removed from the author.
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["last_name"]
+        indexes = [
+            # Author list and autocomplete: last_name prefix searches, ordered by last_name.
+            models.Index(fields=['last_name', 'first_name'], name='author_name_idx'),
+        ]
 
     def get_absolute_url(self):
         return reverse('author-detail', args=[str(self.id)])
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
+
+
+class Counter(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class Hold(models.Model):
+    """A reader's place in the queue for a book; see catalog.circulation."""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # The copy set aside when the hold reached the front of the queue.
+    book_instance = models.ForeignKey(BookInstance, on_delete=models.SET_NULL, null=True, blank=True)
+    ready_at = models.DateTimeField(null=True, blank=True)
+
+    HOLD_STATUS = (
+        ('w', 'Waiting'),
+        ('r', 'Ready for pickup'),
+        ('f', 'Fulfilled'),
+        ('c', 'Cancelled'),
+    )
+    status = models.CharField(max_length=1, choices=HOLD_STATUS, default='w')
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            # The queue: book=? AND status='w' ORDER BY created_at, id.
+            models.Index(fields=['book', 'status', 'created_at', 'id'], name='hold_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'borrower'], condition=models.Q(status__in=['w', 'r']),
+                                    name='hold_one_active_per_reader'),
+            models.UniqueConstraint(fields=['book_instance'], condition=models.Q(status='r'),
+                                    name='hold_one_per_ready_copy'),
+        ]
+
+    def __str__(self):
+        return f"{self.borrower}: {self.book} ({self.get_status_display()})"
+
+
+class LoanReminder(models.Model):
+    """An overdue-loan reminder: one per copy and due date, so reruns never remind twice."""
+    book_instance = models.ForeignKey(BookInstance, on_delete=models.CASCADE)
+    borrower = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    due_back = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book_instance', 'due_back'], name='loanreminder_once_per_due_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_instance_id} due {self.due_back}"
@@ -0,0 +1,198 @@
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+CURSOR_SALT = 'catalog.pagination.cursor'
+
+
+class CursorPage:
+    """A page of a keyset-paginated list; it knows its neighbours but not the total count."""
+    is_cursor_page = True
+
+    def __init__(self, object_list, next_querystring=None, previous_querystring=None):
+        self.object_list = object_list
+        self.next_querystring = next_querystring
+        self.previous_querystring = previous_querystring
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_querystring is not None
+
+    def has_previous(self):
+        return self.previous_querystring is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginationMixin:
+    """
+    Keyset pagination for ListView: pages are selected with WHERE on the ordering keys
+    (plus pk as a tie-breaker) instead of OFFSET, and no COUNT(*) is run.
+
+    Opt in per view with `cursor_pagination = True`, for the whole site with the
+    CATALOG_CURSOR_PAGINATION setting, or per request by passing `?cursor=`.
+    """
+    cursor_pagination = None
+    cursor_query_param = 'cursor'
+
+    def use_cursor_pagination(self):
+        if self.cursor_query_param in self.request.GET:
+            return True
+        if self.cursor_pagination is None:
+            return getattr(settings, 'CATALOG_CURSOR_PAGINATION', False)
+        return self.cursor_pagination
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        window, keys, values, backwards = self.cursor_window(queryset, page_size)
+        rows = list(window)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        has_next = (has_more and not backwards) or (backwards and values is not None)
+        has_previous = (has_more and backwards) or (not backwards and values is not None)
+        page = CursorPage(
+            rows,
+            next_querystring=self.cursor_querystring('next', keys, rows[-1]) if has_next and rows else None,
+            previous_querystring=self.cursor_querystring('previous', keys, rows[0]) if has_previous and rows else None,
+        )
+        return None, page, rows, page.has_other_pages()
+
+    def cursor_window(self, queryset, page_size):
+        """
+        The requested page's rows plus the next one, as a sliced queryset, with the keys, the
+        cursor's key values (None on the first page) and whether the cursor points backwards.
+        """
+        keys = cursor_keys(queryset)
+        token = self.request.GET.get(self.cursor_query_param)
+        direction, values = decode_cursor(token, keys) if token else ('next', None)
+
+        backwards = direction == 'previous'
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(keys, values, backwards))
+        return queryset.order_by(*keyset_ordering(keys, backwards))[:page_size + 1], keys, values, backwards
+
+    def cursor_querystring(self, direction, keys, row):
+        query = self.request.GET.copy()
+        query.pop('page', None)
+        query[self.cursor_query_param] = encode_cursor(direction, keys, row)
+        return query.urlencode()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for the admin changelists of big tables: an unfiltered list takes its count from the
+    database's table statistics instead of a COUNT(*) over every row, once there are at least
+    `estimate_threshold` rows. Filtered lists are still counted exactly.
+    """
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimated_count(self.object_list.model, self.object_list.db)
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return super().count
+
+
+def estimated_count(model, using):
+    """An approximate row count of the model's table, or None if the database cannot tell cheaply."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute('SELECT table_rows FROM information_schema.tables '
+                           'WHERE table_schema = DATABASE() AND table_name = %s', [table])
+        elif connection.vendor == 'sqlite':
+            # Rowids grow with every insert, so the largest one is an upper bound found in one index seek.
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for a table that has never been analyzed.
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def cursor_keys(queryset):
+    """[(field, descending)] from the queryset ordering or Meta.ordering, with pk appended."""
+    opts = queryset.model._meta
+    ordering = queryset.query.order_by or opts.ordering
+    keys = []
+    for name in ordering:
+        if not isinstance(name, str):
+            raise ValueError(f'Cursor pagination needs plain field orderings, got {name!r}')
+        descending = name.startswith('-')
+        field = opts.pk if name.lstrip('-') == 'pk' else opts.get_field(name.lstrip('-'))
+        keys.append((field, descending))
+    if not any(field.primary_key for field, _ in keys):
+        keys.append((opts.pk, False))
+    return keys
+
+
+def keyset_ordering(keys, backwards=False):
+    # NULLs always sort after the non-NULL values when paging forwards.
+    ordering = []
+    for field, descending in keys:
+        expression = F(field.attname)
+        if backwards:
+            descending = not descending
+        nulls = ({'nulls_first': True} if backwards else {'nulls_last': True}) if field.null else {}
+        ordering.append(expression.desc(**nulls) if descending else expression.asc(**nulls))
+    return ordering
+
+
+def keyset_filter(keys, values, backwards=False):
+    """Rows strictly beyond `values` in (backwards) key order: k1 > v1 OR (k1 = v1 AND k2 > v2) OR ..."""
+    condition = Q(pk__in=[])
+    equal = Q()
+    for (field, descending), value in zip(keys, values):
+        condition |= equal & beyond(field, value, descending != backwards, nulls_beyond=not backwards)
+        equal &= Q(**{f'{field.attname}__isnull': True}) if value is None else Q(**{field.attname: value})
+    return condition
+
+
+def beyond(field, value, descending, nulls_beyond):
+    if value is None:
+        return Q(**{f'{field.attname}__isnull': False}) if not nulls_beyond else Q(pk__in=[])
+    condition = Q(**{f"{field.attname}__{'lt' if descending else 'gt'}": value})
+    if field.null and nulls_beyond:
+        condition |= Q(**{f'{field.attname}__isnull': True})
+    return condition
+
+
+def encode_cursor(direction, keys, row):
+    values = [field.value_to_string(row) if getattr(row, field.attname) is not None else None
+              for field, _ in keys]
+    return signing.dumps([direction, values], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, keys):
+    try:
+        direction, values = signing.loads(token, salt=CURSOR_SALT)
+        if direction not in ('next', 'previous') or len(values) != len(keys):
+            raise ValueError(direction)
+        return direction, [None if value is None else field.to_python(value)
+                           for (field, _), value in zip(keys, values)]
+    except (signing.BadSignature, ValidationError, ValueError, TypeError):
+        raise Http404('Invalid cursor')
@@ -0,0 +1,66 @@
+import datetime
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BookInstance, LoanReminder
+from .pagination import cursor_keys, keyset_filter
+
+
+def overdue_chunks(today, chunk_size):
+    """Yield lists of (due_back, id, borrower_id) for overdue loans, walking (due_back, id) by keyset."""
+    queryset = BookInstance.objects.overdue(today).order_by('due_back', 'id')
+    keys = cursor_keys(queryset)
+    loans = list(queryset.values_list('due_back', 'id', 'borrower_id')[:chunk_size])
+    while loans:
+        yield loans
+        # The redundant due_back >= bound lets the index range scan start at the cursor, not at the oldest loan.
+        after = queryset.filter(keyset_filter(keys, loans[-1][:2]), due_back__gte=loans[-1][0])
+        loans = list(after.values_list('due_back', 'id', 'borrower_id')[:chunk_size])
+
+
+def reminder_message(reminder):
+    borrower = reminder.borrower
+    title = reminder.book_instance.book.title if reminder.book_instance.book else reminder.book_instance.imprint
+    return EmailMessage(
+        subject=f'Overdue: {title}',
+        body=(f'Dear {borrower.first_name or borrower.username},\n\n'
+              f'"{title}" was due back on {reminder.due_back:%Y-%m-%d}. Please return or renew it.\n'),
+        to=[borrower.email],
+    )
+
+
+def process_overdue(today=None, chunk_size=1000, send_email=True):
+    """
+    Record a LoanReminder for every overdue loan and email the borrowers, one transaction per chunk.
+    Yields (loans scanned, reminders sent) totals after each chunk.
+
+    Safe to rerun or to resume after a crash: reminders are unique per copy and due date, and
+    only those not sent yet for the loan's current due date are emailed.
+    """
+    today = today or datetime.date.today()
+    scanned = sent = 0
+    with get_connection() as mail:
+        for loans in overdue_chunks(today, chunk_size):
+            with transaction.atomic():
+                LoanReminder.objects.bulk_create([
+                    LoanReminder(book_instance_id=pk, due_back=due_back, borrower_id=borrower_id)
+                    for due_back, pk, borrower_id in loans
+                ], ignore_conflicts=True)
+                if send_email:
+                    pending = list(
+                        LoanReminder.objects
+                        .filter(book_instance_id__in=[pk for due_back, pk, borrower_id in loans],
+                                due_back=F('book_instance__due_back'), sent_at__isnull=True,
+                                borrower__isnull=False)
+                        .exclude(borrower__email='')
+                        .select_related('book_instance__book', 'borrower')
+                    )
+                    mail.send_messages([reminder_message(reminder) for reminder in pending])
+                    LoanReminder.objects.filter(pk__in=[reminder.pk for reminder in pending]).update(
+                        sent_at=timezone.now())
+                    sent += len(pending)
+            scanned += len(loans)
+            yield scanned, sent
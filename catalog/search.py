@@ -0,0 +1,150 @@
+import re
+
+from django.core import signing
+from django.db import connection, connections, router
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+from .models import Book
+
+SEARCH_TABLE = 'catalog_booksearch'
+CURSOR_SALT = 'catalog.search.cursor'
+WORD_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    return WORD_RE.findall(query.lower())[:10]
+
+
+class SqliteBackend:
+    # FTS5 virtual table; rowid is the book id. bm25() is lower-is-better, weights follow the column order.
+    score_sql = f'bm25({SEARCH_TABLE}, 10.0, 1.0, 4.0, 2.0, 10.0)'
+
+    def insert(self, cursor, rows):
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, title, summary, author, genre, isbn) VALUES (%s, %s, %s, %s, %s, %s)',
+            rows,
+        )
+
+    def delete(self, cursor, book_ids):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(book_ids))})', book_ids)
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    def match_sql(self, terms):
+        sql = f'SELECT rowid AS book_id, {self.score_sql} AS score FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+        return sql, [' '.join(f'"{term}"*' for term in terms)]
+
+
+class PostgresBackend:
+    # tsvector column with a GIN index; ts_rank() is negated so both backends sort by ascending score.
+    document_sql = (
+        "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'D') || "
+        "setweight(to_tsvector('simple', %s), 'B') || setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'A')"
+    )
+
+    def insert(self, cursor, rows):
+        cursor.executemany(f'INSERT INTO {SEARCH_TABLE} (book_id, document) VALUES (%s, {self.document_sql})', rows)
+
+    def delete(self, cursor, book_ids):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE book_id = ANY(%s)', [list(book_ids)])
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {SEARCH_TABLE}')
+
+    def match_sql(self, terms):
+        # float8, as the cursor sends the score back: a real would not compare equal to its float8 value.
+        sql = (f"SELECT book_id, -ts_rank(document, query)::float8 AS score "
+               f"FROM {SEARCH_TABLE}, to_tsquery('simple', %s) query WHERE document @@ query")
+        return sql, [' & '.join(f'{term}:*' for term in terms)]
+
+
+BACKENDS = {
+    'sqlite': SqliteBackend(),
+    'postgresql': PostgresBackend(),
+}
+
+
+def backend(using=None):
+    return BACKENDS[(using or connection).vendor]
+
+
+def document_rows(book_ids):
+    books = (Book.objects.filter(pk__in=book_ids)
+             .annotate(author_name=Concat('author__first_name', Value(' '), 'author__last_name'))
+             .values_list('pk', 'title', 'summary', 'author_name', 'isbn'))
+    genres = {}
+    for book_id, name in Book.genre.through.objects.filter(book_id__in=book_ids).values_list('book_id', 'genre__name'):
+        genres.setdefault(book_id, []).append(name)
+    return [(pk, title, summary, author_name or '', ' '.join(genres.get(pk, [])), isbn)
+            for pk, title, summary, author_name, isbn in books]
+
+
+def index_books(book_ids):
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    with connection.cursor() as cursor:
+        backend().delete(cursor, book_ids)
+        backend().insert(cursor, document_rows(book_ids))
+
+
+def remove_books(book_ids):
+    book_ids = list(book_ids)
+    if book_ids:
+        with connection.cursor() as cursor:
+            backend().delete(cursor, book_ids)
+
+
+def rebuild(chunk_size=1000):
+    with connection.cursor() as cursor:
+        backend().clear(cursor)
+    indexed = 0
+    last_pk = 0
+    while True:
+        book_ids = list(Book.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not book_ids:
+            return indexed
+        index_books(book_ids)
+        indexed += len(book_ids)
+        last_pk = book_ids[-1]
+
+
+def search(query, after=None, backwards=False, limit=10):
+    """
+    Rank books matching every word of `query` (as a prefix), return [(book_id, score)] in rank order.
+    `after` is the (score, book_id) of the row to continue from, in the direction given by `backwards`.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    # A replica when the request may read from one (see locallibrary.replicas).
+    using = connections[router.db_for_read(Book)]
+    match_sql, params = backend(using).match_sql(terms)
+    sql = f'SELECT book_id, score FROM ({match_sql}) matches'
+    if after is not None:
+        op = '<' if backwards else '>'
+        sql += f' WHERE score {op} %s OR (score = %s AND book_id {op} %s)'
+        params += [after[0], after[0], after[1]]
+    order = 'DESC' if backwards else 'ASC'
+    sql += f' ORDER BY score {order}, book_id {order} LIMIT %s'
+    params.append(limit)
+    with using.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if backwards:
+        rows.reverse()
+    return rows
+
+
+def encode_cursor(direction, row):
+    return signing.dumps([direction, row[1], row[0]], salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    direction, score, book_id = signing.loads(token, salt=CURSOR_SALT)
+    if direction not in ('next', 'previous'):
+        raise ValueError(direction)
+    return direction, (float(score), int(book_id))
@@ -0,0 +1,84 @@
+import datetime
+import itertools
+import random
+
+from django.contrib.auth.models import User
+
+from . import counters, search
+from .models import Author, Book, BookInstance, Genre, Language
+
+
+# Share of copies in each status, and the range of due dates (days from today) of the copies on loan.
+STATUS_WEIGHTS = {'a': 50, 'o': 30, 'r': 10, 'm': 10}
+DUE_DAYS = (-60, 28)
+
+
+def zipf_weights(n, exponent=1.0):
+    """Cumulative weights under which the item of rank k is picked in proportion to 1 / k**exponent."""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+
+def seed_library(books=1000, authors=200, copies_per_book=2, genres=20, languages=5, users=20,
+                 batch_size=1000, seed=0, zipf_exponent=1.0):
+    """
+    Bulk-insert a synthetic catalog and return the created objects' counts.
+
+    Authors, languages, genres and borrowers are picked with Zipfian popularity, so a few authors
+    write most of the books, as in a real library. Copies get a mix of statuses; the loans are a mix of
+    overdue ones and ones due over the next four weeks.
+    """
+    rnd = random.Random(seed)
+    today = datetime.date.today()
+
+    genre_objs = Genre.objects.bulk_create(
+        [Genre(name=f'Genre {num}') for num in range(genres)], batch_size=batch_size)
+    language_objs = Language.objects.bulk_create(
+        [Language(name=f'Language {num}') for num in range(languages)], batch_size=batch_size)
+    author_objs = Author.objects.bulk_create(
+        [Author(first_name=f'First{num}', last_name=f'Last{num:06d}') for num in range(authors)],
+        batch_size=batch_size)
+    user_objs = User.objects.bulk_create(
+        [User(username=f'reader{num}') for num in range(users)], batch_size=batch_size)
+
+    book_authors = rnd.choices(author_objs, cum_weights=zipf_weights(authors, zipf_exponent), k=books)
+    book_languages = rnd.choices(language_objs, cum_weights=zipf_weights(languages, zipf_exponent), k=books)
+    book_objs = Book.objects.bulk_create([
+        Book(title=f'Book {num:07d}', author=author, summary=f'Summary of book {num}',
+             isbn=f'{num:013d}', language=language)
+        for num, (author, language) in enumerate(zip(book_authors, book_languages))
+    ], batch_size=batch_size)
+
+    genre_weights = zipf_weights(genres, zipf_exponent)
+    Through = Book.genre.through
+    Through.objects.bulk_create([
+        Through(book_id=book.pk, genre_id=genre.pk)
+        for book in book_objs
+        for genre in (set(rnd.choices(genre_objs, cum_weights=genre_weights, k=2)) if genre_objs else ())
+    ], batch_size=batch_size)
+
+    statuses = rnd.choices(list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values()), k=books * copies_per_book)
+    borrower_weights = zipf_weights(users, zipf_exponent)
+    copies = []
+    for book, status in zip((book for book in book_objs for _ in range(copies_per_book)), statuses):
+        on_loan = status == 'o' and user_objs
+        copies.append(BookInstance(
+            book=book,
+            imprint=f'Imprint {rnd.randint(1, 50)}',
+            status=status,
+            due_back=today + datetime.timedelta(days=rnd.randint(*DUE_DAYS)) if on_loan else None,
+            borrower=rnd.choices(user_objs, cum_weights=borrower_weights)[0] if on_loan else None,
+        ))
+    BookInstance.objects.bulk_create(copies, batch_size=batch_size)
+
+    # bulk_create() bypasses the signals that keep the counters and the search index in sync.
+    counters.rebuild()
+    counters.recount_copies()
+    search.rebuild()
+    return {
+        'genres': len(genre_objs),
+        'languages': len(language_objs),
+        'authors': len(author_objs),
+        'users': len(user_objs),
+        'books': len(book_objs),
+        'instances': len(copies),
+    }
@@ -0,0 +1,68 @@
+"""
+Catalog write paths shared by the views, the admin and the import tooling.
+
+They insert in bulk and so skip the model signals: they update the counters, the search index, the
+page fragments and the authors' updated_at themselves, as the receivers in signals.py would.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import conditional, counters, fragments, search
+from .fragments import scope
+from .models import Author, Book
+
+
+def create_books(books, genres):
+    """
+    Insert unsaved books, and genres[i] (genre objects or pks) for books[i], in one transaction:
+    one INSERT for the books and one for all their genres, however many there are.
+    """
+    with transaction.atomic():
+        books = Book.objects.bulk_create(books)
+        Through = Book.genre.through
+        Through.objects.bulk_create([
+            Through(book_id=book.pk, genre_id=getattr(genre, 'pk', genre))
+            for book, book_genres in zip(books, genres)
+            for genre in dict.fromkeys(book_genres)
+        ])
+
+        counters.increment('books', len(books))
+        counters.increment('books_title_with_word', sum(counters.title_has_word(book.title) for book in books))
+        search.index_books([book.pk for book in books])
+        conditional.touch(Author.objects.filter(pk__in={book.author_id for book in books} - {None}))
+        fragments.bump(*[scope('book', book.pk) for book in books],
+                       *{scope('author', book.author_id) for book in books})
+    return books
+
+
+def update_books(books, genres):
+    """
+    Save books that exist already and replace their genres with genres[i], in one transaction: one bulk
+    UPDATE for the books, then one DELETE and one INSERT for their genres. Copy counts are left alone.
+    """
+    with transaction.atomic():
+        old = {pk: (title, author_id) for pk, title, author_id
+               in Book.objects.filter(pk__in=[book.pk for book in books]).values_list('pk', 'title', 'author_id')}
+        for book in books:
+            book.updated_at = timezone.now()
+        Book.objects.bulk_update(books, ['title', 'summary', 'isbn', 'author', 'language', 'updated_at'])
+        Through = Book.genre.through
+        Through.objects.filter(book_id__in=old).delete()
+        Through.objects.bulk_create([
+            Through(book_id=book.pk, genre_id=getattr(genre, 'pk', genre))
+            for book, book_genres in zip(books, genres)
+            for genre in dict.fromkeys(book_genres)
+        ])
+
+        counters.increment('books_title_with_word', sum(
+            counters.title_has_word(book.title) - counters.title_has_word(old[book.pk][0]) for book in books))
+        search.index_books(old)
+        author_ids = {book.author_id for book in books} | {author_id for title, author_id in old.values()}
+        conditional.touch(Author.objects.filter(pk__in=author_ids - {None}))
+        fragments.bump(*[scope('book', pk) for pk in old], *[scope('author', pk) for pk in author_ids - {None}])
+    return books
+
+
+def create_book(book, genres=()):
+    """Insert an unsaved book (e.g. from form.save(commit=False)) and its genres."""
+    return create_books([book], [genres])[0]
@@ -0,0 +1,254 @@
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import conditional, counters, fragments, search
+from .fragments import scope
+from .models import Author, Book, BookInstance, Genre, Language
+
+# Values as they were loaded from the database, so post_save can work out deltas without re-reading the row.
+TRACKED_FIELDS = {
+    Book: ('title', 'author_id'),
+    BookInstance: ('status', 'book_id'),
+}
+
+
+def remember_loaded_values(instance):
+    instance._loaded_values = {
+        field: instance.__dict__[field]
+        for field in TRACKED_FIELDS[type(instance)] if field in instance.__dict__
+    }
+
+
+@receiver(post_init, sender=Book)
+@receiver(post_init, sender=BookInstance)
+def track_loaded_values(sender, instance, **kwargs):
+    remember_loaded_values(instance)
+
+
+def load_deferred_values(sender, instance):
+    missing = [field for field in TRACKED_FIELDS[sender] if field not in instance._loaded_values]
+    if missing and not instance._state.adding:
+        row = sender.objects.filter(pk=instance.pk).values(*missing).first() or {}
+        instance._loaded_values.update(row)
+
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=BookInstance)
+def load_deferred_values_before_save(sender, instance, raw, **kwargs):
+    if not raw:
+        load_deferred_values(sender, instance)
+
+
+# The post_delete receivers cannot load deferred fields any more: the row is gone by then.
+@receiver(pre_delete, sender=Book)
+@receiver(pre_delete, sender=BookInstance)
+def load_deferred_values_before_delete(sender, instance, **kwargs):
+    load_deferred_values(sender, instance)
+
+
+@receiver(post_save, sender=Book)
+def count_saved_book(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    has_word = counters.title_has_word(instance.title)
+    if created:
+        counters.increment('books')
+        counters.increment('books_title_with_word', int(has_word))
+    else:
+        had_word = counters.title_has_word(instance._loaded_values.get('title'))
+        counters.increment('books_title_with_word', int(has_word) - int(had_word))
+
+
+@receiver(post_delete, sender=Book)
+def count_deleted_book(sender, instance, **kwargs):
+    counters.increment('books', -1)
+    if counters.title_has_word(instance._loaded_values.get('title')):
+        counters.increment('books_title_with_word', -1)
+
+
+@receiver(post_save, sender=BookInstance)
+def count_saved_bookinstance(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    is_available = instance.status == 'a'
+    if created:
+        counters.increment('instances')
+        counters.increment('instances_available', int(is_available))
+    else:
+        was_available = instance._loaded_values.get('status') == 'a'
+        counters.increment('instances_available', int(is_available) - int(was_available))
+
+
+@receiver(post_delete, sender=BookInstance)
+def count_deleted_bookinstance(sender, instance, **kwargs):
+    counters.increment('instances', -1)
+    if instance._loaded_values.get('status') == 'a':
+        counters.increment('instances_available', -1)
+
+
+@receiver(post_save, sender=BookInstance)
+def count_saved_copy_on_book(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    changes = [(instance.book_id, instance.status, 1)]
+    if not created:
+        changes.append((instance._loaded_values.get('book_id'), instance._loaded_values.get('status'), -1))
+    counters.adjust_copy_counts(changes)
+
+
+@receiver(post_delete, sender=BookInstance)
+def count_deleted_copy_on_book(sender, instance, **kwargs):
+    loaded = instance._loaded_values
+    counters.adjust_copy_counts([(loaded.get('book_id'), loaded.get('status'), -1)])
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def count_created_row(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.increment(f'{sender._meta.model_name}s')
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def count_deleted_row(sender, instance, **kwargs):
+    counters.increment(f'{sender._meta.model_name}s', -1)
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, raw, **kwargs):
+    if not raw:
+        search.index_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, **kwargs):
+    search.remove_books([instance.pk])
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def index_book_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.index_books([instance.pk])
+    elif action == 'pre_clear':
+        instance._reindex_book_ids = list(instance.book_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        search.index_books(instance._reindex_book_ids)
+    elif action in ('post_add', 'post_remove'):
+        search.index_books(pk_set)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def index_renamed_books(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        search.index_books(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+def remember_books_to_reindex(sender, instance, **kwargs):
+    instance._reindex_book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def reindex_orphaned_books(sender, instance, **kwargs):
+    search.index_books(instance._reindex_book_ids)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def bump_book_fragments(sender, instance, signal, **kwargs):
+    author_ids = {instance._loaded_values.get('author_id')}
+    if signal is post_save:
+        author_ids.add(instance.author_id)
+    fragments.bump(scope('book', instance.pk), *[scope('author', pk) for pk in author_ids])
+
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def bump_copy_fragments(sender, instance, signal, **kwargs):
+    book_ids = {instance._loaded_values.get('book_id')}
+    if signal is post_save:
+        book_ids.add(instance.book_id)
+    book_ids.discard(None)
+    fragments.bump_books(book_ids)
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def bump_book_genre_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        fragments.bump(scope('book', instance.pk))
+    else:
+        book_ids = pk_set if action != 'post_clear' else instance._reindex_book_ids
+        fragments.bump(*[scope('book', pk) for pk in book_ids])
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def bump_author_fragments(sender, instance, **kwargs):
+    fragments.bump(scope('author', instance.pk))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+def bump_taxonomy_fragments(sender, instance, **kwargs):
+    fragments.bump(fragments.TAXONOMY)
+
+
+@receiver(post_save, sender=BookInstance)
+def touch_copy_book(sender, instance, created, raw, **kwargs):
+    # A new copy, or a change of status or book, is touched by adjust_copy_counts() with the copy counts.
+    loaded = instance._loaded_values
+    if not created and not raw and instance.book_id and \
+            (loaded.get('book_id'), loaded.get('status')) == (instance.book_id, instance.status):
+        conditional.touch(Book.objects.filter(pk=instance.book_id))
+
+
+@receiver(post_save, sender=Book)
+def touch_saved_book_authors(sender, instance, created, raw, **kwargs):
+    author_ids = {instance.author_id, instance._loaded_values.get('author_id')}
+    if not raw and (created or len(author_ids) > 1):
+        conditional.touch(Author.objects.filter(pk__in=author_ids - {None}))
+
+
+@receiver(pre_delete, sender=Book)
+def touch_deleted_book_relations(sender, instance, **kwargs):
+    # Deleting the book unlinks its copies without saving them.
+    conditional.touch(Author.objects.filter(pk=instance._loaded_values.get('author_id')))
+    conditional.touch(instance.bookinstance_set.all())
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def touch_genre_books(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        conditional.touch(Book.objects.filter(pk=instance.pk))
+    else:
+        conditional.touch(Book.objects.filter(pk__in=pk_set if action != 'post_clear' else instance._reindex_book_ids))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Language)
+@receiver(pre_delete, sender=Author)
+def touch_related_books(sender, instance, signal, **kwargs):
+    # Book pages show these names, and deleting one unlinks its books without saving them.
+    if signal is post_save and (kwargs['created'] or kwargs['raw']):
+        return
+    conditional.touch(instance.book_set.all())
+
+
+# Registered last: the receivers above still need the values the instance was loaded with.
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=BookInstance)
+def reset_loaded_values(sender, instance, **kwargs):
+    remember_loaded_values(instance)
@@ -0,0 +1,57 @@
+// Turns every <select data-autocomplete-url> into a search box: options are fetched from the
+// endpoint as the user types, and the selected ones are kept.
+(function () {
+    'use strict';
+
+    function setUp(select) {
+        var input = document.createElement('input');
+        var timer = null;
+        var pending = null;
+        input.type = 'search';
+        input.placeholder = 'Type to search';
+        input.autocomplete = 'off';
+        select.parentNode.insertBefore(input, select);
+
+        function render(results) {
+            var present = {};
+            Array.prototype.slice.call(select.options).forEach(function (option) {
+                if (option.selected || option.value === '') {
+                    present[option.value] = true;
+                } else {
+                    select.removeChild(option);
+                }
+            });
+            results.forEach(function (result) {
+                if (!present[result.id]) {
+                    select.appendChild(new Option(result.text, result.id));
+                }
+            });
+        }
+
+        function search() {
+            if (pending) {
+                pending.abort();
+            }
+            pending = new AbortController();
+            fetch(select.dataset.autocompleteUrl + '?q=' + encodeURIComponent(input.value.trim()),
+                  {credentials: 'same-origin', signal: pending.signal})
+                .then(function (response) { return response.json(); })
+                .then(function (data) { render(data.results); })
+                .catch(function () {});
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(search, 250);
+        });
+        input.addEventListener('focus', function () {
+            if (select.options.length <= 1) {
+                search();
+            }
+        }, {once: true});
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        Array.prototype.forEach.call(document.querySelectorAll('select[data-autocomplete-url]'), setUp);
+    });
+})();
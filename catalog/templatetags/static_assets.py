@@ -0,0 +1,30 @@
+import functools
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.safestring import mark_safe
+
+from locallibrary.static_bundles import read_source
+
+register = template.Library()
+
+
+@functools.lru_cache(maxsize=None)
+def _collected(path):
+    with staticfiles_storage.open(path) as f:
+        return f.read().decode()
+
+
+@register.simple_tag
+def inline_static(path):
+    """
+    A static file's contents, for inlining small assets such as the critical CSS into the page: the
+    collected copy, or the source (the bundle built from its sources) in DEBUG or before collectstatic.
+    """
+    if not settings.DEBUG:
+        try:
+            return mark_safe(_collected(path))
+        except FileNotFoundError:
+            pass
+    return mark_safe(read_source(path))
@@ -0,0 +1,9 @@
+from django.urls import include, path
+
+from ..urls import async_urlpatterns
+
+# The project URLs with the async catalog pages resolved first, as with CATALOG_ASYNC_VIEWS on.
+urlpatterns = [
+    path('catalog/', include(async_urlpatterns)),
+    path('', include('locallibrary.urls')),
+]
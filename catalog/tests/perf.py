@@ -0,0 +1,144 @@
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.template.base import Template
+from django.test.utils import CaptureQueriesContext
+
+from .. import fragments, visits
+from ..benchmarking import catalog_route_urls
+from ..seeding import seed_library
+
+BUDGET_FILE = Path(__file__).with_name('perf_budgets.json')
+TIME_KEYS = ('sql_time', 'render_time', 'total_time')
+# Wall-clock times vary with the machine and its load, so only PERF_CHECK_TIMES=1 runs hold routes to
+# their time budgets; query counts are always checked.
+CHECK_TIMES = os.environ.get('PERF_CHECK_TIMES', '') == '1'
+
+
+def seed_perf_dataset():
+    seed_library(books=3000, authors=1000, copies_per_book=3, users=50)
+    librarian = User.objects.create_user(username='perf-librarian', password='perf', is_staff=True)
+    librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+    return librarian
+
+
+class RenderTimer:
+    """Time spent in the outermost template render, excluding the SQL the template triggered lazily."""
+
+    def __init__(self, queries):
+        self.queries = queries
+        self.elapsed = 0.0
+        self.depth = 0
+
+    def __enter__(self):
+        self.original = Template._render
+        timer = self
+
+        def timed_render(template, context):
+            if timer.depth:
+                return timer.original(template, context)
+            timer.depth += 1
+            first_query = len(timer.queries)
+            start = time.perf_counter()
+            try:
+                return timer.original(template, context)
+            finally:
+                sql_time = sum(float(q['time']) for q in timer.queries.captured_queries[first_query:])
+                timer.elapsed += time.perf_counter() - start - sql_time
+                timer.depth -= 1
+
+        Template._render = timed_render
+        return self
+
+    def __exit__(self, *exc_info):
+        Template._render = self.original
+
+
+def measure(client, url):
+    with CaptureQueriesContext(connection) as queries, RenderTimer(queries) as renders:
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            # Streaming views do their queries while the body is consumed.
+            b''.join(response.streaming_content)
+        total_time = time.perf_counter() - start
+    return response, {
+        'queries': len(queries),
+        'sql_time': sum(float(q['time']) for q in queries.captured_queries),
+        'render_time': max(renders.elapsed, 0.0),
+        'total_time': total_time,
+    }
+
+
+def reset_caches():
+    # Budgets are for the cold path (template fragments rendered from the database) and for the common
+    # case of a visit that does not flush the visit buffer.
+    fragments.cache().clear()
+    visits.cache().delete(visits.BUFFER_KEY)
+
+
+def measure_routes(client, repeat=3):
+    results = {}
+    for name, url in catalog_route_urls():
+        client.get(url)
+        runs = []
+        for _ in range(repeat):
+            reset_caches()
+            runs.append(measure(client, url)[1])
+        results[name] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        results[name]['queries'] = max(run['queries'] for run in runs)
+    return results
+
+
+def load_budgets():
+    with open(BUDGET_FILE) as f:
+        return json.load(f)
+
+
+def write_budgets(results):
+    budgets = {
+        name: {key: round(value, 4) if key in TIME_KEYS else value for key, value in result.items()}
+        for name, result in sorted(results.items())
+    }
+    with open(BUDGET_FILE, 'w') as f:
+        json.dump(budgets, f, indent=2)
+        f.write('\n')
+
+
+class QueryBudgetMixin:
+    """
+    Fails a test when a route issues more queries than its checked-in budget, or, with CHECK_TIMES, gets
+    noticeably slower: times may exceed the baseline by `time_tolerance` times or `time_slack` seconds.
+    """
+    check_times = CHECK_TIMES
+    time_tolerance = 3.0
+    time_slack = 0.05
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.budgets = load_budgets()
+
+    def assertWithinBudget(self, name, measured):
+        budget = self.budgets.get(name)
+        if budget is None:
+            self.fail(f'No budget for route {name!r}, run "manage.py update_perf_budgets"')
+        self.assertLessEqual(measured['queries'], budget['queries'], f'{name}: query budget exceeded')
+        if not self.check_times:
+            return
+        for key in TIME_KEYS:
+            limit = max(budget[key] * self.time_tolerance, budget[key] + self.time_slack)
+            self.assertLessEqual(measured[key], limit, f'{name}: {key} budget exceeded')
+
+    def assertRouteWithinBudget(self, name, url):
+        self.client.get(url)  # warm up template loading and URL resolving
+        reset_caches()
+        response, measured = measure(self.client, url)
+        self.assertLess(response.status_code, 400, f'{name}: {url} returned {response.status_code}')
+        self.assertWithinBudget(name, measured)
+        return response
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Author, Book, BookInstance, Genre
+from ..pagination import EstimatedCountPaginator
+from ..seeding import seed_library
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_library(books=120, authors=20, copies_per_book=1, users=10)
+        cls.admin = User.objects.create_superuser(username='admin', password='pass')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, model_name):
+        url = reverse(f'admin:catalog_{model_name}_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 100)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.assertLessEqual(self.changelist_queries('book'), 8)
+        self.assertLessEqual(self.changelist_queries('bookinstance'), 8)
+
+    def test_change_forms_use_autocomplete(self):
+        copy = BookInstance.objects.first()
+        response = self.client.get(reverse('admin:catalog_bookinstance_change', args=[copy.pk]))
+        self.assertContains(response, 'data-field-name="book"')
+        # Loans and holds change copies through catalog.circulation, not by hand.
+        self.assertNotContains(response, 'name="borrower"')
+        self.assertNotContains(response, 'name="status"')
+        self.assertNotContains(response, '<option value="%s"' % Book.objects.last().pk)
+
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'catalog', 'model_name': 'bookinstance', 'field_name': 'book', 'term': '0000017',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Book 0000017'])
+
+    def test_author_books_inline_is_read_only(self):
+        author = Author.objects.annotate(books=Count('book')).order_by('-books').first()
+        url = reverse('admin:catalog_author_change', args=[author.pk])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        book = author.book_set.first()
+        self.assertContains(response, reverse('admin:catalog_book_change', args=[book.pk]))
+        self.assertNotContains(response, '<option value="%s"' % Genre.objects.first().pk)
+        self.assertLessEqual(len(queries), 12)
+
+        response = self.client.get(reverse('admin:catalog_book_change', args=[book.pk]))
+        self.assertContains(response, 'data-field-name="genre"')
+        self.assertContains(response, 'data-field-name="language"')
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed_library(books=30, authors=5, copies_per_book=0, users=0)
+
+    def test_estimates_unfiltered_counts_over_threshold(self):
+        Book.objects.filter(title='Book 0000000').delete()
+        paginator = EstimatedCountPaginator(Book.objects.all(), 10)
+        paginator.estimate_threshold = 10
+        # The SQLite estimate is the largest rowid, so it still includes the deleted book.
+        self.assertEqual(paginator.count, 30)
+
+    def test_counts_exactly_below_threshold_or_filtered(self):
+        self.assertEqual(EstimatedCountPaginator(Book.objects.all(), 10).count, 30)
+        paginator = EstimatedCountPaginator(Book.objects.filter(title__lt='Book 0000010'), 10)
+        paginator.estimate_threshold = 1
+        self.assertEqual(paginator.count, 10)
@@ -0,0 +1,69 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+
+from .. import async_views, fragments
+from ..models import Author, Book, BookInstance, Genre
+from .test_views import create_books
+
+
+def create_catalog():
+    author = Author.objects.create(first_name='John', last_name='Smith')
+    create_books(author, 13, copies_per_book=2)
+    return author
+
+
+@override_settings(ROOT_URLCONF='catalog.tests.async_urls', CATALOG_ASYNC_PARALLEL_QUERIES=False)
+class AsyncViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_catalog()
+        cls.book = Book.objects.first()
+
+    def setUp(self):
+        fragments.cache().clear()
+
+    def assertSameAsSync(self, url):
+        async_response = self.client.get(url)
+        with override_settings(ROOT_URLCONF='locallibrary.urls'):
+            sync_response = self.client.get(url)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        if async_response.status_code == 200:
+            self.assertHTMLEqual(async_response.content.decode(), sync_response.content.decode())
+        return async_response
+
+    def test_routes_resolve_to_async_views(self):
+        self.assertIs(resolve(reverse('books')).func, async_views.book_list)
+        self.assertIs(resolve(reverse('book-detail', args=[1])).func, async_views.book_detail)
+
+    def test_pages_match_sync_views(self):
+        for url in [reverse('books'), reverse('books') + '?page=2', reverse('books') + '?page=3',
+                    reverse('books') + '?page=last', reverse('books') + '?cursor=', reverse('authors'),
+                    reverse('book-detail', args=[self.book.pk]), reverse('book-detail', args=[0]),
+                    reverse('author-detail', args=[self.author.pk])]:
+            with self.subTest(url=url):
+                fragments.cache().clear()
+                self.assertSameAsSync(url)
+
+    async def test_async_client(self):
+        response = await self.async_client.get(reverse('book-detail', args=[self.book.pk]))
+        self.assertContains(response, self.book.title)
+        response = await self.async_client.get(reverse('index'))
+        self.assertEqual(response.context['num_books'], 13)
+        self.assertIn('num_visits', response.cookies)
+
+
+@override_settings(ROOT_URLCONF='catalog.tests.async_urls')
+class AsyncParallelQueriesTest(TransactionTestCase):
+    # Parallel queries run on other threads' connections, which only see committed rows.
+
+    def test_detail_and_list_pages(self):
+        author = create_catalog()
+        book = Book.objects.first()
+        response = self.client.get(reverse('book-detail', args=[book.pk]))
+        self.assertEqual(list(response.context['genres']), list(Genre.objects.filter(book=book)))
+        self.assertEqual(list(response.context['copies']), list(BookInstance.objects.filter(book=book)))
+        response = self.client.get(reverse('author-detail', args=[author.pk]))
+        self.assertEqual(len(response.context['books']), 13)
+        response = self.client.get(reverse('books') + '?page=2')
+        self.assertEqual(response.context['paginator'].count, 13)
+        self.assertEqual(len(response.context['book_list']), 3)
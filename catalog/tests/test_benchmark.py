@@ -0,0 +1,74 @@
+import json
+import tempfile
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from .. import benchmarking, counters
+from ..models import Book, BookInstance
+
+
+class SeedLibraryTest(TestCase):
+    def test_skewed_data(self):
+        call_command('seed_library', books=2000, authors=200, copies_per_book=2, users=50, stdout=StringIO())
+        self.assertEqual((Book.objects.count(), BookInstance.objects.count()), (2000, 4000))
+        self.assertEqual(counters.rebuild(), {})
+
+        books_per_author = sorted(Counter(Book.objects.values_list('author', flat=True)).values(), reverse=True)
+        # Zipf: the most popular author has about a sixth of the books, the median author a handful.
+        self.assertGreater(books_per_author[0], 250)
+        self.assertLess(books_per_author[len(books_per_author) // 2], 10)
+
+        statuses = Counter(BookInstance.objects.values_list('status', flat=True))
+        self.assertEqual(set(statuses), {'a', 'o', 'r', 'm'})
+        self.assertGreater(statuses['a'], statuses['o'])
+        self.assertTrue(BookInstance.objects.overdue().exists())
+        self.assertTrue(BookInstance.objects.filter(status='o').exclude(id__in=BookInstance.objects.overdue()).exists())
+
+        with self.assertRaises(CommandError):
+            call_command('seed_library', books=10, stdout=StringIO())
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_library', books=50, users=5, stdout=StringIO())
+        cls.librarian = User.objects.create_user(username='librarian', password='12345', is_staff=True)
+
+    def test_report(self):
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command('benchmark', route=['books', 'book-detail', 'all-borrowed'], requests=5, concurrency=1,
+                         user='librarian', output=output.name, stderr=StringIO())
+            report = json.load(output)
+        self.assertEqual(report['catalog'], {'books': 50, 'copies': 150})
+        self.assertEqual(list(report['routes']), ['books', 'book-detail', 'all-borrowed'])
+        books = report['routes']['books']
+        self.assertEqual((books['requests'], books['errors'], books['statuses']), (5, 0, [200]))
+        self.assertLessEqual(books['latency_ms']['p50'], books['latency_ms']['p99'])
+        # The librarian lacks can_mark_returned.
+        self.assertEqual(report['routes']['all-borrowed']['statuses'], [403])
+        self.assertEqual(report['routes']['all-borrowed']['errors'], 5)
+
+        stderr = StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as old:
+            json.dump(report, old)
+            old.flush()
+            call_command('benchmark', route=['books'], requests=2, concurrency=1, compare=old.name,
+                         stdout=StringIO(), stderr=stderr)
+        self.assertIn('Change against the earlier report', stderr.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('benchmark', route=['no-such-route'], stdout=StringIO())
+
+
+class LatencyStatsTest(SimpleTestCase):
+    def test_percentiles(self):
+        stats = benchmarking.latency_stats([num / 1000 for num in range(100, 0, -1)])
+        self.assertEqual(stats, {'p50': 50.0, 'p90': 90.0, 'p95': 95.0, 'p99': 99.0, 'mean': 50.5, 'max': 100.0})
+        self.assertEqual(benchmarking.compare(
+            {'books': {'throughput': 100, 'latency_ms': stats}},
+            {'books': {'throughput': 50, 'latency_ms': dict(stats, p50=100.0)}, 'authors': {}},
+        ), {'books': {'throughput': 0.5, 'p50': 2.0, 'p95': 1.0}})
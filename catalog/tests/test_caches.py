@@ -0,0 +1,71 @@
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from locallibrary import cache_backends, cache_config
+
+
+class CacheConfigTest(SimpleTestCase):
+    def test_parse_urls(self):
+        self.assertEqual(cache_config.parse('redis://:secret@redis:6379/1?timeout=600&socket_timeout=5', 'pages'), {
+            'BACKEND': 'locallibrary.cache_backends.RedisCache',
+            'LOCATION': 'redis://:secret@redis:6379/1',
+            'KEY_PREFIX': 'pages',
+            'ALIAS': 'pages',
+            'TIMEOUT': 600,
+            'OPTIONS': {'socket_timeout': 5},
+        })
+        config = cache_config.parse('memcached://10.0.0.1:11211,10.0.0.2:11211', 'sessions')
+        self.assertEqual(config['LOCATION'], ['10.0.0.1:11211', '10.0.0.2:11211'])
+        self.assertEqual(cache_config.parse('memcached:///tmp/mc.sock')['LOCATION'], 'unix:/tmp/mc.sock')
+        self.assertEqual(cache_config.parse('file:///var/tmp/cache?timeout=none', 'pages')['LOCATION'],
+                         '/var/tmp/cache/pages')
+        self.assertIsNone(cache_config.parse('file:///var/tmp/cache?timeout=none')['TIMEOUT'])
+        self.assertEqual(cache_config.parse('locmem://', 'fragments')['LOCATION'], 'fragments')
+        with self.assertRaises(ValueError):
+            cache_config.parse('mongodb://localhost')
+
+    def test_alias_override(self):
+        environ = {'CACHE_URL': 'redis://redis:6379/0', 'CACHE_SESSIONS_URL': 'memcached://mc:11211'}
+        config = cache_config.config(['default', 'sessions'], environ=environ)
+        self.assertEqual(config['default']['BACKEND'], 'locallibrary.cache_backends.RedisCache')
+        self.assertEqual(config['sessions']['BACKEND'], 'locallibrary.cache_backends.PyMemcacheCache')
+        self.assertEqual(cache_config.config(['default'], environ={})['default']['BACKEND'],
+                         'locallibrary.cache_backends.LocMemCache')
+        self.assertTrue(cache_config.is_shared(config['sessions']))
+        self.assertFalse(cache_config.is_shared(cache_config.parse('locmem://')))
+
+
+class CacheStatsTest(TestCase):
+    def setUp(self):
+        cache_backends.reset_stats()
+
+    def test_hits_and_misses_counted_once(self):
+        with tempfile.TemporaryDirectory() as path:
+            with override_settings(CACHES=cache_config.config(['default', 'pages'], environ={
+                    'CACHE_PAGES_URL': f'file://{path}'})):
+                for alias in ('default', 'pages'):
+                    cache = caches[alias]
+                    cache.set('a', 1)
+                    self.assertEqual(cache.get('a'), 1)
+                    self.assertIsNone(cache.get('b'))
+                    self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1})
+                    self.assertEqual(cache.get_or_set('a', 2), 1)
+                self.assertEqual(caches['pages'].server_stats()['entries'], 1)
+                caches['pages'].clear()
+        stats = cache_backends.stats()
+        for alias in ('default', 'pages'):
+            self.assertEqual(stats[alias], {'hits': 3, 'misses': 3, 'hit_rate': 0.5})
+
+    def test_stats_view_for_staff_only(self):
+        url = reverse('cache-stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user(username='staff', password='12345', is_staff=True))
+        caches['fragments'].get('missing')
+        report = self.client.get(url).json()
+        self.assertEqual(set(report), {'default', 'pages', 'fragments', 'sessions', 'counters'})
+        self.assertEqual(report['fragments']['misses'], 1)
+        self.assertIn('entries', report['fragments']['server'])
@@ -0,0 +1,261 @@
+import datetime
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import circulation, counters
+from ..models import Author, Book, BookInstance, Hold
+
+
+class BulkLoansTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        books = [Book.objects.create(title=title, summary='-', isbn=f'978000000000{n}')
+                 for n, title in enumerate(['Dune', 'Emma'])]
+        reader = User.objects.create_user(username='reader')
+        due_back = datetime.date.today() + datetime.timedelta(days=2)
+        cls.loans = [BookInstance.objects.create(book=book, imprint='-', status='o', borrower=reader,
+                                                 due_back=due_back)
+                     for book in books for _ in range(3)]
+        BookInstance.objects.create(book=books[0], imprint='-', status='a')
+        cls.librarian = User.objects.create_user(username='librarian', password='pass', is_staff=True)
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'),
+                                           Permission.objects.get(codename='change_bookinstance'))
+
+    def setUp(self):
+        self.client.force_login(self.librarian)
+
+    def post(self, **data):
+        return self.client.post(reverse('bulk-update-loans'), {'copies': [copy.pk for copy in self.loans[:4]],
+                                                                **data})
+
+    def assertConsistent(self):
+        self.assertEqual(counters.rebuild(), {})
+        self.assertEqual(counters.recount_copies(), 0)
+
+    def test_renew(self):
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(action='renew', due_back=due_back.isoformat())
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "catalog_bookinstance"')]
+        self.assertEqual(len(updates), 1)
+        self.assertRedirects(response, reverse('all-borrowed'))
+        self.assertEqual(BookInstance.objects.filter(due_back=due_back).count(), 4)
+        self.assertConsistent()
+
+    def test_invalid_renewal_date(self):
+        response = self.post(action='renew', due_back=(datetime.date.today() + datetime.timedelta(weeks=5)).isoformat())
+        self.assertRedirects(response, reverse('all-borrowed'))
+        self.assertFalse(BookInstance.objects.filter(due_back__gt=datetime.date.today() + datetime.timedelta(days=2)))
+        self.assertEqual([str(m) for m in response.wsgi_request._messages],
+                         ['Invalid date - renewal more than 4 weeks ahead'])
+
+    def test_return(self):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.post(action='return', next=reverse('books'))
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "catalog_bookinstance"')]
+        self.assertEqual(len(updates), 1)
+        self.assertRedirects(response, reverse('books'))
+        self.assertEqual(BookInstance.objects.on_loan().count(), 2)
+        self.assertEqual(Book.objects.get(title='Dune').copies_available, 4)
+        self.assertConsistent()
+
+        # Copies no longer on loan are rejected rather than counted twice.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post(action='return')
+        self.assertEqual(BookInstance.objects.on_loan().count(), 2)
+        self.assertConsistent()
+
+    def test_ignores_offsite_next(self):
+        response = self.post(action='return', next='https://example.com/')
+        self.assertRedirects(response, reverse('all-borrowed'))
+
+    def test_requires_permission(self):
+        self.client.force_login(User.objects.create_user(username='visitor'))
+        response = self.post(action='return')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(BookInstance.objects.on_loan().count(), 6)
+
+    def test_admin_actions(self):
+        self.librarian.is_superuser = True
+        self.librarian.save()
+        url = reverse('admin:catalog_bookinstance_changelist')
+        selected = [copy.pk for copy in self.loans[:2]]
+        self.client.post(url, {'action': 'renew_loans', '_selected_action': selected})
+        self.assertEqual(BookInstance.objects.filter(due_back=datetime.date.today() + datetime.timedelta(weeks=3))
+                         .count(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'action': 'return_loans', '_selected_action': selected})
+        self.assertEqual(BookInstance.objects.on_loan().count(), 4)
+        self.assertConsistent()
+
+    def test_admin_change_form_keeps_current_status(self):
+        self.librarian.is_superuser = True
+        self.librarian.save()
+        copy = self.loans[0]
+        stale = BookInstance.objects.get(pk=copy.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            circulation.return_loans([copy.pk])
+        # The copy is returned while the librarian's change form request is under way.
+        with mock.patch('catalog.admin.BookInstanceAdmin.get_object', return_value=stale):
+            self.client.post(reverse('admin:catalog_bookinstance_change', args=[copy.pk]),
+                             {'book': copy.book_id, 'imprint': 'Penguin', 'id': copy.pk})
+        copy.refresh_from_db()
+        self.assertEqual((copy.imprint, copy.status, copy.borrower), ('Penguin', 'a', None))
+        self.assertConsistent()
+
+
+class HoldsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='Frank', last_name='Herbert')
+        cls.book = Book.objects.create(title='Dune', author=author, summary='-', isbn='9780000000001')
+        cls.copies = [BookInstance.objects.create(book=cls.book, imprint='-', status='a') for _ in range(2)]
+        cls.readers = [User.objects.create_user(username=f'reader{n}') for n in range(4)]
+
+    def assertConsistent(self):
+        self.assertEqual(counters.rebuild(), {})
+        self.assertEqual(counters.recount_copies(), 0)
+
+    def test_checkout_and_queue(self):
+        first, second, third, fourth = self.readers
+        with self.captureOnCommitCallbacks(execute=True):
+            lent = {circulation.checkout(self.book.pk, first), circulation.checkout(self.book.pk, second)}
+            self.assertEqual(lent, {copy.pk for copy in self.copies})
+            self.assertIsNone(circulation.checkout(self.book.pk, third))
+            copy = BookInstance.objects.get(borrower=first)
+            self.assertEqual((copy.status, copy.due_back), ('o', datetime.date.today() + circulation.LOAN_PERIOD))
+
+            holds = [circulation.place_hold(self.book.pk, reader) for reader in (third, fourth)]
+            self.assertEqual([hold.status for hold in holds], ['w', 'w'])
+            self.assertEqual(circulation.place_hold(self.book.pk, third), holds[0])
+        self.assertConsistent()
+
+        # A returned copy goes to the oldest hold, not back on the shelf.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(circulation.return_loans([copy.pk]), 1)
+            copy.refresh_from_db()
+            self.assertEqual((copy.status, copy.borrower, copy.due_back), ('r', third, None))
+            self.assertEqual(Hold.objects.get(pk=holds[0].pk).book_instance, copy)
+            self.assertEqual(Book.objects.get(pk=self.book.pk).copies_available, 0)
+            self.assertIsNone(circulation.checkout(self.book.pk, fourth))
+        self.assertConsistent()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(circulation.checkout(self.book.pk, third), copy.pk)
+            self.assertEqual(Hold.objects.get(pk=holds[0].pk).status, 'f')
+        self.assertConsistent()
+
+        # Cancelling a ready hold passes its copy on; with nobody waiting it goes back on the shelf.
+        with self.captureOnCommitCallbacks(execute=True):
+            circulation.return_loans([BookInstance.objects.get(borrower=second).pk])
+            self.assertEqual(Hold.objects.get(pk=holds[1].pk).status, 'r')
+            self.assertTrue(circulation.cancel_hold(holds[1].pk))
+            self.assertFalse(circulation.cancel_hold(holds[1].pk))
+            self.assertEqual(Book.objects.get(pk=self.book.pk).copies_available, 1)
+        self.assertConsistent()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hold = circulation.place_hold(self.book.pk, fourth)
+            self.assertEqual((hold.status, hold.book_instance.status), ('r', 'r'))
+        self.assertConsistent()
+
+    def test_admin_status_actions(self):
+        admin = User.objects.create_superuser(username='admin', password='pass')
+        self.client.force_login(admin)
+        url = reverse('admin:catalog_bookinstance_changelist')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'action': 'withdraw_copies', '_selected_action': [copy.pk for copy in self.copies]})
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_available, 0)
+        hold = circulation.place_hold(self.book.pk, self.readers[0])
+        self.assertEqual(hold.status, 'w')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'action': 'shelve_copies', '_selected_action': [copy.pk for copy in self.copies]})
+        hold.refresh_from_db()
+        self.assertEqual((hold.status, hold.book_instance.borrower), ('r', self.readers[0]))
+        self.assertEqual(Book.objects.get(pk=self.book.pk).copies_available, 1)
+        self.assertConsistent()
+
+    def test_views(self):
+        librarian = User.objects.create_user(username='librarian')
+        librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.client.force_login(librarian)
+        url = reverse('book-checkout', args=[self.book.pk])
+        for reader in self.readers[:3]:
+            response = self.client.post(url, {'borrower': reader.username}, follow=True)
+        self.assertContains(response, 'reader2 has a hold on it')
+        self.assertEqual(BookInstance.objects.on_loan().count(), 2)
+        response = self.client.post(url, {'borrower': 'nobody'}, follow=True)
+        self.assertContains(response, 'No reader with this username')
+
+        self.client.force_login(self.readers[3])
+        self.assertEqual(self.client.post(url, {'borrower': 'reader3'}).status_code, 302)
+        self.assertEqual(BookInstance.objects.on_loan().count(), 2)
+        response = self.client.post(reverse('book-hold', args=[self.book.pk]), follow=True)
+        self.assertContains(response, 'You are in the queue for Dune')
+        self.assertEqual(list(Hold.objects.values_list('borrower__username', flat=True)), ['reader2', 'reader3'])
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    COPIES, READERS = 5, 20
+
+    def setUp(self):
+        counters.rebuild()  # The tables are flushed between TransactionTestCases, counters and all.
+        self.book = Book.objects.create(title='Dune', summary='-', isbn='9780000000001')
+        for _ in range(self.COPIES):
+            BookInstance.objects.create(book=self.book, imprint='-', status='a')
+        self.readers = [User.objects.create_user(username=f'reader{n}') for n in range(self.READERS)]
+
+    def run_threads(self, func, args):
+        barrier = threading.Barrier(len(args))
+        results, errors = {}, []
+
+        def work(arg):
+            try:
+                barrier.wait()
+                results[arg] = func(arg)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work, args=[arg]) for arg in args]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_each_copy_lent_once(self):
+        lent = self.run_threads(lambda reader: circulation.checkout(self.book.pk, reader), self.readers)
+        copy_ids = [copy_id for copy_id in lent.values() if copy_id is not None]
+        self.assertEqual(len(copy_ids), self.COPIES)
+        self.assertEqual(len(set(copy_ids)), self.COPIES)
+        for reader, copy_id in lent.items():
+            if copy_id is not None:
+                self.assertEqual(BookInstance.objects.get(pk=copy_id).borrower, reader)
+
+        waiting = [reader for reader in self.readers if lent[reader] is None]
+        self.run_threads(lambda reader: circulation.place_hold(self.book.pk, reader), waiting)
+        queue = [hold.borrower for hold in Hold.objects.filter(status='w')]
+        self.assertCountEqual(queue, waiting)
+
+        # Concurrent returns hand the copies to the first holds in the queue, one each.
+        self.run_threads(lambda copy_id: circulation.return_loans([copy_id]), copy_ids)
+        ready = Hold.objects.filter(status='r').select_related('book_instance')
+        self.assertEqual({hold.borrower for hold in ready}, set(queue[:self.COPIES]))
+        self.assertEqual(len({hold.book_instance_id for hold in ready}), self.COPIES)
+        self.assertTrue(all(hold.book_instance.borrower == hold.borrower for hold in ready))
+
+        lent = self.run_threads(lambda reader: circulation.checkout(self.book.pk, reader), queue)
+        self.assertEqual({reader for reader, copy_id in lent.items() if copy_id}, set(queue[:self.COPIES]))
+        self.assertEqual(BookInstance.objects.on_loan().count(), self.COPIES)
+        self.assertEqual(counters.rebuild(), {})
+        self.assertEqual(counters.recount_copies(), 0)
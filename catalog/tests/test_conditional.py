@@ -0,0 +1,120 @@
+import datetime
+
+from django.contrib.auth.models import AnonymousUser, Permission, User
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.views import generic
+
+from .. import circulation
+from ..conditional import ConditionalGetMixin
+from ..models import Author, Book, BookInstance, Genre, Language
+from .test_views import create_books
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        create_books(cls.author, 12, copies_per_book=2)
+        cls.book = Book.objects.filter(author=cls.author).first()
+        cls.librarian = User.objects.create_user(username='librarian', password='12345', is_staff=True)
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+    def etag(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('no-cache', resp['Cache-Control'])
+        self.assertIn('Last-Modified', resp)
+        return resp['ETag']
+
+    def assertNotModified(self, url, etag, queries=1):
+        with self.assertNumQueries(queries):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url in [reverse('book-detail', args=[self.book.pk]), reverse('author-detail', args=[self.author.pk]),
+                    reverse('books'), reverse('books') + '?page=2', reverse('books') + '?cursor=',
+                    reverse('authors')]:
+            with self.subTest(url=url):
+                self.assertNotModified(url, self.etag(url))
+
+        resp = self.client.get(reverse('book-detail', args=[self.book.pk]), HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(resp.status_code, 200)
+
+    def test_related_changes_change_the_etag(self):
+        book_url = reverse('book-detail', args=[self.book.pk])
+        author_url = reverse('author-detail', args=[self.author.pk])
+        list_url = reverse('books')
+        changes = [
+            lambda: BookInstance.objects.filter(book=self.book).first().save(),
+            lambda: circulation.renew_loans([BookInstance.objects.filter(book=self.book).first().pk],
+                                            datetime.date.today()),
+            lambda: self.book.genre.remove(self.book.genre.first()),
+            lambda: Genre.objects.filter(book=self.book).first().save(),
+            lambda: Language.objects.get(book=self.book).save(),
+            lambda: Author.objects.get(pk=self.author.pk).save(),
+            lambda: BookInstance.objects.create(book=self.book, imprint='New', status='a'),
+        ]
+        BookInstance.objects.filter(book=self.book).update(status='o', due_back=datetime.date.today())
+        for change in changes:
+            etags = [self.etag(url) for url in (book_url, author_url, list_url)]
+            change()
+            self.assertNotEqual(self.etag(book_url), etags[0])
+            self.assertNotEqual(self.etag(author_url), etags[1])
+            self.assertNotEqual(self.etag(list_url), etags[2])
+
+    def test_books_moving_between_authors_change_both_pages(self):
+        other = Author.objects.create(first_name='Jane', last_name='Doe')
+        urls = [reverse('author-detail', args=[pk]) for pk in (self.author.pk, other.pk)]
+        etags = [self.etag(url) for url in urls]
+        self.book.author = other
+        self.book.save()
+        self.assertEqual([self.etag(url) == etag for url, etag in zip(urls, etags)], [False, False])
+
+        etag = self.etag(urls[1])
+        self.book.delete()
+        self.assertNotEqual(self.etag(urls[1]), etag)
+
+    def test_varies_by_user(self):
+        url = reverse('book-detail', args=[self.book.pk])
+        anonymous = self.etag(url)
+        self.client.force_login(self.librarian)
+        librarian = self.etag(url)
+        self.assertNotEqual(anonymous, librarian)
+        self.assertIn('private', self.client.get(url)['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=anonymous).status_code, 200)
+
+        self.librarian.user_permissions.clear()
+        self.client.force_login(User.objects.get(pk=self.librarian.pk))
+        self.assertNotEqual(self.etag(url), librarian)
+
+    def test_export(self):
+        self.client.force_login(self.librarian)
+        url = reverse('export-catalog', kwargs={'dataset': 'books', 'fmt': 'csv'})
+        etag = self.client.get(url)['ETag']
+        # The session (the 'db' engine with the tests' per-process caches), the user, then the version.
+        self.assertNotModified(url, etag, queries=3)
+        Author.objects.get(pk=self.author.pk).save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(ROOT_URLCONF='catalog.tests.async_urls', CATALOG_ASYNC_PARALLEL_QUERIES=False)
+    def test_async_views(self):
+        for url in [reverse('book-detail', args=[self.book.pk]), reverse('author-detail', args=[self.author.pk]),
+                    reverse('books') + '?page=2']:
+            with self.subTest(url=url):
+                etag = self.etag(url)
+                with override_settings(ROOT_URLCONF='locallibrary.urls'):
+                    self.assertEqual(self.etag(url), etag)
+                self.assertNotModified(url, etag)
+
+    def test_views_without_page_version_always_render(self):
+        class Page(ConditionalGetMixin, generic.TemplateView):
+            template_name = 'index.html'
+
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH='*')
+        request.user = AnonymousUser()
+        response = Page.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,142 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import counters
+from ..models import Author, Book, BookInstance, Counter, Genre
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Billi', last_name='Boykk')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.book = Book.objects.create(title='Title', author=cls.author, summary='Some summary', isbn='123')
+        Book.objects.create(title='---', author=cls.author, summary='No words in title', isbn='456')
+        BookInstance.objects.create(book=cls.book, imprint='Good', status='a')
+        BookInstance.objects.create(book=cls.book, imprint='Good', status='o')
+
+    def test_counters_follow_creation(self):
+        self.assertEqual(counters.snapshot(), {
+            'books': 2,
+            'instances': 2,
+            'instances_available': 1,
+            'authors': 1,
+            'genres': 1,
+            'books_title_with_word': 1,
+        })
+
+    def test_status_change_moves_available_counter(self):
+        copy = BookInstance.objects.get(status='o')
+        copy.status = 'a'
+        copy.save()
+        self.assertEqual(counters.snapshot()['instances_available'], 2)
+        copy.save()
+        self.assertEqual(counters.snapshot()['instances_available'], 2)
+
+    def test_deferred_status_is_loaded_before_save(self):
+        copy = BookInstance.objects.only('id', 'imprint').get(status='a')
+        copy.status = 'm'
+        copy.save()
+        self.assertEqual(counters.snapshot()['instances_available'], 0)
+
+    def test_title_change_moves_word_counter(self):
+        book = Book.objects.get(title='---')
+        book.title = 'Now with words'
+        book.save()
+        self.assertEqual(counters.snapshot()['books_title_with_word'], 2)
+
+    def test_delete_decrements(self):
+        BookInstance.objects.filter(status='a').delete()
+        self.book.delete()
+        self.genre.delete()
+        snapshot = counters.snapshot()
+        self.assertEqual(snapshot['books'], 1)
+        self.assertEqual(snapshot['books_title_with_word'], 0)
+        self.assertEqual(snapshot['instances'], 1)
+        self.assertEqual(snapshot['instances_available'], 0)
+        self.assertEqual(snapshot['genres'], 0)
+
+    def test_rebuild_repairs_drift(self):
+        Counter.objects.filter(name='books').update(value=100)
+        Counter.objects.filter(name='authors').delete()
+        drift = counters.rebuild()
+        self.assertEqual(drift, {'books': (100, 2), 'authors': (None, 1)})
+        self.assertEqual(counters.snapshot()['books'], 2)
+
+    def test_rebuild_counters_command(self):
+        BookInstance.objects.update(status='a')
+        call_command('rebuild_counters', 'instances_available', stdout=StringIO())
+        self.assertEqual(counters.snapshot()['instances_available'], 2)
+
+    def test_index_does_not_scan_catalog_tables(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('index'))
+        self.assertEqual(resp.context['num_books'], 2)
+        self.assertEqual(resp.context['num_book_title_with_word'], 1)
+        for query in ctx.captured_queries:
+            self.assertNotIn('"catalog_book', query['sql'])
+            self.assertNotIn('"catalog_author"', query['sql'])
+
+
+class CopyCountsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Title', summary='Some summary', isbn='123')
+        cls.other = Book.objects.create(title='Other', summary='Some summary', isbn='456')
+        BookInstance.objects.create(book=cls.book, imprint='Good', status='a')
+        BookInstance.objects.create(book=cls.book, imprint='Good', status='o')
+
+    def assertCopyCounts(self, book, total, available, on_loan):
+        book.refresh_from_db()
+        self.assertEqual((book.copies_total, book.copies_available, book.copies_on_loan), (total, available, on_loan))
+
+    def test_counts_follow_copies(self):
+        self.assertCopyCounts(self.book, 2, 1, 1)
+        copy = BookInstance.objects.get(status='o')
+        copy.status = 'a'
+        copy.save()
+        self.assertCopyCounts(self.book, 2, 2, 0)
+
+        copy.book = self.other
+        copy.status = 'm'
+        copy.save()
+        self.assertCopyCounts(self.book, 1, 1, 0)
+        self.assertCopyCounts(self.other, 1, 0, 0)
+
+        BookInstance.objects.only('id').get(book=self.book).delete()
+        self.assertCopyCounts(self.book, 0, 0, 0)
+
+    def test_stale_book_save_keeps_counts(self):
+        book = Book.objects.get(pk=self.book.pk)
+        BookInstance.objects.create(book=self.book, imprint='New', status='a')
+        book.title = 'Renamed'
+        book.save()
+        self.assertCopyCounts(book, 3, 2, 1)
+
+    def test_bulk_adjust_groups_updates(self):
+        with self.assertNumQueries(2):
+            counters.adjust_copy_counts([(self.book.pk, 'a', 1), (self.other.pk, 'a', 1), (self.book.pk, 'o', -1)])
+        self.assertCopyCounts(self.book, 2, 2, 0)
+        self.assertCopyCounts(self.other, 1, 1, 0)
+
+    def test_drifted_counts_do_not_block_saves(self):
+        copy = BookInstance.objects.bulk_create([BookInstance(book=self.other, imprint='Bulk', status='o')])[0]
+        copy.status = 'a'
+        copy.save()
+        self.assertCopyCounts(self.other, 0, 1, 0)
+        self.assertEqual(counters.recount_copies(), 1)
+        self.assertCopyCounts(self.other, 1, 1, 0)
+
+    def test_recount_copies_command(self):
+        BookInstance.objects.update(status='o')
+        Book.objects.filter(pk=self.other.pk).update(copies_total=5)
+        out = StringIO()
+        call_command('recount_copies', '--chunk-size', '1', stdout=out)
+        self.assertIn('2 books drifted', out.getvalue())
+        self.assertCopyCounts(self.book, 2, 0, 2)
+        self.assertCopyCounts(self.other, 0, 0, 0)
@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from locallibrary.db_connections import DatabaseConnectionMiddleware, health_check
+
+from ..models import Book
+
+
+class StubConnection:
+    def __init__(self, usable=True, **settings):
+        self.connection = object()
+        self.settings_dict = {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True, **settings}
+        self.in_atomic_block = False
+        self.usable = usable
+        self.closed = False
+
+    def is_usable(self):
+        return self.usable
+
+    def close(self):
+        self.closed = True
+
+
+class HealthCheckTest(SimpleTestCase):
+    def test_dead_persistent_connection_is_closed(self):
+        connection = StubConnection(usable=False)
+        health_check(connection)
+        self.assertTrue(connection.closed)
+
+        connection = StubConnection(usable=True)
+        health_check(connection)
+        self.assertFalse(connection.closed)
+
+    def test_skipped_when_disabled_or_not_persistent(self):
+        for settings in [{'CONN_HEALTH_CHECKS': False}, {'CONN_MAX_AGE': 0}]:
+            connection = StubConnection(usable=False, **settings)
+            health_check(connection)
+            self.assertFalse(connection.closed)
+        connection = StubConnection(usable=False)
+        connection.in_atomic_block = True
+        health_check(connection)
+        self.assertFalse(connection.closed)
+
+
+class DatabaseConnectionMiddlewareTest(TestCase):
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('books'))
+        self.assertRegex(response['Server-Timing'], r'^db-connect;dur=\d+\.\d\d;desc="reused"$')
+
+    def test_checks_and_times_the_connection_on_first_use(self):
+        def view(request):
+            Book.objects.exists()
+            Book.objects.exists()
+            return HttpResponse()
+
+        with mock.patch('locallibrary.db_connections.health_check') as check:
+            response = DatabaseConnectionMiddleware(view)(RequestFactory().get('/'))
+        check.assert_called_once_with(connection)
+        self.assertRegex(response['Server-Timing'], r'^db-connect;dur=\d+\.\d\d;desc="reused"$')
+
+    def test_requests_without_queries_leave_the_database_alone(self):
+        middleware = DatabaseConnectionMiddleware(lambda request: HttpResponse())
+        with mock.patch('locallibrary.db_connections.health_check') as check:
+            response = middleware(RequestFactory().get('/'))
+        check.assert_not_called()
+        self.assertNotIn('Server-Timing', response)
@@ -0,0 +1,66 @@
+import csv
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import exporting
+from ..models import Author, Book, BookInstance, Genre, Language
+
+
+class ExportCatalogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        language = Language.objects.create(name='English')
+        book = Book.objects.create(title='A Wizard of Earthsea', author=author, summary='Gont, "the island"',
+                                   isbn='9780547773742', language=language)
+        book.genre.set([Genre.objects.create(name='Fantasy'), Genre.objects.create(name='Young adult')])
+        Book.objects.create(title='Untitled', summary='', isbn='1')
+        cls.copy = BookInstance.objects.create(book=book, imprint='Parnassus', status='a')
+        cls.staff = User.objects.create_user(username='staff', password='12345', is_staff=True)
+        User.objects.create_user(username='reader', password='12345')
+
+    def test_books_csv_flattens_genres(self):
+        out = StringIO()
+        call_command('export_catalog', 'books', '--chunk-size', '1', stdout=out)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['genre'], 'Fantasy;Young adult')
+        self.assertEqual(rows[0]['summary'], 'Gont, "the island"')
+        self.assertEqual(rows[0]['author_last_name'], 'Le Guin')
+        self.assertEqual(rows[1]['genre'], '')
+
+    def test_keyset_chunks_without_server_side_cursors(self):
+        cursor_rows = list(exporting.rows('books', chunk_size=1))
+        with mock.patch.dict(connection.settings_dict, DISABLE_SERVER_SIDE_CURSORS=True):
+            # Two chunks of one book, each with its genre query, and the empty chunk that ends the loop.
+            with self.assertNumQueries(5):
+                self.assertEqual(list(exporting.rows('books', chunk_size=1)), cursor_rows)
+
+    def test_copies_jsonl(self):
+        out = StringIO()
+        call_command('export_catalog', 'copies', '--format', 'jsonl', stdout=out)
+        record = json.loads(out.getvalue())
+        self.assertEqual(record['id'], str(self.copy.pk))
+        self.assertEqual(record['isbn'], '9780547773742')
+        self.assertIsNone(record['due_back'])
+
+    def test_export_view_streams_for_staff_only(self):
+        url = reverse('export-catalog', kwargs={'dataset': 'authors', 'fmt': 'csv'})
+        self.client.login(username='reader', password='12345')
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.login(username='staff', password='12345')
+        resp = self.client.get(url)
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        self.assertEqual(b''.join(resp.streaming_content).decode().splitlines()[1], f'{Author.objects.get().pk},Ursula,Le Guin,,')
+
+        resp = self.client.get(reverse('export-catalog', kwargs={'dataset': 'users', 'fmt': 'csv'}))
+        self.assertEqual(resp.status_code, 404)
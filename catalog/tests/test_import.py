@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters, search
+from ..models import Author, Book, BookInstance, Genre, Language
+
+
+class ImportCatalogTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def call(self, *args):
+        call_command('import_catalog', *args, stdout=StringIO())
+
+    def test_import_books_and_copies(self):
+        Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        books = self.write('books.csv', (
+            'title,author_first_name,author_last_name,summary,isbn,language,genre\n'
+            'A Wizard of Earthsea,Ursula,Le Guin,Gont.,9780547773742,English,Fantasy;Young adult\n'
+            'The Dispossessed,Ursula,Le Guin,Anarres.,9780061054884,English,Science fiction\n'
+            'Solaris,Stanislaw,Lem,The ocean.,9780156027601,Polish,Science fiction\n'
+        ))
+        copies = self.write('copies.jsonl.gz', '\n'.join(json.dumps(record) for record in [
+            {'isbn': '9780547773742', 'imprint': 'Parnassus', 'status': 'a'},
+            {'isbn': '9780547773742', 'imprint': 'Parnassus', 'status': 'o', 'due_back': '2030-01-01'},
+            {'isbn': '0000000000000', 'imprint': 'Unknown book'},
+        ]))
+
+        self.call('books', books, '--batch-size', '2')
+        self.call('copies', copies)
+
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Language.objects.count(), 2)
+        self.assertEqual(sorted(Genre.objects.values_list('name', flat=True)),
+                         ['Fantasy', 'Science fiction', 'Young adult'])
+        earthsea = Book.objects.get(isbn='9780547773742')
+        self.assertEqual(earthsea.display_genre(), 'Fantasy, Young adult')
+        self.assertEqual(str(earthsea.author), 'Ursula Le Guin')
+        self.assertEqual(earthsea.bookinstance_set.count(), 2)
+        self.assertEqual((earthsea.copies_total, earthsea.copies_available, earthsea.copies_on_loan), (2, 1, 1))
+        self.assertEqual(BookInstance.objects.count(), 2)
+
+        self.assertEqual(counters.rebuild(), {})
+        self.assertEqual(counters.recount_copies(), 0)
+        self.assertEqual([book_id for book_id, score in search.search('lem')],
+                         [Book.objects.get(title='Solaris').pk])
+
+    def test_reimport_updates_books_by_isbn(self):
+        books = 'title,author,summary,isbn,genre\nSolaris,Stanislaw Lem,{},9780156027601,{}\nUntitled,,-,,\n'
+        self.call('books', self.write('books.csv', books.format('The ocean.', 'Science fiction')))
+        self.call('books', self.write('books.csv', books.format('The living ocean.', 'Classics')))
+
+        self.assertEqual(Book.objects.count(), 3)
+        solaris = Book.objects.get(isbn='9780156027601')
+        self.assertEqual((solaris.summary, solaris.display_genre()), ('The living ocean.', 'Classics'))
+        self.assertEqual([book_id for book_id, score in search.search('living')], [solaris.pk])
+        self.assertEqual(search.search('science'), [])
+        self.assertEqual(counters.rebuild(), {})
+
+    def test_import_lookup_tables(self):
+        self.call('genres', self.write('genres.csv', 'name\nPoetry\nPoetry\nDrama\n'))
+        self.call('authors', self.write('authors.jsonl', json.dumps(
+            {'first_name': 'Anna', 'last_name': 'Akhmatova', 'date_of_birth': '1889-06-23'})))
+        self.assertEqual(Genre.objects.count(), 2)
+        self.assertEqual(str(Author.objects.get().date_of_birth), '1889-06-23')
+        self.assertEqual(counters.rebuild(), {})
+        self.assertEqual(counters.recount_copies(), 0)
+
+    def test_imported_copies_show_on_cached_page(self):
+        author = Author.objects.create(first_name='Anna', last_name='Akhmatova')
+        book = Book.objects.create(title='Book', author=author, summary='Summary', isbn='1')
+        url = reverse('book-detail', args=[book.pk])
+        self.assertContains(self.client.get(url), '0 available')
+        self.call('copies', self.write('copies.csv', 'isbn,imprint,status\n1,Good,a\n1,Good,a\n'))
+        self.assertContains(self.client.get(url), '2 available')
+
+    def test_bad_row_rolls_back_its_chunk(self):
+        Book.objects.create(title='Book', summary='Summary', isbn='1')
+        copies = self.write('copies.csv', 'isbn,imprint,status\n1,Good,a\n1,Bad,x\n')
+        with self.assertRaisesMessage(CommandError, "line 3: invalid status 'x'"):
+            self.call('copies', copies)
+        self.assertEqual(BookInstance.objects.count(), 0)
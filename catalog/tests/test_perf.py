@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase, TestCase
+
+from ..benchmarking import catalog_route_urls
+from .perf import QueryBudgetMixin, seed_perf_dataset
+
+
+class CatalogRouteBudgetTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarian = seed_perf_dataset()
+
+    def test_every_route_within_budget(self):
+        self.client.force_login(self.librarian)
+        for name, url in catalog_route_urls():
+            with self.subTest(route=name):
+                self.assertRouteWithinBudget(name, url)
+
+
+class TimeBudgetTest(QueryBudgetMixin, SimpleTestCase):
+    def test_times_checked_on_request(self):
+        self.budgets = {'books': {'queries': 2, 'sql_time': 0.001, 'render_time': 0.001, 'total_time': 0.002}}
+        slow = {'queries': 2, 'sql_time': 0.1, 'render_time': 0.1, 'total_time': 0.2}
+        self.check_times = False
+        self.assertWithinBudget('books', slow)
+        self.check_times = True
+        with self.assertRaisesMessage(AssertionError, 'books: sql_time budget exceeded'):
+            self.assertWithinBudget('books', slow)
+        with self.assertRaisesMessage(AssertionError, 'books: query budget exceeded'):
+            self.assertWithinBudget('books', dict(slow, queries=3))
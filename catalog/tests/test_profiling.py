@@ -0,0 +1,94 @@
+import json
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from locallibrary import profiling
+
+from ..models import Author, Book
+from .test_views import create_books
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_values_collapse(self):
+        self.assertEqual(profiling.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+                         'SELECT * FROM "t" WHERE "id" IN (...) LIMIT ?')
+        self.assertEqual(profiling.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s)'),
+                         'SELECT * FROM "t" WHERE "id" IN (%s)')
+        self.assertEqual(profiling.fingerprint("SELECT 'it''s' FROM \"T3\""), 'SELECT ? FROM "T3"')
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_FLUSH_INTERVAL=3600)
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        create_books(cls.author, 3, copies_per_book=2)
+        cls.book = Book.objects.first()
+        cls.staff = User.objects.create_user(username='staff', password='12345', is_staff=True)
+
+    def setUp(self):
+        profiling.reset()
+
+    def test_records_route(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('book-detail', args=[self.book.pk]))
+        num_queries = len(queries)
+        self.client.get('/catalog/no-such-page/')
+        report = profiling.summary()
+        self.assertEqual(list(report), ['book-detail'])
+        stats = report['book-detail']
+        self.assertEqual((stats['requests'], stats['samples']), (1, 1))
+        self.assertEqual(stats['queries']['p99'], num_queries)
+        self.assertEqual(stats['size']['p50'], len(response.content))
+        self.assertGreater(stats['render_time']['p50'], 0)
+        self.assertLess(stats['render_time']['p50'] + stats['sql_time']['p50'], stats['wall_time']['p50'])
+
+    def test_streaming_response(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export-catalog', kwargs={'dataset': 'books', 'fmt': 'csv'}))
+        self.assertNotIn('export-catalog', profiling.summary())
+        with CaptureQueriesContext(connection) as queries:
+            body = b''.join(response.streaming_content)
+        stats = profiling.summary()['export-catalog']
+        self.assertEqual(stats['size']['p50'], len(body))
+        self.assertGreaterEqual(stats['queries']['p50'], len(queries) + 1)
+
+    def test_duplicate_queries(self):
+        for num in range(3):
+            profile = profiling.Profile()
+            profile.queries = [('SELECT "name" FROM "author" WHERE "id" = %s', 0.001)] * (num + 1)
+            profile.queries.append(('SELECT "id" FROM "book" WHERE "id" IN (%s, %s)', 0.001))
+            profile.queries.append(('SELECT "id" FROM "book" WHERE "id" IN (%s, %s, %s)', 0.001))
+            profiling.record('author-detail', profile, 0.01, 100)
+        stats = profiling.summary()['author-detail']
+        self.assertEqual(stats['queries'], {'p50': 4, 'p95': 5, 'p99': 5})
+        self.assertEqual(stats['duplicates'], [
+            {'sql': 'SELECT "id" FROM "book" WHERE "id" IN (...)', 'requests': 3, 'max_executions': 2},
+            {'sql': 'SELECT "name" FROM "author" WHERE "id" = %s', 'requests': 2, 'max_executions': 3},
+        ])
+
+    def test_flush_to_file(self):
+        with tempfile.NamedTemporaryFile('r') as log:
+            with self.settings(PROFILING_FLUSH_INTERVAL=0, PROFILING_LOG_FILE=log.name):
+                self.client.get(reverse('books'))
+                self.client.get(reverse('authors'))
+            lines = [json.loads(line) for line in log]
+        self.assertEqual([list(line['routes']) for line in lines], [['books'], ['authors', 'books']])
+
+    def test_report_page(self):
+        url = reverse('perf-report')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.get(reverse('authors'))
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertContains(response, '<td>authors</td>', html=True)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_off(self):
+        self.client.get(reverse('books'))
+        self.assertEqual(profiling.summary(), {})
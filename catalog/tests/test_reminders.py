@@ -0,0 +1,60 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Book, BookInstance, LoanReminder
+
+TODAY = datetime.date(2030, 6, 15)
+
+
+class OverdueRemindersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        book = Book.objects.create(title='Solaris', summary='The ocean.', isbn='9780156027601')
+        reader = User.objects.create_user(username='reader', email='reader@example.com', first_name='Kris')
+        no_email = User.objects.create_user(username='no-email')
+        cls.overdue = [
+            BookInstance.objects.create(book=book, imprint='A', status='o', borrower=reader,
+                                        due_back=TODAY - datetime.timedelta(days=days))
+            for days in (1, 1, 30)
+        ]
+        cls.overdue.append(BookInstance.objects.create(book=book, imprint='B', status='o', borrower=no_email,
+                                                       due_back=TODAY - datetime.timedelta(days=2)))
+        BookInstance.objects.create(book=book, imprint='C', status='o', borrower=reader, due_back=TODAY)
+        BookInstance.objects.create(book=book, imprint='D', status='a', due_back=TODAY - datetime.timedelta(days=5))
+
+    def call(self, *args):
+        out = StringIO()
+        call_command('process_overdue', '--date', TODAY.isoformat(), '--chunk-size', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_overdue_queryset(self):
+        self.assertEqual(set(BookInstance.objects.overdue(TODAY)), set(self.overdue))
+        self.assertTrue(all(copy.is_overdue for copy in BookInstance.objects.overdue()))
+
+    def test_reminds_once_per_due_date(self):
+        self.assertIn('4 overdue loans scanned, 3 reminders sent', self.call())
+        self.assertEqual(LoanReminder.objects.count(), 4)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        self.assertIn('"Solaris" was due back on', mail.outbox[0].body)
+
+        self.assertIn('4 overdue loans scanned, 0 reminders sent', self.call())
+        self.assertEqual(len(mail.outbox), 3)
+
+        # A renewed loan that runs over again gets a new reminder.
+        copy = self.overdue[2]
+        copy.due_back = TODAY - datetime.timedelta(days=3)
+        copy.save()
+        self.assertIn('1 reminders sent', self.call())
+        self.assertEqual(LoanReminder.objects.filter(book_instance=copy).count(), 2)
+
+    def test_resumes_unsent_reminders(self):
+        self.call('--no-email')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(LoanReminder.objects.filter(sent_at__isnull=True).count(), 4)
+        self.assertIn('3 reminders sent', self.call())
@@ -0,0 +1,55 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from locallibrary.replicas import STICKY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, replica_reads
+
+from .. import views
+from ..models import Book
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(SimpleTestCase):
+    def route(self, request, view=views.index):
+        """Return the database a read inside `view` would use, and the response."""
+        databases = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            databases.append(ReplicaRouter().db_for_read(Book))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return databases[0], response
+
+    def test_safe_requests_read_from_replica(self):
+        database, response = self.route(RequestFactory().get('/catalog/books/'))
+        self.assertEqual(database, 'replica')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(ReplicaRouter().db_for_write(Book), 'default')
+
+    def test_post_pins_to_primary_and_sticks(self):
+        database, response = self.route(RequestFactory().post('/catalog/book/add/'))
+        self.assertEqual(database, 'default')
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 15)
+
+        request = RequestFactory().get('/catalog/books/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        self.assertEqual(self.route(request)[0], 'default')
+
+    def test_admin_and_write_views_use_primary(self):
+        self.assertEqual(self.route(RequestFactory().get('/admin/catalog/book/'))[0], 'default')
+        request = RequestFactory().get('/catalog/book/add/')
+        self.assertEqual(self.route(request, views.add_book_librarian)[0], 'default')
+        self.assertEqual(self.route(request, views.BookUpdate.as_view())[0], 'default')
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(ReplicaRouter().db_for_read(Book), 'default')
+        with replica_reads():
+            self.assertEqual(ReplicaRouter().db_for_read(Book), 'replica')
+        with override_settings(DATABASE_REPLICAS=[]), replica_reads():
+            self.assertEqual(ReplicaRouter().db_for_read(Book), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertIs(ReplicaRouter().allow_migrate('replica', 'catalog'), False)
+        self.assertIsNone(ReplicaRouter().allow_migrate('default', 'catalog'))
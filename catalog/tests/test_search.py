@@ -0,0 +1,110 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Author, Book, Genre
+
+
+class SearchIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.book = Book.objects.create(title='A Wizard of Earthsea', author=cls.author,
+                                       summary='A young mage on the island of Gont.', isbn='9780547773742')
+        cls.book.genre.set([cls.genre])
+        Book.objects.create(title='The Dispossessed', author=cls.author, summary='Anarres and Urras.',
+                            isbn='9780061054884')
+        Book.objects.create(title='Wizard and Glass', summary='The gunslinger.', isbn='9780452279179')
+
+    def titles(self, query, **kwargs):
+        return [Book.objects.get(pk=book_id).title for book_id, score in search.search(query, **kwargs)]
+
+    def test_matches_every_indexed_column(self):
+        self.assertEqual(self.titles('earthsea'), ['A Wizard of Earthsea'])
+        self.assertEqual(self.titles('gont'), ['A Wizard of Earthsea'])
+        self.assertEqual(sorted(self.titles('guin')), ['A Wizard of Earthsea', 'The Dispossessed'])
+        self.assertEqual(self.titles('fantasy'), ['A Wizard of Earthsea'])
+        self.assertEqual(self.titles('9780061054884'), ['The Dispossessed'])
+
+    def test_prefix_and_all_words(self):
+        self.assertEqual(sorted(self.titles('wiz')), ['A Wizard of Earthsea', 'Wizard and Glass'])
+        self.assertEqual(self.titles('wizard ursula'), ['A Wizard of Earthsea'])
+        self.assertEqual(self.titles('!!!'), [])
+
+    def test_reads_from_the_routed_database(self):
+        with mock.patch.object(search.router, 'db_for_read', return_value='default') as db_for_read:
+            rows = search.search('earthsea')
+        db_for_read.assert_called_once_with(Book)
+        self.assertEqual([book_id for book_id, score in rows], [self.book.pk])
+
+    def test_title_outranks_summary(self):
+        Book.objects.create(title='Islands', summary='Wizard lore.', isbn='1')
+        self.assertEqual(self.titles('wizard')[-1], 'Islands')
+
+    def test_signals_keep_index_in_sync(self):
+        self.author.last_name = 'LeGuin'
+        self.author.save()
+        self.assertEqual(len(self.titles('leguin')), 2)
+
+        self.book.genre.clear()
+        self.assertEqual(self.titles('fantasy'), [])
+        self.genre.book_set.add(self.book)
+        self.assertEqual(self.titles('fantasy'), ['A Wizard of Earthsea'])
+        self.genre.delete()
+        self.assertEqual(self.titles('fantasy'), [])
+
+        self.book.delete()
+        self.assertEqual(self.titles('earthsea'), [])
+
+    def test_score_round_trips_through_cursor(self):
+        # Scores come back from the cursor as Python floats; PostgreSQL must compare them exactly.
+        for num in range(12):
+            Book.objects.create(title=f'Book {num}', summary=' '.join(['Common'] * (num % 3 + 1)), isbn=f'c{num}')
+        rows = search.search('common', limit=20)
+        self.assertEqual(len(rows), 12)
+        for row, following in zip(rows, rows[1:]):
+            self.assertEqual(search.search('common', after=search.decode_cursor(
+                search.encode_cursor('next', row))[1], limit=1), [following])
+
+    def test_rebuild_command(self):
+        search.remove_books(Book.objects.values_list('pk', flat=True))
+        self.assertEqual(self.titles('wizard'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.titles('wizard')), 2)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for num in range(25):
+            Book.objects.create(title=f'Book {num}', summary='Common words.', isbn=str(num))
+
+    def test_cursor_pages_cover_all_results(self):
+        seen = []
+        resp = self.client.get(reverse('search'), {'q': 'common'})
+        self.assertTemplateUsed(resp, 'catalog/book_search.html')
+        while True:
+            seen += [book.pk for book in resp.context['book_list']]
+            page = resp.context['page_obj']
+            if not page.has_next():
+                break
+            resp = self.client.get(reverse('search') + '?' + page.next_querystring)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+        resp = self.client.get(reverse('search') + '?' + resp.context['page_obj'].previous_querystring)
+        self.assertEqual([book.pk for book in resp.context['book_list']], seen[10:20])
+
+    def test_empty_query(self):
+        resp = self.client.get(reverse('search'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.context['book_list'])
+
+    def test_tampered_cursor_is_404(self):
+        resp = self.client.get(reverse('search'), {'q': 'common', 'cursor': 'garbage'})
+        self.assertEqual(resp.status_code, 404)
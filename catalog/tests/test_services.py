@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters, search, services
+from ..models import Author, Book, Genre, Language
+
+
+class CreateBooksTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Jane', last_name='Austen')
+        cls.language = Language.objects.create(name='English')
+        cls.genres = [Genre.objects.create(name=name) for name in ('Romance', 'Satire', 'Classic')]
+
+    def book(self, title):
+        return Book(title=title, summary='-', isbn='9780141439518', author=self.author, language=self.language)
+
+    def assertConsistent(self):
+        self.assertEqual(counters.rebuild(), {})
+        book_id = search.search('austen satire pride')[0][0]
+        self.assertEqual(Book.objects.get(pk=book_id).title, 'Pride and Prejudice')
+
+    def test_create_book_queries(self):
+        # SAVEPOINT, INSERT book, INSERT genres, 2 counter UPDATEs, 4 to index it, touch the author,
+        # RELEASE SAVEPOINT.
+        with self.assertNumQueries(11):
+            book = services.create_book(self.book('Pride and Prejudice'), self.genres[:2])
+        self.assertEqual(set(book.genre.all()), set(self.genres[:2]))
+        self.assertConsistent()
+
+    def test_create_books_queries_do_not_grow_with_books(self):
+        books = [self.book('Pride and Prejudice')] + [self.book(f'Emma {num}') for num in range(20)]
+        with self.assertNumQueries(11):
+            services.create_books(books, [[genre.pk for genre in self.genres]] * len(books))
+        self.assertEqual(Book.genre.through.objects.count(), 63)
+        self.assertConsistent()
+
+    def test_failure_leaves_no_book(self):
+        with mock.patch.object(search, 'index_books', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                services.create_book(self.book('Pride and Prejudice'), self.genres)
+        self.assertFalse(Book.objects.exists())
+        self.assertFalse(Book.genre.through.objects.exists())
+
+    def test_add_book_view_and_admin(self):
+        user = User.objects.create_superuser(username='admin', password='pass')
+        self.client.force_login(user)
+        data = {'title': 'Pride and Prejudice', 'summary': '-', 'isbn': '9780141439518',
+                'author': self.author.pk, 'language': self.language.pk, 'genre': [self.genres[1].pk]}
+        self.client.post(reverse('book-add'), data)
+        self.assertConsistent()
+
+        self.client.post(reverse('admin:catalog_book_add'), dict(
+            data, title='Emma', **{'bookinstance_set-TOTAL_FORMS': 0, 'bookinstance_set-INITIAL_FORMS': 0}))
+        book = Book.objects.get(title='Emma')
+        self.assertEqual(list(book.genre.all()), [self.genres[1]])
+        self.assertEqual(counters.rebuild(), {})
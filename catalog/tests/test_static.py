@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from locallibrary.static_bundles import build_bundle, minify_css, read_source
+
+from ..templatetags import static_assets
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class MinifyCssTest(SimpleTestCase):
+    def test_minify(self):
+        css = '/*! License */\n/* note */\n.nav > li > a:hover,\n.x {\n  content: " ; } ";\n  color: #fff;\n}\n'
+        self.assertEqual(minify_css(css), '/*! License */\n.nav>li>a:hover,.x{content:" ; } ";color:#fff}')
+        self.assertEqual(minify_css('@media (min-width: 768px) {\n  .a { float: left; }\n}'),
+                         '@media (min-width:768px){.a{float:left}}')
+
+    def test_finder_builds_bundles_from_sources(self):
+        with open(finders.find('css/bundle.min.css')) as f:
+            bundle = f.read()
+        self.assertEqual(bundle, build_bundle('css/bundle.min.css', read_source))
+        self.assertIn('.sidebar-nav{', bundle)
+        self.assertIn('.nav-tabs>li{', bundle)
+
+
+class UncollectedStaticTest(TestCase):
+    def test_pages_render_before_collectstatic(self):
+        static_assets._collected.cache_clear()
+        with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root):
+            response = self.client.get(reverse('books'))
+        self.assertContains(response, '.sidebar-nav{margin-top:20px')
+
+
+class StaticPipelineTest(TestCase):
+    """The deployed pipeline: collectstatic into a temporary STATIC_ROOT with the bundled storage."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        static_root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(static_root.cleanup)
+        static_settings = override_settings(
+            STATIC_ROOT=static_root.name, STATICFILES_STORAGE='locallibrary.static_bundles.BundledStaticFilesStorage')
+        static_settings.enable()
+        cls.addClassCleanup(static_settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_pages_inline_critical_css(self):
+        response = self.client.get(reverse('books'))
+        self.assertContains(response, '.sidebar-nav{margin-top:20px')
+        self.assertContains(response, static('css/bundle.min.css'))
+        self.assertRegex(static('css/bundle.min.css'), r'bundle\.min\.[0-9a-f]{12}\.css$')
+        self.assertNotContains(response, '//maxcdn.')
+        self.assertNotContains(response, '<script src="http')
+
+    def test_bundle_served_compressed_and_immutable(self):
+        url = static('css/bundle.min.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=315360000', response['Cache-Control'])
+
+    @unittest.skipIf(brotli is None, 'Brotli is not installed')
+    def test_brotli(self):
+        response = self.client.get(static('css/bundle.min.css'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn(b'.nav-tabs>li{', brotli.decompress(b''.join(response.streaming_content)))
@@ -1,11 +1,17 @@
 import datetime
+from unittest import skipUnless
 
-from django.test import TestCase
+from django.db import connection
+from django.db.models import Q
+from django.test import RequestFactory, TestCase
 from django.urls import reverse
 from django.utils import timezone
+from django.views import generic
 from django.contrib.auth.models import User
-from django.contrib.auth.models import Permission
+from django.contrib.auth.models import AnonymousUser, Permission
 
+from .. import circulation
+from ..fragments import FragmentCacheMixin
 from ..models import Author, Book, BookInstance, Genre, Language
 
 
@@ -244,6 +250,17 @@ class RenewBookInstancesViewTest(TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertFormError(resp, 'form', 'due_back', 'Invalid date - renewal more than 4 weeks ahead')
 
+    def test_renewing_a_returned_copy_does_not_lend_it_again(self):
+        self.client.login(username='testuser2', password='12345')
+        resp = self.client.get(reverse('renew-book-librarian', kwargs={'pk': self.test_bookinstance1.pk}))
+        circulation.return_loans([self.test_bookinstance1.pk])
+
+        resp = self.client.post(reverse('renew-book-librarian', kwargs={'pk': self.test_bookinstance1.pk}),
+                                {'due_back': datetime.date.today() + datetime.timedelta(weeks=2)})
+        self.assertFormError(resp, 'form', None, 'This copy is no longer on loan.')
+        copy = BookInstance.objects.get(pk=self.test_bookinstance1.pk)
+        self.assertEqual((copy.status, copy.borrower, copy.due_back), ('a', None, None))
+
 
 class AuthorCreateTest(TestCase):
     def setUp(self) -> None:
@@ -294,3 +311,250 @@ class AuthorCreateTest(TestCase):
             'date_of_birth': '05/11/1834',
         })
         self.assertRedirects(resp, reverse('author-detail', kwargs={'pk':1}))
+
+
+def create_books(author, number_of_books, copies_per_book=3):
+    language = Language.objects.create(name=f'Language {author.pk}')
+    genres = [Genre.objects.create(name=f'Genre {author.pk}-{num}') for num in range(2)]
+    for book_num in range(number_of_books):
+        book = Book.objects.create(title=f'Book {author.pk}-{book_num}', author=author, summary='Summary',
+                                   isbn='1234567890123', language=language)
+        book.genre.set(genres)
+        for copy_num in range(copies_per_book):
+            BookInstance.objects.create(book=book, imprint='Imprint', status='a')
+
+
+class BookListViewQueriesTest(TestCase):
+    def test_query_count_does_not_depend_on_rows(self):
+        for author_num in range(10):
+            author = Author.objects.create(first_name='FName', last_name=f'LName {author_num}')
+            create_books(author, 1, copies_per_book=0)
+        # The conditional GET version, the count and the page.
+        with self.assertNumQueries(3):
+            resp = self.client.get(reverse('books'))
+        self.assertEqual(len(resp.context['book_list']), 10)
+        self.assertContains(resp, 'LName 9')
+
+
+class BookDetailViewQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_books(Author.objects.create(first_name='John', last_name='Smith'), 1, copies_per_book=20)
+
+    def test_query_count_does_not_depend_on_copies(self):
+        book = Book.objects.get()
+        with self.assertNumQueries(4):
+            resp = self.client.get(reverse('book-detail', args=[book.pk]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, '<strong>Imprint:</strong>', count=20)
+        self.assertContains(resp, 'Genre 1-1')
+
+
+class AuthorDetailViewQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        create_books(cls.author, 15)
+
+    def test_query_count_does_not_depend_on_books(self):
+        with self.assertNumQueries(3):
+            resp = self.client.get(reverse('author-detail', args=[self.author.pk]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, '(3)', count=15)
+
+
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for author_num in range(13):
+            Author.objects.create(first_name=f'FName {author_num}', last_name='Same' if author_num < 6 else f'LName {author_num:02d}')
+
+        cls.librarian = User.objects.create_user(username='librarian', password='12345')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        book = Book.objects.create(title='Book Title', summary='Summary', isbn='ABCDEFG')
+        for copy_num in range(12):
+            due_back = None if copy_num % 4 == 0 else datetime.date.today() + datetime.timedelta(days=copy_num % 3)
+            BookInstance.objects.create(book=book, imprint='Imprint', due_back=due_back, status='o')
+
+    def walk(self, url):
+        pages = []
+        resp = self.client.get(url + '?cursor=')
+        while True:
+            pages.append([obj.pk for obj in resp.context['object_list']])
+            if not resp.context['page_obj'].has_next():
+                return pages, resp
+            resp = self.client.get(url + '?' + resp.context['page_obj'].next_querystring)
+
+    def test_pages_follow_ordering_without_count(self):
+        # The conditional GET version and the page.
+        with self.assertNumQueries(2):
+            resp = self.client.get(reverse('authors') + '?cursor=')
+        self.assertTrue(resp.context['is_paginated'])
+        self.assertIsNone(resp.context['paginator'])
+        self.assertFalse(resp.context['page_obj'].has_previous())
+        self.assertNotContains(resp, 'Page 1 of')
+
+        pages, last = self.walk(reverse('authors'))
+        expected = list(Author.objects.order_by('last_name', 'pk').values_list('pk', flat=True))
+        self.assertEqual([len(page) for page in pages], [10, 3])
+        self.assertEqual(sum(pages, []), expected)
+
+        resp = self.client.get(reverse('authors') + '?' + last.context['page_obj'].previous_querystring)
+        self.assertEqual([obj.pk for obj in resp.context['object_list']], pages[0])
+        self.assertFalse(resp.context['page_obj'].has_previous())
+
+    def test_nullable_ordering_key(self):
+        self.client.force_login(self.librarian)
+        pages, last = self.walk(reverse('all-borrowed'))
+        walked = sum(pages, [])
+        self.assertEqual(len(walked), 12)
+        self.assertEqual(len(set(walked)), 12)
+        due_dates = [BookInstance.objects.get(pk=pk).due_back for pk in walked]
+        self.assertEqual(due_dates[-3:], [None, None, None])
+        self.assertEqual(due_dates[:-3], sorted(due_dates[:-3]))
+
+        resp = self.client.get(reverse('all-borrowed') + '?' + last.context['page_obj'].previous_querystring)
+        self.assertEqual([obj.pk for obj in resp.context['object_list']], pages[0])
+
+    def test_cursor_pagination_setting(self):
+        with self.settings(CATALOG_CURSOR_PAGINATION=True):
+            resp = self.client.get(reverse('authors'))
+        self.assertTrue(resp.context['page_obj'].is_cursor_page)
+
+    def test_tampered_cursor_is_404(self):
+        resp = self.client.get(reverse('authors') + '?cursor=garbage')
+        self.assertEqual(resp.status_code, 404)
+
+
+class FragmentCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='John', last_name='Smith')
+        create_books(cls.author, 2, copies_per_book=2)
+        cls.book = Book.objects.filter(author=cls.author).first()
+        cls.librarian = User.objects.create_user(username='librarian', password='12345')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+    def test_cached_fragment_skips_queries(self):
+        url = reverse('book-detail', args=[self.book.pk])
+        self.client.get(url)
+        # The conditional GET version and the object.
+        with self.assertNumQueries(2):
+            resp = self.client.get(url)
+        self.assertContains(resp, '<strong>Imprint:</strong>', count=2)
+
+        url = reverse('author-detail', args=[self.author.pk])
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            resp = self.client.get(url)
+        self.assertContains(resp, '(2)', count=2)
+
+    def test_changes_invalidate_fragments(self):
+        book_url = reverse('book-detail', args=[self.book.pk])
+        author_url = reverse('author-detail', args=[self.author.pk])
+        self.client.get(book_url)
+        self.client.get(author_url)
+
+        copy = self.book.bookinstance_set.first()
+        copy.status = 'o'
+        copy.save()
+        self.assertContains(self.client.get(book_url), 'On loan')
+
+        BookInstance.objects.create(book=self.book, imprint='New imprint', status='a')
+        self.assertContains(self.client.get(book_url), 'New imprint')
+        self.assertContains(self.client.get(author_url), '(3)')
+
+        self.author.last_name = 'Smythe'
+        self.author.save()
+        self.assertContains(self.client.get(book_url), 'John Smythe')
+
+        genre = self.book.genre.first()
+        genre.name = 'Renamed genre'
+        genre.save()
+        self.assertContains(self.client.get(book_url), 'Renamed genre')
+
+        self.book.summary = 'Rewritten summary'
+        self.book.save()
+        self.assertContains(self.client.get(author_url), 'Rewritten summary')
+
+    def test_views_without_hooks_render_uncached(self):
+        class BookDetail(FragmentCacheMixin, generic.DetailView):
+            model = Book
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        view = BookDetail.as_view()
+        view(request, pk=self.book.pk).render()
+        Book.objects.filter(pk=self.book.pk).update(title='Changed title')
+        resp = view(request, pk=self.book.pk).render()
+        self.assertContains(resp, 'Title: Changed title')
+
+    def test_perms_links_outside_fragment(self):
+        url = reverse('book-detail', args=[self.book.pk])
+        self.assertNotContains(self.client.get(url), 'UPDATE BOOK')
+        self.client.force_login(self.librarian)
+        self.assertContains(self.client.get(url), 'UPDATE BOOK')
+
+
+class BookFormAutocompleteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for num in range(30):
+            Author.objects.create(first_name=f'First{num}', last_name=f'Last{num:02d}')
+            Genre.objects.create(name=f'Genre {num:02d}')
+        cls.language = Language.objects.create(name='English')
+        cls.librarian = User.objects.create_user(username='librarian', password='pass')
+        cls.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+
+    def setUp(self):
+        self.client.force_login(self.librarian)
+
+    def test_form_renders_only_selected_choices(self):
+        resp = self.client.get(reverse('book-add'))
+        self.assertContains(resp, 'data-autocomplete-url="%s"' % reverse('author-autocomplete'))
+        self.assertContains(resp, 'js/autocomplete')
+        self.assertNotContains(resp, 'Last00')
+        self.assertNotContains(resp, 'Genre 00')
+
+        book = Book.objects.create(title='Emma', summary='-', isbn='9780141439587',
+                                   author=Author.objects.get(last_name='Last07'), language=self.language)
+        book.genre.add(Genre.objects.get(name='Genre 03'))
+        resp = self.client.get(reverse('book-update', args=[book.pk]))
+        self.assertContains(resp, '<option value="%s" selected>First7 Last07</option>' % book.author_id, html=True)
+        self.assertContains(resp, 'Genre 03')
+        self.assertNotContains(resp, 'Last08')
+
+    def test_post_validates_with_targeted_lookups(self):
+        author = Author.objects.get(last_name='Last12')
+        genres = list(Genre.objects.filter(name__in=['Genre 01', 'Genre 02']).values_list('pk', flat=True))
+        data = {'title': 'Emma', 'summary': '-', 'isbn': '9780141439587',
+                'author': author.pk, 'language': self.language.pk, 'genre': genres}
+        resp = self.client.post(reverse('book-add'), data)
+        book = Book.objects.get(title='Emma')
+        self.assertRedirects(resp, reverse('book-detail', args=[book.pk]))
+        self.assertEqual(set(book.genre.values_list('pk', flat=True)), set(genres))
+
+        resp = self.client.post(reverse('book-add'), dict(data, author=0))
+        self.assertFormError(resp, 'form', 'author',
+                             'Select a valid choice. That choice is not one of the available choices.')
+
+    def test_autocomplete_prefix_search(self):
+        resp = self.client.get(reverse('author-autocomplete'), {'q': 'last1 first1'})
+        self.assertEqual([result['text'] for result in resp.json()['results']],
+                         [f'First{num} Last{num}' for num in range(10, 20)])
+
+        resp = self.client.get(reverse('genre-autocomplete'))
+        self.assertEqual(len(resp.json()['results']), 20)
+        self.assertTrue(resp.json()['more'])
+        self.assertEqual(resp.json()['results'][0]['text'], 'Genre 00')
+
+    @skipUnless(connection.vendor == 'sqlite', 'Checks the SQLite query plan')
+    def test_autocomplete_prefix_search_uses_indexes(self):
+        plan = Author.objects.filter(Q(last_name__istartswith='last1') | Q(first_name__istartswith='last1')).explain()
+        self.assertIn('author_last_name_prefix_idx', plan)
+        self.assertIn('author_first_name_prefix_idx', plan)
+        self.assertIn('genre_name_prefix_idx', Genre.objects.filter(name__istartswith='genre').explain())
+
+    def test_autocomplete_requires_permission(self):
+        self.client.force_login(User.objects.create_user(username='reader'))
+        self.assertEqual(self.client.get(reverse('language-autocomplete')).status_code, 403)
@@ -0,0 +1,49 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import visits
+from ..models import Counter
+
+
+class VisitsTest(TestCase):
+    def setUp(self):
+        visits.cache().delete(visits.BUFFER_KEY)
+
+    def test_index_counts_visits_without_db_writes(self):
+        for expected in range(3):
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.get(reverse('index'))
+            self.assertEqual(resp.context['num_visits'], expected)
+            self.assertFalse([q for q in queries if not q['sql'].startswith('SELECT')])
+        self.assertNotIn('sessionid', resp.cookies)
+        self.assertEqual(visits.buffered(), 3)
+
+    def test_tampered_cookie_starts_over(self):
+        self.client.cookies['num_visits'] = '41'
+        self.assertEqual(self.client.get(reverse('index')).context['num_visits'], 0)
+
+    @override_settings(CATALOG_VISITS_FLUSH_THRESHOLD=2)
+    def test_buffer_flushes_at_threshold(self):
+        visits.record_visit()
+        self.assertFalse(Counter.objects.filter(name='visits').exists())
+        visits.record_visit()
+        visits.record_visit()
+        self.assertEqual(Counter.objects.get(name='visits').value, 2)
+        self.assertEqual(visits.buffered(), 1)
+        self.assertEqual(visits.total(), 3)
+
+    def test_flush_command(self):
+        visits.record_visit()
+        visits.record_visit()
+        out = StringIO()
+        call_command('flush_visits', stdout=out)
+        self.assertIn('Flushed 2 visits, 2 in total', out.getvalue())
+        self.assertEqual(visits.buffered(), 0)
+        visits.record_visit()
+        call_command('flush_visits', stdout=out)
+        self.assertEqual(Counter.objects.get(name='visits').value, 3)
@@ -1,15 +1,20 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('books/', views.BookListView.as_view(), name='books'),
+    path('search/', views.search_books, name='search'),
     path('books/<int:pk>/', views.BookDetailView.as_view(), name='book-detail'),
     path('authors/', views.AuthorListView.as_view(), name='authors'),
     path('authors/<int:pk>/', views.AuthorDetailView.as_view(), name='author-detail'),
     path('mybooks/', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
     path('borrowed/', views.LoanedBooksStaffListView.as_view(), name='all-borrowed'),
+    path('borrowed/bulk/', views.bulk_update_loans, name='bulk-update-loans'),
+    path('book/<pk>/checkout/', views.checkout_book, name='book-checkout'),
+    path('book/<pk>/hold/', views.place_hold, name='book-hold'),
     path('book/<pk>/renew/', views.renew_book_librarian, name='renew-book-librarian'),
     path('author/<pk>/update/', views.AuthorUpdate.as_view(), name='author-update'),
     path('author/create/', views.AuthorCreate.as_view(), name='author-create'),
@@ -17,4 +22,22 @@ urlpatterns = [
     path('book/add/', views.add_book_librarian, name='book-add'),
     path('book/<pk>/update/', views.BookUpdate.as_view(), name='book-update'),
     path('book/<pk>/delete/', views.BookDelete.as_view(), name='book-delete'),
+    path('autocomplete/authors/', views.author_autocomplete, name='author-autocomplete'),
+    path('autocomplete/languages/', views.language_autocomplete, name='language-autocomplete'),
+    path('autocomplete/genres/', views.genre_autocomplete, name='genre-autocomplete'),
+    path('export/<slug:dataset>.<slug:fmt>', views.export_catalog, name='export-catalog'),
+    path('cache-stats/', views.cache_stats, name='cache-stats'),
+    path('_perf/', views.perf_report, name='perf-report'),
 ]
+
+# Async read-only pages; resolved ahead of their sync counterparts when CATALOG_ASYNC_VIEWS is on.
+async_urlpatterns = [
+    path('', async_views.index, name='index'),
+    path('books/', async_views.book_list, name='books'),
+    path('books/<int:pk>/', async_views.book_detail, name='book-detail'),
+    path('authors/', async_views.author_list, name='authors'),
+    path('authors/<int:pk>/', async_views.author_detail, name='author-detail'),
+]
+
+if getattr(settings, 'CATALOG_ASYNC_VIEWS', False):
+    urlpatterns = async_urlpatterns + urlpatterns
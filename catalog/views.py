@@ -1,55 +1,70 @@
-import datetime
 import random
 
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
-from django.http import HttpResponseRedirect
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.http import Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.db.models import Q
 from django.urls import reverse, reverse_lazy
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views import generic
+from django.views.decorators.http import require_POST
 
-from .forms import RenewBookModelForm, AddBookModelForm
+from locallibrary import cache_backends, profiling
+from locallibrary.replicas import PrimaryDatabaseMixin, primary_database
+
+from . import circulation, conditional, counters, exporting, search, services, visits
+from .conditional import ConditionalGetMixin, conditional_page
+from .forms import AddBookModelForm, BulkLoanForm, CheckoutForm, RenewBookModelForm, proposed_renewal_date
+from .fragments import TAXONOMY, FragmentCacheMixin, scope
 from .models import Book, BookInstance, Author, Genre, Language
+from .pagination import CursorPage, CursorPaginationMixin
 
 
 # Create your views here.
 
-def index(request):
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
-    num_authors = Author.objects.all().count()
-    num_genres = Genre.objects.all().count
-    num_book_title_with_word = Book.objects.filter(title__iregex='\w+').count()
-    num_visits = request.session.get('num_visits', 0)
-    request.session['num_visits'] = num_visits + 1
-
-    context = {
-        'num_books': num_books,
-        'num_instances': num_instances,
-        'num_instances_available': num_instances_available,
-        'num_authors': num_authors,
-        'num_genres': num_genres,
-        'num_book_title_with_word': num_book_title_with_word,
+def index_context(counts, num_visits):
+    return {
+        'num_books': counts['books'],
+        'num_instances': counts['instances'],
+        'num_instances_available': counts['instances_available'],
+        'num_authors': counts['authors'],
+        'num_genres': counts['genres'],
+        'num_book_title_with_word': counts['books_title_with_word'],
         'num_visits': num_visits
     }
-    return render(request, 'index.html', context)
+
+
+def index(request):
+    counts = counters.snapshot()
+    num_visits = visits.visitor_count(request)
+    visits.record_visit()
+
+    response = render(request, 'index.html', index_context(counts, num_visits))
+    visits.set_visitor_count(response, num_visits + 1)
+    return response
 
 
 @permission_required('catalog.can_mark_returned')
+@primary_database
 def renew_book_librarian(request, pk):
     book_inst = get_object_or_404(BookInstance, pk=pk)
 
     if request.method == 'POST':
         form = RenewBookModelForm(request.POST)
         if form.is_valid():
-            book_inst.due_back = form.cleaned_data["due_back"]
-            book_inst.save()
-            return HttpResponseRedirect(reverse("all-borrowed"))
+            # renew_loans() moves the due date only while the copy is still on loan.
+            if circulation.renew_loans([book_inst.pk], form.cleaned_data['due_back']):
+                return HttpResponseRedirect(reverse("all-borrowed"))
+            form.add_error(None, 'This copy is no longer on loan.')
     else:
-        proposed_renewal_date = datetime.date.today() + datetime.timedelta(weeks=3)
-        form = RenewBookModelForm(initial={'due_back': proposed_renewal_date})
+        form = RenewBookModelForm(initial={'due_back': proposed_renewal_date()})
     return render(request, 'catalog/book_renew_librarian.html', context={'form': form, 'bookinst': book_inst})
 
 
@@ -61,43 +76,237 @@ def generate_isbn():
 
 
 @permission_required('catalog.can_mark_returned')
+@primary_database
+@require_POST
+def bulk_update_loans(request):
+    form = BulkLoanForm(request.POST)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+    elif form.cleaned_data['action'] == 'renew':
+        renewed = circulation.renew_loans(form.cleaned_data['copies'], form.cleaned_data['due_back'])
+        messages.success(request, f'{renewed} loans renewed until {form.cleaned_data["due_back"]}.')
+    else:
+        returned = circulation.return_loans(form.cleaned_data['copies'])
+        messages.success(request, f'{returned} loans marked returned.')
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('all-borrowed')
+    return HttpResponseRedirect(next_url)
+
+
+@permission_required('catalog.can_mark_returned')
+@primary_database
+@require_POST
+def checkout_book(request, pk):
+    """Lend a copy to the reader named in the form, or queue them for the book if none is free."""
+    book = get_object_or_404(Book, pk=pk)
+    form = CheckoutForm(request.POST)
+    if not form.is_valid():
+        for error in form.errors['borrower']:
+            messages.error(request, error)
+    elif circulation.checkout(book.pk, form.cleaned_data['borrower']) is not None:
+        messages.success(request, f'A copy of {book} was lent to {form.cleaned_data["borrower"]}.')
+    else:
+        circulation.place_hold(book.pk, form.cleaned_data['borrower'])
+        messages.info(request, f'No copy of {book} is free; {form.cleaned_data["borrower"]} has a hold on it.')
+    return HttpResponseRedirect(book.get_absolute_url())
+
+
+@login_required
+@primary_database
+@require_POST
+def place_hold(request, pk):
+    book = get_object_or_404(Book, pk=pk)
+    hold = circulation.place_hold(book.pk, request.user)
+    if hold.status == 'r':
+        messages.success(request, f'A copy of {book} is set aside for you.')
+    else:
+        messages.info(request, f'You are in the queue for {book}.')
+    return HttpResponseRedirect(book.get_absolute_url())
+
+
+@permission_required('catalog.can_mark_returned')
+@primary_database
 def add_book_librarian(request):
     if request.method == 'POST':
         form = AddBookModelForm(request.POST)
         if form.is_valid():
-            book = Book.objects.create()
-            book.title = form.cleaned_data['title']
-            book.author = form.cleaned_data['author']
-            book.summary = form.cleaned_data['summary']
-            book.genre.set(form.cleaned_data['genre'])
-            book.isbn = form.cleaned_data['isbn']
-            book.language = form.cleaned_data['language']
-            book.save()
+            book = services.create_book(form.save(commit=False), form.cleaned_data['genre'])
             return HttpResponseRedirect(reverse('book-detail', args=[book.id]))
     else:
         form = AddBookModelForm(initial={'isbn': generate_isbn()})
     return render(request, 'catalog/book_form.html', context={'form': form})
 
 
-class BookListView(generic.ListView):
+def search_books(request):
+    query = request.GET.get('q', '')
+    page_size = 10
+    direction, after = 'next', None
+    if request.GET.get('cursor'):
+        try:
+            direction, after = search.decode_cursor(request.GET['cursor'])
+        except (signing.BadSignature, ValueError, TypeError):
+            raise Http404('Invalid cursor')
+
+    backwards = direction == 'previous'
+    rows = search.search(query, after, backwards=backwards, limit=page_size + 1)
+    has_more = len(rows) > page_size
+    rows = rows[-page_size:] if backwards else rows[:page_size]
+    books = Book.objects.select_related('author').in_bulk([book_id for book_id, score in rows])
+
+    def querystring(direction, row):
+        params = request.GET.copy()
+        params['cursor'] = search.encode_cursor(direction, row)
+        return params.urlencode()
+
+    has_next = has_more if not backwards else True
+    has_previous = has_more if backwards else after is not None
+    page = CursorPage(
+        [books[book_id] for book_id, score in rows if book_id in books],
+        next_querystring=querystring('next', rows[-1]) if has_next and rows else None,
+        previous_querystring=querystring('previous', rows[0]) if has_previous and rows else None,
+    )
+    context = {
+        'query': query,
+        'book_list': page.object_list,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+    }
+    return render(request, 'catalog/book_search.html', context)
+
+
+@staff_member_required
+@conditional_page(conditional.export_version, per_user=False)
+def export_catalog(request, dataset, fmt):
+    if dataset not in exporting.DATASETS or fmt not in exporting.FORMATS:
+        raise Http404('Unknown export')
+    response = StreamingHttpResponse(exporting.export_lines(dataset, fmt), content_type=exporting.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+    return response
+
+
+AUTOCOMPLETE_LIMIT = 20
+
+
+def autocomplete_response(request, queryset, search_fields):
+    """
+    JSON for the autocomplete widgets: the first AUTOCOMPLETE_LIMIT rows, in index order, where every
+    word of ?q= is a prefix of one of the search fields. Migration 0014 indexes the search fields for
+    istartswith.
+    """
+    queryset = queryset.only('pk', *search_fields).order_by(*search_fields)
+    for word in request.GET.get('q', '').split()[:5]:
+        condition = Q()
+        for field in search_fields:
+            condition |= Q(**{f'{field}__istartswith': word})
+        queryset = queryset.filter(condition)
+    rows = list(queryset[:AUTOCOMPLETE_LIMIT + 1])
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': str(obj)} for obj in rows[:AUTOCOMPLETE_LIMIT]],
+        'more': len(rows) > AUTOCOMPLETE_LIMIT,
+    })
+
+
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def author_autocomplete(request):
+    return autocomplete_response(request, Author.objects.all(), ['last_name', 'first_name'])
+
+
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def language_autocomplete(request):
+    return autocomplete_response(request, Language.objects.all(), ['name'])
+
+
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def genre_autocomplete(request):
+    return autocomplete_response(request, Genre.objects.all(), ['name'])
+
+
+@staff_member_required
+def cache_stats(request):
+    """Hit/miss counts of this process and the backend's own statistics for every cache alias."""
+    counts = cache_backends.stats()
+    report = {}
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        report[alias] = {'backend': f'{type(cache).__module__}.{type(cache).__name__}'}
+        report[alias].update(counts.get(alias, {}))
+        if hasattr(cache, 'server_stats'):
+            try:
+                report[alias]['server'] = cache.server_stats()
+            except Exception as e:
+                report[alias]['server'] = {'error': str(e)}
+    return JsonResponse(report)
+
+
+@staff_member_required
+def perf_report(request):
+    """Percentiles of the requests this worker has profiled, per URL name (see locallibrary/profiling.py)."""
+    routes = [(route, stats, [stats[metric] for metric in profiling.METRICS])
+              for route, stats in profiling.summary().items()]
+    return render(request, 'catalog/perf_report.html', {
+        'routes': routes,
+        'sample_rate': settings.PROFILING_SAMPLE_RATE,
+    })
+
+
+class BookListView(ConditionalGetMixin, CursorPaginationMixin, generic.ListView):
     model = Book
     paginate_by = 10
 
+    def get_queryset(self):
+        return Book.objects.select_related('author')
+
+    def page_version(self):
+        return conditional.list_version(self, ['updated_at', 'author__updated_at'], 'books')
 
-class BookDetailView(generic.DetailView):
+
+class BookDetailView(ConditionalGetMixin, FragmentCacheMixin, generic.DetailView):
     model = Book
 
+    # Genres and copies are read lazily inside the cached fragment, so a cache hit costs one query.
+    def get_queryset(self):
+        return Book.objects.select_related('author', 'language')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['genres'] = self.object.genre.all()
+        context['copies'] = self.object.bookinstance_set.all()
+        return context
+
+    def fragment_scopes(self):
+        return [scope('book', self.object.pk), scope('author', self.object.author_id), TAXONOMY]
 
-class AuthorListView(generic.ListView):
+    def page_version(self):
+        return conditional.book_version(self.kwargs['pk'])
+
+
+class AuthorListView(ConditionalGetMixin, CursorPaginationMixin, generic.ListView):
     model = Author
     paginate_by = 10
 
+    def page_version(self):
+        return conditional.list_version(self, ['updated_at'], 'authors')
 
-class AuthorDetailView(generic.DetailView):
+
+class AuthorDetailView(ConditionalGetMixin, FragmentCacheMixin, generic.DetailView):
     model = Author
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['books'] = Book.objects.filter(author=self.object)
+        return context
+
+    def fragment_scopes(self):
+        return [scope('author', self.object.pk)]
 
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
+    def page_version(self):
+        return conditional.author_version(self.kwargs['pk'])
+
+
+class LoanedBooksByUserListView(LoginRequiredMixin, CursorPaginationMixin, generic.ListView):
     model = BookInstance
     template_name = 'catalog/bookinstance_list_borrowed_user.html'
     paginate_by = 10
@@ -106,7 +315,7 @@ class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
         return BookInstance.objects.filter(borrower=self.request.user).filter(status__exact='o').order_by('due_back')
 
 
-class LoanedBooksStaffListView(PermissionRequiredMixin, generic.ListView):
+class LoanedBooksStaffListView(PermissionRequiredMixin, CursorPaginationMixin, generic.ListView):
     permission_required = 'catalog.can_mark_returned'
 
     model = BookInstance
@@ -114,35 +323,40 @@ class LoanedBooksStaffListView(PermissionRequiredMixin, generic.ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact='o').order_by('due_back')
+        return BookInstance.objects.filter(status__exact='o').select_related('book', 'borrower').order_by('due_back')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['proposed_renewal_date'] = proposed_renewal_date()
+        return context
 
-class AuthorCreate(PermissionRequiredMixin, generic.edit.CreateView):
+
+class AuthorCreate(PermissionRequiredMixin, PrimaryDatabaseMixin, generic.edit.CreateView):
     permission_required = 'catalog.can_mark_returned'
     model = Author
     initial={'date_of_death':'12/10/2016',}
     fields = '__all__'
 
 
-class AuthorUpdate(PermissionRequiredMixin, generic.edit.UpdateView):
+class AuthorUpdate(PermissionRequiredMixin, PrimaryDatabaseMixin, generic.edit.UpdateView):
     permission_required = 'catalog.can_mark_returned'
     model = Author
     fields = '__all__'
 
 
-class AuthorDelete(PermissionRequiredMixin, generic.edit.DeleteView):
+class AuthorDelete(PermissionRequiredMixin, PrimaryDatabaseMixin, generic.edit.DeleteView):
     permission_required = 'catalog.can_mark_returned'
     model = Author
     success_url = reverse_lazy('authors')
 
 
-class BookUpdate(PermissionRequiredMixin, generic.UpdateView):
+class BookUpdate(PermissionRequiredMixin, PrimaryDatabaseMixin, generic.UpdateView):
     permission_required = 'catalog.can_mark_returned'
     model = Book
-    fields = '__all__'
+    form_class = AddBookModelForm
 
 
-class BookDelete(PermissionRequiredMixin, generic.DeleteView):
+class BookDelete(PermissionRequiredMixin, PrimaryDatabaseMixin, generic.DeleteView):
     permission_required = 'catalog.can_mark_returned'
     model = Book
     success_url = reverse_lazy('books')
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from .models import Counter
+
+# Site-wide home page visits are buffered in the cache and written to the 'visits' counter row in
+# batches, so counting a visit does not write to the database.
+BUFFER_KEY = 'catalog:visits:buffer'
+COUNTER_NAME = 'visits'
+COOKIE_NAME = 'num_visits'
+COOKIE_SALT = 'catalog.visits'
+COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def cache():
+    return caches[getattr(settings, 'CATALOG_VISITS_CACHE', 'counters')]
+
+
+def flush_threshold():
+    return getattr(settings, 'CATALOG_VISITS_FLUSH_THRESHOLD', 100)
+
+
+def record_visit():
+    """Count one visit in the buffer, flushing it to the database once it reaches the threshold."""
+    try:
+        buffered = cache().incr(BUFFER_KEY)
+    except ValueError:
+        cache().add(BUFFER_KEY, 0, None)
+        buffered = cache().incr(BUFFER_KEY)
+    # Per-process caches (locmem) are invisible to the flush_visits command, so they flush themselves.
+    if buffered >= flush_threshold():
+        flush()
+
+
+def buffered():
+    return cache().get(BUFFER_KEY, 0)
+
+
+def flush():
+    """Move the buffered visits to the 'visits' counter row and return how many were moved."""
+    count = buffered()
+    if not count:
+        return 0
+    # Subtract only what was read, so visits counted meanwhile stay in the buffer.
+    try:
+        cache().decr(BUFFER_KEY, count)
+    except ValueError:
+        pass  # The buffer was evicted meanwhile; what was read is still written below.
+    try:
+        with transaction.atomic():
+            counter, created = Counter.objects.get_or_create(name=COUNTER_NAME, defaults={'value': count})
+            if not created:
+                Counter.objects.filter(pk=counter.pk).update(value=F('value') + count)
+    except Exception:
+        cache().incr(BUFFER_KEY, count)
+        raise
+    return count
+
+
+def total():
+    stored = Counter.objects.filter(name=COUNTER_NAME).values_list('value', flat=True).first() or 0
+    return stored + buffered()
+
+
+def visitor_count(request):
+    """Visits of this browser, kept in a signed cookie instead of the session."""
+    try:
+        return int(request.get_signed_cookie(COOKIE_NAME, default=0, salt=COOKIE_SALT))
+    except ValueError:
+        return 0
+
+
+def set_visitor_count(response, count):
+    response.set_signed_cookie(COOKIE_NAME, count, salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE,
+                               httponly=True, samesite='Lax')
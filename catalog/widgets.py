@@ -0,0 +1,47 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+
+class AutocompleteMixin:
+    """
+    A model choice widget that renders only the selected options. The others are fetched as the user
+    types from a JSON endpoint answering ?q= with {"results": [{"id": ..., "text": ...}], "more": ...}
+    (see views.autocomplete_response), so rendering the form never loads the whole table.
+    """
+
+    def __init__(self, url_name, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+
+    class Media:
+        js = ['js/autocomplete.js']
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = reverse(self.url_name)
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        options = []
+        if not self.allow_multiple_selected and field.empty_label is not None:
+            options.append(self.create_option(name, '', field.empty_label, not any(value), 0))
+        selected = {str(v) for v in value if str(v) not in field.empty_values}
+        if selected:
+            try:
+                objects = list(self.choices.queryset.filter(**{f'{field.to_field_name or "pk"}__in': selected}))
+            except (ValueError, ValidationError):
+                objects = []
+            for obj in objects:
+                options.append(self.create_option(
+                    name, field.prepare_value(obj), field.label_from_instance(obj), True, len(options)))
+        return [(None, options, 0)]
+
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    pass
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    pass
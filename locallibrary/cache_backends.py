@@ -0,0 +1,102 @@
+"""
+Django's cache backends with hit/miss counting, so the cache can be sized from real traffic.
+
+Counts are kept per process and per alias. server_stats() reports what the backend itself knows
+(Redis INFO, memcached stats, entries on disk or in memory), which covers all processes sharing it.
+"""
+import os
+import threading
+from collections import Counter
+
+from django.core.cache.backends import dummy, filebased, locmem, memcached, redis
+
+_lock = threading.Lock()
+_counts = {}
+
+
+def stats():
+    """{alias: {'hits', 'misses', 'hit_rate'}} for this process."""
+    with _lock:
+        counts = {alias: dict(counter) for alias, counter in _counts.items()}
+    for counter in counts.values():
+        lookups = counter['hits'] + counter['misses']
+        counter['hit_rate'] = round(counter['hits'] / lookups, 4) if lookups else None
+    return counts
+
+
+def reset_stats():
+    with _lock:
+        _counts.clear()
+
+
+class StatsMixin:
+    # Backends whose get_many() is BaseCache's loop over get() are already counted by get().
+    counts_get_many = True
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self.alias = params.get('ALIAS', server)
+
+    def record(self, hits, misses):
+        with _lock:
+            counter = _counts.setdefault(self.alias, Counter(hits=0, misses=0))
+            counter['hits'] += hits
+            counter['misses'] += misses
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing_key, version)
+        if value is self._missing_key:
+            self.record(0, 1)
+            return default
+        self.record(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        if self.counts_get_many:
+            self.record(len(values), len(keys) - len(values))
+        return values
+
+    def server_stats(self):
+        return None
+
+
+class LocMemCache(StatsMixin, locmem.LocMemCache):
+    counts_get_many = False
+
+    def server_stats(self):
+        return {'entries': len(self._cache), 'max_entries': self._max_entries}
+
+
+class FileBasedCache(StatsMixin, filebased.FileBasedCache):
+    counts_get_many = False
+
+    def server_stats(self):
+        files = self._list_cache_files()
+        return {
+            'entries': len(files),
+            'max_entries': self._max_entries,
+            'bytes': sum(os.path.getsize(f) for f in files if os.path.exists(f)),
+        }
+
+
+class RedisCache(StatsMixin, redis.RedisCache):
+    def server_stats(self):
+        info = self._cache.get_client().info()
+        return {name: info.get(name) for name in (
+            'keyspace_hits', 'keyspace_misses', 'evicted_keys', 'used_memory', 'maxmemory')}
+
+
+class PyMemcacheCache(StatsMixin, memcached.PyMemcacheCache):
+    def server_stats(self):
+        totals = Counter()
+        for client in self._cache.clients.values():
+            server = client.stats()
+            for name in ('get_hits', 'get_misses', 'evictions', 'bytes', 'limit_maxbytes'):
+                totals[name] += int(server.get(name.encode(), 0))
+        return dict(totals)
+
+
+class DummyCache(StatsMixin, dummy.DummyCache):
+    counts_get_many = False
@@ -0,0 +1,85 @@
+"""
+Build the CACHES setting from URLs in the environment, the way dj_database_url does for DATABASES.
+
+    CACHE_URL=redis://:password@redis.example.com:6379/0    every alias, one key prefix per alias
+    CACHE_SESSIONS_URL=memcached://10.0.0.1:11211,10.0.0.2:11211    overrides a single alias
+    CACHE_URL=file:///var/tmp/locallibrary-cache?timeout=600&max_entries=10000
+    CACHE_URL=locmem://    (the default) per-process memory, fine for development and tests
+
+Every backend is an instrumented subclass from locallibrary.cache_backends that counts hits and misses.
+"""
+import os
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+BACKENDS = {
+    'redis': 'locallibrary.cache_backends.RedisCache',
+    'rediss': 'locallibrary.cache_backends.RedisCache',
+    'memcached': 'locallibrary.cache_backends.PyMemcacheCache',
+    'pymemcache': 'locallibrary.cache_backends.PyMemcacheCache',
+    'file': 'locallibrary.cache_backends.FileBasedCache',
+    'locmem': 'locallibrary.cache_backends.LocMemCache',
+    'dummy': 'locallibrary.cache_backends.DummyCache',
+}
+
+# Backends whose entries only the process that wrote them can see.
+PROCESS_LOCAL = {BACKENDS['locmem'], BACKENDS['dummy']}
+
+# Query parameters that are top-level cache settings; any other parameter goes to OPTIONS.
+SETTINGS = {'timeout': 'TIMEOUT', 'key_prefix': 'KEY_PREFIX', 'version': 'VERSION'}
+
+
+def parse_value(value):
+    if value.lower() == 'none':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse(url, alias='default'):
+    """Return a CACHES entry for one cache URL."""
+    url = urlsplit(url)
+    if url.scheme not in BACKENDS:
+        raise ValueError(f'Unknown cache URL scheme {url.scheme!r} for the {alias!r} cache')
+
+    if url.scheme in ('redis', 'rediss'):
+        location = [f'{url.scheme}://{url.netloc}{url.path}'] if ',' not in url.netloc else [
+            f'{url.scheme}://{host}{url.path}' for host in url.netloc.split(',')]
+    elif url.scheme in ('memcached', 'pymemcache'):
+        location = url.netloc.split(',') if url.netloc else [f'unix:{unquote(url.path)}']
+    elif url.scheme == 'file':
+        # One directory per alias: FileBasedCache culls and clears whole directories.
+        location = [os.path.join(unquote(url.netloc + url.path), alias)]
+    elif url.scheme == 'locmem':
+        # LocMemCache instances with the same LOCATION share their storage.
+        location = [url.netloc or alias]
+    else:
+        location = ['']
+
+    config = {
+        'BACKEND': BACKENDS[url.scheme],
+        'LOCATION': location[0] if len(location) == 1 else location,
+        'KEY_PREFIX': alias,
+        'ALIAS': alias,
+    }
+    options = {}
+    for name, value in parse_qsl(url.query):
+        if name in SETTINGS:
+            config[SETTINGS[name]] = parse_value(value)
+        else:
+            options[name] = parse_value(value)
+    if options:
+        config['OPTIONS'] = options
+    return config
+
+
+def config(aliases, default='locmem://', environ=os.environ):
+    """CACHES for the given aliases: CACHE_<ALIAS>_URL if set, else CACHE_URL, else `default`."""
+    base = environ.get('CACHE_URL', default)
+    return {alias: parse(environ.get(f'CACHE_{alias.upper()}_URL', base), alias) for alias in aliases}
+
+
+def is_shared(config):
+    """Whether every worker process sees the same entries in this CACHES entry (Redis, memcached, files)."""
+    return config['BACKEND'] not in PROCESS_LOCAL
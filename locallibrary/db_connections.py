@@ -0,0 +1,72 @@
+"""
+Persistent database connections: health checks and connection-acquire timing.
+
+With CONN_MAX_AGE > 0 a connection outlives its request, and it may be dead by the time the next request
+picks it up (database restart, pooler or firewall timeout). Django 4.0 only notices after a query fails,
+so for databases with CONN_HEALTH_CHECKS the middleware pings a reused connection before the request's
+first query on it and reconnects if the ping fails, as Django 4.1 does natively.
+"""
+import contextvars
+import time
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+# {alias: (milliseconds, reused)} for the connections the current request has used.
+_acquired = contextvars.ContextVar('db_connections_acquired', default=None)
+_ensure_connection = BaseDatabaseWrapper.ensure_connection
+
+
+def health_check(connection):
+    """Close a reused persistent connection that no longer works, so the next query reconnects."""
+    settings_dict = connection.settings_dict
+    if (connection.connection is None or not settings_dict.get('CONN_HEALTH_CHECKS')
+            or settings_dict.get('CONN_MAX_AGE') == 0 or connection.in_atomic_block):
+        return
+    if not connection.is_usable():
+        connection.close()
+
+
+def checked_ensure_connection(connection):
+    """
+    BaseDatabaseWrapper.ensure_connection health-checking and timing each alias the first time the
+    current request uses it, so requests that never query a database never connect to it.
+    """
+    acquired = _acquired.get()
+    if acquired is None or connection.alias in acquired:
+        return _ensure_connection(connection)
+    acquired[connection.alias] = None
+    started = time.perf_counter()
+    health_check(connection)
+    reused = connection.connection is not None
+    _ensure_connection(connection)
+    acquired[connection.alias] = ((time.perf_counter() - started) * 1000, reused)
+
+
+def server_timing(alias, elapsed, reused):
+    name = 'db-connect' if alias == DEFAULT_DB_ALIAS else f'db-connect-{alias}'
+    return f'{name};dur={elapsed:.2f};desc="{"reused" if reused else "new"}"'
+
+
+class DatabaseConnectionMiddleware:
+    """
+    Health-checks each database connection when the request first uses it and reports how long acquiring
+    it took in a `Server-Timing: db-connect;dur=<ms>;desc="new|reused"` header (`db-connect-<alias>` for
+    the replicas).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        BaseDatabaseWrapper.ensure_connection = checked_ensure_connection
+
+    def __call__(self, request):
+        acquired = {}
+        token = _acquired.set(acquired)
+        try:
+            response = self.get_response(request)
+        finally:
+            _acquired.reset(token)
+        timings = [server_timing(alias, *timing) for alias, timing in acquired.items() if timing]
+        if timings:
+            response['Server-Timing'] = ', '.join(filter(None, [response.get('Server-Timing'), *timings]))
+        return response
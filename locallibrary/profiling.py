@@ -0,0 +1,218 @@
+"""
+Sampled request profiling per URL name: wall time, SQL, template rendering and response size.
+
+ProfilingMiddleware profiles a PROFILING_SAMPLE_RATE fraction of the requests; 0, the default, turns it
+off. A profile records the request's SQL on every database alias (count, summed time and the statements
+that ran more than once with different parameters, the N+1 pattern). It also records the time spent
+rendering templates, not counting the queries they trigger, and the response size.
+
+Profiles stay in memory per worker process, the last PROFILING_MAX_SAMPLES per route. Every
+PROFILING_FLUSH_INTERVAL seconds a summary is written as a JSON line, either to PROFILING_LOG_FILE or
+to the `locallibrary.profiling` logger. summary() gives the percentiles shown on /catalog/_perf/.
+"""
+import contextvars
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('wall_time', 'queries', 'sql_time', 'render_time', 'size')
+TIME_METRICS = ('wall_time', 'sql_time', 'render_time')
+PERCENTILES = (50, 95, 99)
+
+_current = contextvars.ContextVar('profile', default=None)
+_lock = threading.Lock()
+_samples = {}
+_requests = Counter()
+_duplicates = {}
+_last_flush = time.monotonic()
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def fingerprint(sql):
+    """The statement with IN lists and literals collapsed, so runs with other values compare equal."""
+    return _LITERALS.sub('?', _IN_LIST.sub('(...)', sql))
+
+
+class Profile:
+    def __init__(self):
+        # (sql, seconds); appends are atomic, so the parallel queries of the async views are safe.
+        self.queries = []
+        self.render_time = 0.0
+        self.rendering = False
+
+    def sql_time(self, first=0):
+        return sum(duration for _, duration in self.queries[first:])
+
+
+def time_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries.append((sql, time.perf_counter() - started))
+
+
+def install_query_timer(connection, **kwargs):
+    # First in the list, so connection.execute_wrapper() blocks still pop their own wrapper.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+_render = Template._render
+
+
+def timed_render(template, context):
+    """Template._render timing the outermost template of the profiled request, less its queries."""
+    profile = _current.get()
+    if profile is None or profile.rendering:
+        return _render(template, context)
+    profile.rendering = True
+    first_query = len(profile.queries)
+    started = time.perf_counter()
+    try:
+        return _render(template, context)
+    finally:
+        profile.render_time += time.perf_counter() - started - profile.sql_time(first_query)
+        profile.rendering = False
+
+
+def record(route, profile, wall_time, size):
+    executions = Counter(fingerprint(sql) for sql, _ in profile.queries)
+    sample = (wall_time, len(profile.queries), profile.sql_time(), max(profile.render_time, 0.0), size)
+    with _lock:
+        if route not in _samples:
+            _samples[route] = deque(maxlen=settings.PROFILING_MAX_SAMPLES)
+            _duplicates[route] = {}
+        _samples[route].append(sample)
+        _requests[route] += 1
+        for sql, count in executions.items():
+            if count > 1:
+                duplicate = _duplicates[route].setdefault(sql, {'requests': 0, 'max_executions': 0})
+                duplicate['requests'] += 1
+                duplicate['max_executions'] = max(duplicate['max_executions'], count)
+
+
+def percentiles(values):
+    values = sorted(values)
+    return {f'p{p}': values[max(math.ceil(p / 100 * len(values)) - 1, 0)] for p in PERCENTILES}
+
+
+def summary():
+    """
+    {route: {'requests', 'samples', <metric>: {'p50', 'p95', 'p99'}, 'duplicates': [...]}} for this
+    process. Times are in milliseconds and sizes in bytes. Duplicates are the statements that repeated
+    within a request, with the number of sampled requests they repeated in, most frequent first.
+    """
+    with _lock:
+        samples = {route: list(rows) for route, rows in _samples.items()}
+        requests = dict(_requests)
+        duplicates = {route: {sql: dict(d) for sql, d in found.items()} for route, found in _duplicates.items()}
+    report = {}
+    for route, rows in sorted(samples.items()):
+        report[route] = {'requests': requests[route], 'samples': len(rows)}
+        for metric, values in zip(METRICS, zip(*rows)):
+            if metric in TIME_METRICS:
+                values = [round(value * 1000, 2) for value in values]
+            report[route][metric] = percentiles(values)
+        report[route]['duplicates'] = sorted(
+            ({'sql': sql, **counts} for sql, counts in duplicates[route].items()),
+            key=lambda d: (-d['requests'], -d['max_executions'], d['sql']))
+    return report
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+        _requests.clear()
+        _duplicates.clear()
+
+
+def flush():
+    line = json.dumps({'pid': os.getpid(), 'time': round(time.time()), 'routes': summary()})
+    if settings.PROFILING_LOG_FILE:
+        with open(settings.PROFILING_LOG_FILE, 'a') as f:
+            f.write(line + '\n')
+    else:
+        logger.info(line)
+
+
+def flush_if_due():
+    global _last_flush
+    now = time.monotonic()
+    with _lock:
+        if now - _last_flush < settings.PROFILING_FLUSH_INTERVAL:
+            return
+        _last_flush = now
+    flush()
+
+
+class ProfilingMiddleware:
+    """Profiles a sample of the requests that resolve to a URL; place it outside the other middleware."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        connection_created.connect(install_query_timer)
+        Template._render = timed_render
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        for connection in connections.all():
+            install_query_timer(connection)
+        profile = Profile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        if request.resolver_match is None:
+            return response
+        route = request.resolver_match.view_name
+        if response.streaming:
+            response.streaming_content = self.stream(route, profile, started, response.streaming_content)
+        else:
+            self.finish(route, profile, started, len(response.content))
+        return response
+
+    def stream(self, route, profile, started, content):
+        # Streaming views (the exports) run their queries while the body is sent.
+        size = 0
+        content = iter(content)
+        while True:
+            token = _current.set(profile)
+            try:
+                chunk = next(content, None)
+            finally:
+                _current.reset(token)
+            if chunk is None:
+                break
+            size += len(chunk)
+            yield chunk
+        self.finish(route, profile, started, size)
+
+    def finish(self, route, profile, started, size):
+        record(route, profile, time.perf_counter() - started, size)
+        flush_if_due()
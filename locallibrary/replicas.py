@@ -0,0 +1,87 @@
+"""
+Read-replica routing.
+
+Replicas are configured from $DATABASE_REPLICA_URLS (see settings.py). Reads go to a random replica only
+inside safe (GET/HEAD) requests that ReplicaRoutingMiddleware lets through; everything else, including
+management commands, shells and reads inside a transaction, uses the primary. Requests are pinned to the
+primary when they:
+  - are not safe (POST, PUT, DELETE, ...), or come within REPLICA_STICKY_SECONDS after one, so a user
+    reads their own writes;
+  - go to the admin;
+  - hit a view marked with @primary_database or PrimaryDatabaseMixin (forms that write).
+"""
+import contextlib
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import reverse
+
+STICKY_COOKIE = 'use_primary_db'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextlib.contextmanager
+def replica_reads(enabled=True):
+    """Allow (or forbid) reads from the replicas within the block."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def primary_database(view):
+    """Mark a view function as one whose reads must come from the primary."""
+    view.use_primary_database = True
+    return view
+
+
+class PrimaryDatabaseMixin:
+    use_primary_database = True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not replicas() or not _replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema by replication.
+        return False if db in replicas() else None
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replicas = (request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+                        and not request.path.startswith(reverse('admin:index')))
+        with replica_reads(use_replicas):
+            response = self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 15),
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if getattr(view_func, 'use_primary_database', False) or getattr(view_class, 'use_primary_database', False):
+            _replica_reads.set(False)
@@ -43,6 +43,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'locallibrary.profiling.ProfilingMiddleware',
+    'locallibrary.replicas.ReplicaRoutingMiddleware',
+    'locallibrary.db_connections.DatabaseConnectionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -125,6 +128,68 @@ import dj_database_url
 
 db_from_env = dj_database_url.config()
 DATABASES['default'].update(db_from_env)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # A file, not the in-memory default: the circulation tests lend copies from several threads at once.
+    DATABASES['default'].setdefault('TEST', {}).setdefault('NAME', BASE_DIR / 'test_db.sqlite3')
+
+# Read replicas: $DATABASE_REPLICA_URLS is a comma-separated list of database URLs. Safe requests read
+# from a random replica, everything else from the primary; see locallibrary/replicas.py. Tests use the
+# primary for every replica alias.
+DATABASE_REPLICAS = []
+for num, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica{num}'] = dict(dj_database_url.parse(url.strip()), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica{num}')
+DATABASE_ROUTERS = ['locallibrary.replicas.ReplicaRouter']
+# How long reads stay on the primary after a POST, so users see their own writes despite replication lag.
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 15))
+
+# Persistent connections: $DATABASE_CONN_MAX_AGE seconds (0 reconnects on every request); reused
+# connections are health-checked first, see locallibrary/db_connections.py. Behind a transaction-pooling
+# pooler set $DATABASE_POOLER=pgbouncer: server-side cursors cannot outlive a pooled transaction.
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+DATABASE_POOLER = os.environ.get('DATABASE_POOLER', '')
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = DATABASE_CONN_MAX_AGE
+    database['CONN_HEALTH_CHECKS'] = os.environ.get('DATABASE_CONN_HEALTH_CHECKS', '1') == '1'
+    database['DISABLE_SERVER_SIDE_CURSORS'] = bool(DATABASE_POOLER)
+
+# Caches: $CACHE_URL configures every alias, $CACHE_<ALIAS>_URL overrides one of them.
+# See locallibrary/cache_config.py for the URL formats (redis://, memcached://, file://, locmem://).
+from locallibrary import cache_config
+
+CACHES = cache_config.config(['default', 'pages', 'fragments', 'sessions', 'counters'])
+CACHE_MIDDLEWARE_ALIAS = 'pages'
+CATALOG_FRAGMENT_CACHE = 'fragments'
+# A bump() only reaches the workers that share the fragments cache. With a per-process cache the other
+# workers' fragments go stale until they expire, so keep them for a minute rather than a day.
+CATALOG_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get(
+    'CATALOG_FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60 if cache_config.is_shared(CACHES['fragments']) else 60))
+
+# Sessions: 'cached_db', 'db', 'cache' or 'signed_cookies'. The default is 'cached_db' when the sessions
+# cache is shared and 'db' otherwise: with a per-process cache a logout in one worker would leave the
+# session alive in the others' caches. Home page visit counts are not kept in the session at all (see
+# catalog/visits.py), so anonymous visitors never get a session row.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get(
+    'DJANGO_SESSION_ENGINE', 'cached_db' if cache_config.is_shared(CACHES['sessions']) else 'db')
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Serve the read-only catalog pages from catalog/async_views.py; locallibrary.asgi turns this on.
+CATALOG_ASYNC_VIEWS = os.environ.get('CATALOG_ASYNC_VIEWS', '') == '1'
+
+# Request profiling, see locallibrary/profiling.py: $PROFILING_SAMPLE_RATE is the fraction of requests
+# profiled (0 turns it off). Each worker writes a summary every $PROFILING_FLUSH_INTERVAL seconds to
+# $PROFILING_LOG_FILE, or to the console log without one.
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_FLUSH_INTERVAL = int(os.environ.get('PROFILING_FLUSH_INTERVAL', 60))
+PROFILING_LOG_FILE = os.environ.get('PROFILING_LOG_FILE', '')
+PROFILING_MAX_SAMPLES = int(os.environ.get('PROFILING_MAX_SAMPLES', 1000))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'locallibrary.profiling': {'handlers': ['console'], 'level': 'INFO'}},
+}
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/1.10/howto/static-files/
@@ -137,4 +202,17 @@ STATIC_URL = '/static/'
 
 # Simplified static file serving.
 # https://warehouse.python.org/project/whitenoise/
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Content-hashed, gzip and brotli compressed files, plus the bundles below; see locallibrary/static_bundles.py.
+STATICFILES_STORAGE = 'locallibrary.static_bundles.BundledStaticFilesStorage'
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'locallibrary.static_bundles.BundleFinder',
+]
+# The tests do not need collectstatic: they use the plain storage (see locallibrary/test_runner.py).
+TEST_RUNNER = 'locallibrary.test_runner.TestRunner'
+# Bundle name -> the static files concatenated and minified into it.
+STATIC_BUNDLES = {
+    'css/bundle.min.css': ['css/vendor/bootstrap.css', 'css/styles.css'],
+    'css/critical.min.css': ['css/critical.css'],
+}
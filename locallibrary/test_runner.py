@@ -0,0 +1,20 @@
+"""
+Runs the tests with the plain StaticFilesStorage, so pages render without the manifest and files that
+collectstatic writes. catalog/tests/test_static.py collects into a temporary STATIC_ROOT to test the
+real pipeline.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.static_settings = override_settings(STATICFILES_STORAGE=TEST_STATICFILES_STORAGE)
+        self.static_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.static_settings.disable()
+        super().teardown_test_environment(**kwargs)